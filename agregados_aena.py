@@ -0,0 +1,256 @@
+"""Cubo de agregados compartido por todos los gráficos del dashboard
+
+Una sola pasada por el DataFrame filtrado calcula las medidas (número de
+licitaciones, sumas de presupuesto e importe, y las sumas necesarias para la
+baja media y la baja ponderada) al grano más fino que usan los gráficos. Cada
+gráfico pide después una vista, que se obtiene agregando el cubo (con muchas
+menos filas que los datos) y se guarda para los demás gráficos que la usen.
+
+Para la distribución de la baja (percentiles e histogramas), el cubo guarda
+además bocetos (bocetos_aena) a un grano más grueso, GRANO_BOCETOS: las filas
+de cada celda por cubeta de baja, que se suman igual que las medidas.
+"""
+import numpy as np
+import pandas as pd
+
+import bocetos_aena
+
+# Grano del cubo: todas las dimensiones por las que agrupa algún gráfico
+GRANO = ['Año', 'Mes', 'Aeropuerto', 'Tipo_Obra', 'Empresa_Adjudicataria', 'Rango_Importe']
+
+# Grano de los bocetos de la baja: las dimensiones de sus vistas de distribución
+# y de los filtros del sidebar (sin año ni mes, para que cada celda reúna más filas)
+GRANO_BOCETOS = ['Aeropuerto', 'Tipo_Obra', 'Empresa_Adjudicataria', 'Rango_Importe']
+
+# Medidas aditivas guardadas en cada celda
+MEDIDAS = ['n', 'presupuesto', 'importe', 'suma_baja', 'n_baja', 'suma_baja_presupuesto']
+
+# Rangos de importe adjudicado del gráfico de baja por rangos
+BINS_IMPORTE = [0, 10000, 50000, 100000, 500000, 1000000, float('inf')]
+ETIQUETAS_IMPORTE = ['<10K€', '10K-50K€', '50K-100K€', '100K-500K€', '500K-1M€', '>1M€']
+
+
+def rango_importe(importe):
+    """Rango de importe adjudicado de cada licitación"""
+    return pd.cut(importe, bins=BINS_IMPORTE, labels=ETIQUETAS_IMPORTE)
+
+
+def _claves(df):
+    """Columnas del grano del cubo para cada fila de df"""
+    return [
+        df['Fecha_Publicacion'].dt.year.rename('Año'),
+        df['Mes'],
+        df['Aeropuerto'],
+        df['Tipo_Obra'],
+        df['Empresa_Adjudicataria'],
+        rango_importe(df['Importe_Adjudicado']).rename('Rango_Importe'),
+    ]
+
+
+def _celdas(df, claves=None):
+    """Agregar las filas de df al grano del cubo (una sola pasada)"""
+    baja = df['Porcentaje_Baja'].astype('float64')
+    presupuesto = df['Presupuesto_Base'].astype('float64')
+    medidas = pd.DataFrame({
+        'n': np.ones(len(df), dtype='int64'),
+        'presupuesto': presupuesto,
+        'importe': df['Importe_Adjudicado'].astype('float64'),
+        'suma_baja': baja,
+        'n_baja': baja.notna().astype('int64'),
+        'suma_baja_presupuesto': baja * presupuesto,
+    }, index=df.index)
+    if claves is None:
+        claves = _claves(df)
+    # dropna=False: una fecha o importe vacío no debe sacar la fila del resto de vistas
+    return medidas.groupby(claves, observed=True, dropna=False).sum().reset_index()
+
+
+def _codigos(clave):
+    """Códigos (-1 si vacío) y tipo categórico de una columna de claves"""
+    if isinstance(clave.dtype, pd.CategoricalDtype):
+        return clave.cat.codes.to_numpy(dtype='int64'), clave.dtype
+    codigos, valores = pd.factorize(clave, sort=True)
+    return codigos, pd.CategoricalDtype(valores)
+
+
+def _bocetos(df, claves=None):
+    """Filas de df por celda de GRANO_BOCETOS y cubeta de baja (las que tienen baja)
+
+    En lugar de un groupby por cinco columnas, los códigos de las dimensiones
+    y la cubeta forman un único entero por fila (en base mixta) y se cuentan
+    con np.unique.
+    """
+    if claves is None:
+        claves = _claves(df)
+    por_nombre = {clave.name: clave for clave in claves}
+    cubeta = bocetos_aena.cubetas(df['Porcentaje_Baja'])
+    con_baja = cubeta >= 0
+    codigos, tipos = zip(*(_codigos(por_nombre[nombre][con_baja]) for nombre in GRANO_BOCETOS))
+    # Cada dimensión ocupa len(categorías) + 1 posiciones: la última, para los vacíos
+    bases = [len(tipo.categories) + 1 for tipo in tipos]
+    plano = np.zeros(int(con_baja.sum()), dtype='int64')
+    for codigo, base in zip(codigos, bases):
+        plano = plano * base + np.where(codigo < 0, base - 1, codigo)
+    planos, n = np.unique(plano * bocetos_aena.NUM_CUBETAS + cubeta[con_baja], return_counts=True)
+
+    planos, cubetas = np.divmod(planos, bocetos_aena.NUM_CUBETAS)
+    columnas = {}
+    for nombre, base, tipo in reversed(list(zip(GRANO_BOCETOS, bases, tipos))):
+        planos, codigo = np.divmod(planos, base)
+        columnas[nombre] = pd.Categorical.from_codes(np.where(codigo == base - 1, -1, codigo), dtype=tipo)
+    return pd.DataFrame({nombre: columnas[nombre] for nombre in GRANO_BOCETOS} | {'cubeta': cubetas, 'n': n})
+
+
+class CuboAgregados:
+    """Medidas agregadas al grano GRANO, con vistas por cualquier combinación de dimensiones
+
+    ``bocetos`` tiene una fila por celda de GRANO_BOCETOS y cubeta de baja
+    (dimensiones, cubeta, n).
+    """
+
+    def __init__(self, celdas, bocetos):
+        self.celdas = celdas
+        self.bocetos = bocetos
+        self._vistas = {}
+        self._distribuciones = {}
+
+    def vista(self, *dimensiones):
+        """Medidas agregadas por las dimensiones indicadas (sin dimensiones: totales)
+
+        Como en un groupby sobre las filas, los valores vacíos de las dimensiones
+        pedidas quedan fuera de la vista. Añade las columnas baja_media y
+        baja_ponderada.
+        """
+        if dimensiones not in self._vistas:
+            if dimensiones:
+                vista = self.celdas.groupby(list(dimensiones), observed=True)[MEDIDAS].sum()
+            else:
+                vista = self.celdas[MEDIDAS].sum().to_frame().T
+            with np.errstate(divide='ignore', invalid='ignore'):
+                vista['baja_media'] = vista['suma_baja'] / vista['n_baja'].where(vista['n_baja'] > 0)
+                vista['baja_ponderada'] = vista['suma_baja_presupuesto'] / vista['presupuesto']
+            self._vistas[dimensiones] = vista
+        return self._vistas[dimensiones]
+
+    def distribucion(self, dimension=None):
+        """Bocetos de la baja por los valores de una dimensión (sin dimensión: uno total)
+
+        La dimensión es una de GRANO_BOCETOS. Suma los bocetos de las celdas de
+        cada valor; como en vista(), los valores vacíos de la dimensión quedan
+        fuera.
+        """
+        if dimension not in self._distribuciones:
+            if dimension is None:
+                codigos, grupos = np.zeros(len(self.bocetos), dtype='int64'), pd.Index(['Total'])
+            else:
+                codigos, grupos = pd.factorize(self.bocetos[dimension], sort=True)
+            presentes = codigos >= 0
+            self._distribuciones[dimension] = bocetos_aena.Bocetos.sumar(
+                codigos[presentes], grupos, self.bocetos['cubeta'].to_numpy()[presentes],
+                self.bocetos['n'].to_numpy(dtype='float64')[presentes],
+            )
+        return self._distribuciones[dimension]
+
+    def percentiles(self, dimension=None, percentiles=bocetos_aena.PERCENTILES):
+        """Percentiles de la baja por dimensión, con las filas con baja y la baja media"""
+        distribucion = self.distribucion(dimension)
+        resultado = distribucion.cuantiles(percentiles)
+        resultado.insert(0, 'n_baja', distribucion.filas())
+        if dimension is None:
+            resultado['baja_media'] = self.totales()['baja_media']
+        else:
+            resultado = resultado.join(self.vista(dimension)['baja_media'])
+        resultado.index.name = dimension
+        return resultado
+
+    def totales(self):
+        """Fila única con las medidas de todo el cubo"""
+        return self.vista().iloc[0]
+
+    def aplicar_delta(self, delta):
+        """Nuevo cubo con las filas insertadas sumadas y las eliminadas restadas"""
+        partes, bocetos = [self.celdas], [self.bocetos]
+        if len(delta.insertados):
+            claves = _claves(delta.insertados)
+            partes.append(_celdas(delta.insertados, claves))
+            bocetos.append(_bocetos(delta.insertados, claves))
+        if len(delta.eliminados):
+            claves = _claves(delta.eliminados)
+            eliminadas = _celdas(delta.eliminados, claves)
+            eliminadas[MEDIDAS] = -eliminadas[MEDIDAS]
+            partes.append(eliminadas)
+            eliminados = _bocetos(delta.eliminados, claves)
+            eliminados['n'] = -eliminados['n']
+            bocetos.append(eliminados)
+        celdas = pd.concat(partes, ignore_index=True)
+        celdas = celdas.groupby(GRANO, observed=True, dropna=False)[MEDIDAS].sum().reset_index()
+        bocetos = pd.concat(bocetos, ignore_index=True)
+        bocetos = bocetos.groupby(GRANO_BOCETOS + ['cubeta'], observed=True, dropna=False)['n'].sum().reset_index()
+        return CuboAgregados(
+            celdas[celdas['n'] > 0].reset_index(drop=True),
+            bocetos[bocetos['n'] > 0].reset_index(drop=True),
+        )
+
+    def __len__(self):
+        return int(self.celdas['n'].sum())
+
+
+def construir_cubo(df):
+    """Calcular el cubo de agregados de un DataFrame de licitaciones"""
+    claves = _claves(df)
+    return CuboAgregados(_celdas(df, claves), _bocetos(df, claves))
+
+
+def actualizar_cubo(cubo, delta):
+    """Función de actualización para RegistroDatos.derivado"""
+    return cubo.aplicar_delta(delta)
+
+
+def top_k(cubo, dimension, medida, k=10):
+    """Los k valores de dimension con mayor medida (Series ordenada de mayor a menor)"""
+    return cubo.vista(dimension)[medida].nlargest(k)
+
+
+def top_k_por_grupo(cubo, grupo, elemento, k=3, medida='n', cuota='importe'):
+    """Los k elementos con mayor medida dentro de cada grupo, sin bucles por grupo
+
+    Sobre la vista (grupo, elemento) del cubo: un único lexsort por grupo,
+    medida descendente y elemento (desempate estable), y el puesto de cada fila
+    dentro de su grupo. Devuelve un DataFrame con las columnas grupo, Puesto
+    (1..k), elemento, medida y Cuota (fracción del total de cuota en el grupo).
+    """
+    vista = cubo.vista(grupo, elemento)
+    codigos_grupo, codigos_elemento = (np.asarray(c) for c in vista.index.codes)
+    valores = vista[medida].to_numpy(dtype='float64')
+    orden = np.lexsort((codigos_elemento, -valores, codigos_grupo))
+
+    grupos = codigos_grupo[orden]
+    inicios = np.flatnonzero(np.r_[True, grupos[1:] != grupos[:-1]]) if len(grupos) else grupos
+    puesto = np.arange(len(grupos)) - np.repeat(inicios, np.diff(np.r_[inicios, len(grupos)])) + 1
+    dentro = puesto <= k
+    seleccion = orden[dentro]
+
+    importes = vista[cuota].to_numpy(dtype='float64')
+    totales = np.bincount(codigos_grupo, weights=importes, minlength=len(vista.index.levels[0]))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cuotas = importes[seleccion] / totales[codigos_grupo[seleccion]]
+    return pd.DataFrame({
+        grupo: vista.index.get_level_values(0)[seleccion],
+        'Puesto': puesto[dentro],
+        elemento: vista.index.get_level_values(1)[seleccion],
+        medida: valores[seleccion],
+        'Cuota': cuotas,
+    })
+
+
+def calcular_metricas(cubo):
+    """Métricas principales: totales, ahorro y bajas media y ponderada"""
+    totales = cubo.totales()
+    return {
+        'total_licitaciones': int(totales['n']),
+        'presupuesto_total': float(totales['presupuesto']),
+        'importe_total': float(totales['importe']),
+        'ahorro_total': float(totales['presupuesto'] - totales['importe']),
+        'baja_media': float(totales['baja_media']),
+        'baja_ponderada': float(totales['baja_ponderada']),
+    }
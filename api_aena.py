@@ -0,0 +1,374 @@
+"""API HTTP local de agregados en JSON, con el mismo motor que el dashboard
+
+Devuelve las cifras de las tarjetas de métricas y de los gráficos (totales,
+bajas media y ponderada, top N por aeropuerto, empresa o tipo de obra, vistas
+del cubo por cualquier combinación de dimensiones, percentiles e histogramas
+de la baja) para los mismos filtros que
+``aplicar_filtros``, pasados como parámetros de la consulta:
+
+    GET /metricas?aeropuerto=MAD&tipo_obra=Obra%20Civil&baja_min=5
+    GET /top?dimension=empresa&medida=importe&k=10
+    GET /vista?dimensiones=Año,Tipo_Obra
+    GET /distribucion?dimension=Aeropuerto&ancho=5   (percentiles e histograma de la baja)
+    GET /empresas-por-aeropuerto
+    GET /dimensiones            (opciones de los filtros en cascada)
+    GET /version
+
+Usa el dataset, los índices y el cubo del registro compartido, y la caché LRU
+de cubos por filtros (cache_aena): dentro del proceso del dashboard
+(``AENA_API_PUERTO``) comparte además lo ya calculado por las sesiones. Cada
+respuesta lleva un ETag derivado de la versión de datos, la ruta y los
+parámetros; con ``If-None-Match`` se responde 304 sin calcular nada, y el JSON
+de cada ETag se guarda en la caché.
+
+Solo escucha en 127.0.0.1 por defecto. Uso como script:
+
+    python api_aena.py [--host 127.0.0.1] [--puerto 8502]
+"""
+import argparse
+import hashlib
+import json
+import logging
+import math
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import agregados_aena
+import cache_aena
+import datos_aena
+import indices_aena
+import sql_aena
+
+# Puerto de la API dentro del proceso del dashboard (sin valor: no se arranca)
+PUERTO = int(os.environ.get('AENA_API_PUERTO', 0) or 0)
+HOST = os.environ.get('AENA_API_HOST', '127.0.0.1')
+
+LOGGER = logging.getLogger('aena.api')
+
+# Filtros de rango y su valor por defecto (el máximo del presupuesto sale de los datos)
+FILTROS_NUMERICOS = ['presupuesto_min', 'presupuesto_max', 'baja_min', 'baja_max']
+
+# Medidas de /top y /vista
+MEDIDAS = agregados_aena.MEDIDAS + ['baja_media', 'baja_ponderada']
+
+K_MAXIMO = 1000
+
+_lock = threading.Lock()
+_servidor = None  # Servidor arrancado en este proceso (arrancar)
+
+
+class ErrorAPI(Exception):
+    """Error con su código HTTP"""
+
+    def __init__(self, estado, mensaje):
+        super().__init__(mensaje)
+        self.estado = estado
+
+
+class Consulta:
+    """Versión de datos, filtros y parámetros de una petición; el cubo se calcula al pedirlo
+
+    Con el backend pandas, dataset, índice y cubo salen de la misma instantánea
+    del registro (datos_aena.RegistroDatos.instantanea), tomada una vez por
+    petición.
+    """
+
+    def __init__(self, datos, almacen, dimensiones, filtros, parametros):
+        self.datos = datos
+        self.version = almacen.version if almacen is not None else datos.version
+        self.df = datos.df if datos is not None else None
+        self.almacen = almacen
+        self.dimensiones = dimensiones
+        self.filtros = filtros
+        self.parametros = parametros
+
+    def cubo(self):
+        """Cubo de los filtros, con las mismas entradas de caché que el dashboard"""
+        clave = cache_aena.clave_estado(self.version, self.filtros)
+        if self.almacen is not None:
+            return cache_aena.CACHE.obtener(('cubo', clave), lambda: self.almacen.cubo(self.filtros))
+        import dashboard_aena
+
+        indice = datos_aena.REGISTRO.derivado('indice_filtros', indices_aena.IndiceFiltros, instantanea=self.datos)
+        df_filtrado = dashboard_aena.aplicar_filtros(self.df, self.filtros, indice)
+        if len(df_filtrado) == len(self.df):
+            return datos_aena.REGISTRO.derivado('cubo', agregados_aena.construir_cubo, agregados_aena.actualizar_cubo, instantanea=self.datos)
+        return cache_aena.CACHE.obtener(('cubo', clave), lambda: agregados_aena.construir_cubo(df_filtrado))
+
+
+def _datos():
+    """(instantánea del registro, almacén, dimensiones) del dataset actual, cargándolo si hace falta"""
+    import dashboard_aena
+
+    if sql_aena.ACTIVO:
+        almacen = dashboard_aena.cargar_almacen()
+        if almacen is None or almacen.total == 0:
+            raise ErrorAPI(503, "No hay datos cargados")
+        return None, almacen, almacen.dimensiones()
+    datos = dashboard_aena.instantanea_datos()
+    if datos is None or len(datos.df) == 0:
+        raise ErrorAPI(503, "No hay datos cargados")
+    dimensiones = datos_aena.REGISTRO.derivado(
+        'dimensiones', indices_aena.DiccionarioDimensiones.desde_df, indices_aena.DiccionarioDimensiones.actualizar,
+        instantanea=datos,
+    )
+    return datos, None, dimensiones
+
+
+def leer_filtros(parametros, dimensiones):
+    """Filtros de aplicar_filtros a partir de los parámetros (los ausentes, sin filtrar)"""
+    filtros = {clave: todos for clave, (_, todos) in indices_aena.FILTROS_IGUALDAD.items()}
+    filtros.update({
+        'presupuesto_min': 0.0,
+        'presupuesto_max': dimensiones.maximos['Presupuesto_Base'],
+        'baja_min': 0.0,
+        'baja_max': 100.0,
+    })
+    for clave in indices_aena.FILTROS_IGUALDAD:
+        if clave in parametros:
+            filtros[clave] = parametros[clave]
+    for clave in FILTROS_NUMERICOS:
+        if clave in parametros:
+            try:
+                filtros[clave] = float(parametros[clave])
+            except ValueError as e:
+                raise ErrorAPI(400, f"{clave} debe ser un número: {parametros[clave]!r}") from e
+    return filtros
+
+
+def _entero(parametros, clave, defecto, maximo):
+    try:
+        valor = int(parametros.get(clave, defecto))
+    except ValueError as e:
+        raise ErrorAPI(400, f"{clave} debe ser un entero") from e
+    if not 1 <= valor <= maximo:
+        raise ErrorAPI(400, f"{clave} debe estar entre 1 y {maximo}")
+    return valor
+
+
+def _registros(tabla):
+    """Filas de un DataFrame como lista de diccionarios (NaN -> null)"""
+    return json.loads(tabla.to_json(orient='records', force_ascii=False, date_format='iso'))
+
+
+def _columna_dimension(parametros):
+    dimension = parametros.get('dimension', 'aeropuerto')
+    if dimension not in indices_aena.FILTROS_IGUALDAD:
+        raise ErrorAPI(400, f"dimension debe ser una de: {', '.join(indices_aena.FILTROS_IGUALDAD)}")
+    return indices_aena.FILTROS_IGUALDAD[dimension][0]
+
+
+def _medida(parametros, defecto='n'):
+    medida = parametros.get('medida', defecto)
+    if medida not in MEDIDAS:
+        raise ErrorAPI(400, f"medida debe ser una de: {', '.join(MEDIDAS)}")
+    return medida
+
+
+def ruta_version(consulta):
+    return {'filas': len(consulta.df) if consulta.df is not None else consulta.almacen.total}
+
+
+def ruta_metricas(consulta):
+    return agregados_aena.calcular_metricas(consulta.cubo())
+
+
+def ruta_top(consulta):
+    columna = _columna_dimension(consulta.parametros)
+    medida = _medida(consulta.parametros)
+    k = _entero(consulta.parametros, 'k', 10, K_MAXIMO)
+    top = agregados_aena.top_k(consulta.cubo(), columna, medida, k)
+    return [{'valor': str(valor), medida: cifra} for valor, cifra in top.items()]
+
+
+def ruta_vista(consulta):
+    nombres = [d for d in consulta.parametros.get('dimensiones', '').split(',') if d]
+    desconocidas = [d for d in nombres if d not in agregados_aena.GRANO]
+    if desconocidas:
+        raise ErrorAPI(400, f"dimensiones desconocidas: {', '.join(desconocidas)} (posibles: {', '.join(agregados_aena.GRANO)})")
+    vista = consulta.cubo().vista(*nombres)
+    return _registros(vista.reset_index() if nombres else vista)
+
+
+def ruta_distribucion(consulta):
+    dimension = consulta.parametros.get('dimension') or None
+    if dimension is not None and dimension not in agregados_aena.GRANO_BOCETOS:
+        raise ErrorAPI(400, f"dimension debe ser una de: {', '.join(agregados_aena.GRANO_BOCETOS)}")
+    cubo = consulta.cubo()
+    percentiles = cubo.percentiles(dimension)
+    registros = _registros(percentiles.reset_index(names='valor').assign(valor=lambda t: t['valor'].astype(str)))
+    if 'ancho' in consulta.parametros:
+        try:
+            histograma = cubo.distribucion(dimension).histograma(float(consulta.parametros['ancho']))
+        except (ValueError, OverflowError) as e:
+            raise ErrorAPI(400, f"ancho no válido: {e}") from e
+        for registro, (_, fila) in zip(registros, histograma.iterrows()):
+            registro['histograma'] = {f'{limite:g}': int(n) for limite, n in fila.items() if n}
+    return registros
+
+
+def ruta_empresas_por_aeropuerto(consulta):
+    import dashboard_aena
+
+    return _registros(dashboard_aena.tabla_empresas_por_aeropuerto(consulta.cubo()))
+
+
+def ruta_dimensiones(consulta):
+    dimensiones = consulta.dimensiones
+    seleccion = {
+        columna: None if consulta.filtros[clave] == todos else consulta.filtros[clave]
+        for clave, (columna, todos) in indices_aena.FILTROS_IGUALDAD.items()
+    }
+    return {
+        'opciones': {
+            clave: dimensiones.opciones(columna, seleccion)
+            for clave, (columna, _) in indices_aena.FILTROS_IGUALDAD.items()
+        },
+        'maximos': dimensiones.maximos,
+    }
+
+
+# Ruta -> (función, parámetros propios además de los filtros)
+RUTAS = {
+    '/version': (ruta_version, []),
+    '/metricas': (ruta_metricas, []),
+    '/top': (ruta_top, ['dimension', 'medida', 'k']),
+    '/vista': (ruta_vista, ['dimensiones']),
+    '/distribucion': (ruta_distribucion, ['dimension', 'ancho']),
+    '/empresas-por-aeropuerto': (ruta_empresas_por_aeropuerto, []),
+    '/dimensiones': (ruta_dimensiones, []),
+}
+PARAMETROS_FILTRO = list(indices_aena.FILTROS_IGUALDAD) + FILTROS_NUMERICOS
+
+
+def _sin_nan(valor):
+    """Valores válidos en JSON: NaN e infinitos como null, tipos de NumPy como nativos"""
+    if isinstance(valor, dict):
+        return {str(k): _sin_nan(v) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [_sin_nan(v) for v in valor]
+    if hasattr(valor, 'item'):  # Escalares de NumPy
+        valor = valor.item()
+    if isinstance(valor, float) and not math.isfinite(valor):
+        return None
+    return valor
+
+
+def etag(version, ruta, filtros, parametros):
+    """ETag de una respuesta: versión de datos, ruta, filtros y parámetros propios"""
+    texto = json.dumps([ruta, cache_aena.clave_estado(version, filtros), sorted(parametros.items())])
+    return '"' + hashlib.sha1(texto.encode('utf-8')).hexdigest()[:20] + '"'
+
+
+def responder(ruta, consulta_url, si_no_coincide=None):
+    """(estado, cuerpo en bytes o None, ETag) de una petición GET"""
+    if ruta not in RUTAS:
+        raise ErrorAPI(404, f"Ruta desconocida: {ruta} (posibles: {', '.join(RUTAS)})")
+    funcion, propios = RUTAS[ruta]
+    parametros = {clave: valores[-1] for clave, valores in parse_qs(consulta_url, keep_blank_values=True).items()}
+    desconocidos = set(parametros) - set(PARAMETROS_FILTRO) - set(propios)
+    if desconocidos:
+        raise ErrorAPI(400, f"Parámetros desconocidos: {', '.join(sorted(desconocidos))}")
+    datos, almacen, dimensiones = _datos()
+    version = almacen.version if almacen is not None else datos.version
+    filtros = leer_filtros(parametros, dimensiones)
+    propios = {clave: parametros[clave] for clave in propios if clave in parametros}
+    etiqueta = etag(version, ruta, filtros, propios)
+    if si_no_coincide and (si_no_coincide.strip() == '*' or etiqueta in [e.strip().removeprefix('W/') for e in si_no_coincide.split(',')]):
+        return 304, None, etiqueta
+
+    def generar():
+        consulta = Consulta(datos, almacen, dimensiones, filtros, propios)
+        resultado = funcion(consulta)
+        cuerpo = {'version': version, 'filtros': filtros, **propios, 'datos': resultado}
+        return json.dumps(_sin_nan(cuerpo), ensure_ascii=False, allow_nan=False).encode('utf-8')
+
+    return 200, cache_aena.CACHE.obtener(('api', etiqueta), generar), etiqueta
+
+
+class ManejadorAPI(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Conexiones persistentes
+    disable_nagle_algorithm = True  # Cabeceras y cuerpo van en dos escrituras
+    server_version = 'AenaAPI/1.0'
+
+    def do_GET(self):
+        ruta = self.path
+        try:
+            ruta = ruta.encode('latin-1').decode('utf-8')  # Clientes que no codifican la URL
+        except UnicodeError:
+            pass
+        partes = urlsplit(ruta)
+        try:
+            estado, cuerpo, etiqueta = responder(partes.path.rstrip('/') or '/version', partes.query, self.headers.get('If-None-Match'))
+        except ErrorAPI as e:
+            estado, cuerpo, etiqueta = e.estado, json.dumps({'error': str(e)}, ensure_ascii=False).encode('utf-8'), None
+        except Exception as e:
+            LOGGER.exception("Error en %s", self.path)
+            estado, cuerpo, etiqueta = 500, json.dumps({'error': f"Error interno: {e}"}, ensure_ascii=False).encode('utf-8'), None
+        self.send_response(estado)
+        if etiqueta:
+            self.send_header('ETag', etiqueta)
+            self.send_header('Cache-Control', 'no-cache')  # Siempre revalidar con el ETag
+        if cuerpo is not None:
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(cuerpo or b'')))
+        self.end_headers()
+        if cuerpo:
+            self.wfile.write(cuerpo)
+
+    def log_message(self, formato, *args):
+        LOGGER.debug("%s %s", self.address_string(), formato % args)
+
+
+def crear_servidor(host=HOST, puerto=8502):
+    servidor = ThreadingHTTPServer((host, puerto), ManejadorAPI)
+    servidor.daemon_threads = True
+    return servidor
+
+
+def arrancar(host=HOST, puerto=None):
+    """Servir la API en un hilo del proceso actual (una vez por proceso)
+
+    Con varios procesos del dashboard solo el primero consigue el puerto; el
+    resto sigue sin API.
+    """
+    global _servidor
+    with _lock:
+        if _servidor is None:
+            try:
+                _servidor = crear_servidor(host, puerto or PUERTO)
+            except OSError as e:
+                LOGGER.warning("API no arrancada en %s:%s: %s", host, puerto or PUERTO, e)
+                _servidor = False
+                return None
+            threading.Thread(target=_servidor.serve_forever, name='api_aena', daemon=True).start()
+        return _servidor or None
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--puerto', type=int, default=PUERTO or 8502)
+    opciones = parser.parse_args(argumentos)
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    datos_aena.activar_copy_on_write()
+    _datos()  # Cargar antes de aceptar peticiones
+    import dashboard_aena
+    dashboard_aena.vigilar_datos()  # Las versiones nuevas se cargan en segundo plano
+    servidor = crear_servidor(opciones.host, opciones.puerto)
+    print(f"API de licitaciones AENA en http://{opciones.host}:{opciones.puerto} ({', '.join(RUTAS)})")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""Arranque rápido del dashboard: importaciones diferidas y precalentamiento
+
+Un proceso nuevo de Streamlit paga, antes de enviar nada al navegador, la
+importación de pandas, NumPy, Plotly y los módulos del dashboard. Con
+``importar_diferido`` el módulo se registra sin ejecutarse y se importa de
+verdad la primera vez que se usa uno de sus atributos, de modo que la cabecera
+de la página se envía en cuanto arranca el script.
+
+``preparar`` lanza una sola vez por proceso, en un hilo, la tarea de
+precalentamiento (importar esos módulos y cargar el dataset y sus derivados en
+el registro compartido). Las sesiones esperan a que termine antes de usar los
+módulos diferidos: en Python 3.11 la carga diferida no es segura si dos hilos
+la disparan a la vez.
+
+Este módulo solo usa la biblioteca estándar.
+"""
+import importlib.util
+import logging
+import sys
+import threading
+
+LOGGER = logging.getLogger('aena.arranque')
+
+_lock = threading.Lock()
+_listo = None
+
+
+def importar_diferido(nombre):
+    """Módulo nombre, que se importa la primera vez que se accede a un atributo"""
+    if nombre in sys.modules:
+        return sys.modules[nombre]
+    spec = importlib.util.find_spec(nombre)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{nombre}'", name=nombre)
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    modulo = importlib.util.module_from_spec(spec)
+    sys.modules[nombre] = modulo
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+def cargar(*modulos):
+    """Forzar la importación de módulos diferidos"""
+    for modulo in modulos:
+        getattr(modulo, '__name__')  # El primer acceso a un atributo ejecuta el módulo
+
+
+def preparar(tarea):
+    """Lanzar tarea en un hilo la primera vez que se llama en el proceso
+
+    Devuelve un threading.Event que se activa al terminar la tarea (también si
+    falla: el error queda en el log y quien espera vuelve a intentar la carga y
+    lo muestra).
+    """
+    global _listo
+    with _lock:
+        if _listo is None:
+            _listo = threading.Event()
+
+            def ejecutar():
+                try:
+                    tarea()
+                except Exception:
+                    LOGGER.exception("Error al precalentar el dashboard")
+                finally:
+                    _listo.set()
+
+            threading.Thread(target=ejecutar, name='precalentar_aena', daemon=True).start()
+        return _listo
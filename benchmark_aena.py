@@ -0,0 +1,459 @@
+"""Banco de pruebas del dashboard con datos sintéticos con la forma de los libros AENA
+
+Genera licitaciones con las mismas columnas que ``2024_AENA.xlsx`` y con
+cardinalidades y sesgo parecidos a los reales (pocos aeropuertos concentran la
+mayoría de contratos, siete clasificaciones, muchas empresas con una larga cola
+de adjudicatarios ocasionales y UTE), y mide a varias escalas el tiempo y la
+memoria de los caminos calientes: carga, procesado, filtros, búsqueda, cubo de
+agregados, cada ``crear_grafico_*``, la tabla de empresas por aeropuerto y los
+percentiles de la baja (con los bocetos del cubo y, como referencia, ordenando
+las filas).
+
+El tiempo es el mejor de varias repeticiones. La memoria es el pico de memoria
+reservada durante una ejecución aparte (tracemalloc: Python, NumPy y pandas;
+no incluye los buffers de Arrow de las columnas de texto).
+
+La carga desde Excel (``cargar_datos``) solo se mide hasta ``MAX_FILAS_EXCEL``
+filas: escribir el libro sintético es mucho más lento que leerlo.
+
+Con --arranque se mide además el arranque en frío, cada vez en un proceso
+nuevo con un libro de ``FILAS_ARRANQUE`` filas: la importación del dashboard
+(con Streamlit ya importado) y el primer render completo de la página, con la
+caché en disco ya creada y sin ella. La memoria es el máximo residente del
+proceso. Estas etapas se guardan con la escala ``arranque``.
+
+Uso:
+
+    python benchmark_aena.py [--filas 10000 100000 1000000] [--repeticiones 3]
+                             [--arranque] [--guardar base.json] [--comparar base.json]
+
+``--arranque --filas`` (sin escalas) mide solo el arranque.
+
+Con --comparar se marca cada etapa que tarda más de un ``TOLERANCIA`` por
+encima de la referencia y el script termina con código 1 si hay alguna.
+"""
+import argparse
+import inspect
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+# Escalas por defecto (filas)
+ESCALAS = [10_000, 100_000, 1_000_000]
+
+# Filas máximas para las etapas que no escalan (libro Excel y búsqueda sin índice)
+MAX_FILAS_EXCEL = 50_000
+MAX_FILAS_MASCARA = 1_000_000
+
+# Filas del libro con el que se mide el arranque en frío
+FILAS_ARRANQUE = 10_000
+
+# Regresión: más de un 25 % por encima de la referencia y al menos 5 ms más
+TOLERANCIA = 0.25
+MARGEN_S = 0.005
+
+# Aeropuertos de más a menos licitaciones (código, ciudad)
+AEROPUERTOS = [
+    ('MAD', 'Adolfo Suárez Madrid-Barajas'), ('PMI', 'Palma de Mallorca'), ('AGP', 'Málaga-Costa del Sol'),
+    ('BCN', 'Josep Tarradellas Barcelona-El Prat'), ('ALC', 'Alicante-Elche'), ('MAH', 'Menorca'),
+    ('IBZ', 'Ibiza'), ('LPA', 'Gran Canaria'), ('TFS', 'Tenerife Sur'), ('TFN', 'Tenerife Norte'),
+    ('BIO', 'Bilbao'), ('VLC', 'Valencia'), ('SCQ', 'Santiago'), ('FUE', 'Fuerteventura'),
+    ('SVQ', 'Sevilla'), ('GRO', 'Girona-Costa Brava'), ('VGO', 'Vigo'), ('ACE', 'César Manrique Lanzarote'),
+    ('SDR', 'Seve Ballesteros-Santander'), ('XRY', 'Jerez'), ('SPC', 'La Palma'), ('GRX', 'Granada-Jaén F.G.L.'),
+    ('REU', 'Reus'), ('LEI', 'Almería'), ('LCG', 'A Coruña'), ('VIT', 'Vitoria'), ('EAS', 'San Sebastián'),
+    ('OVD', 'Asturias'), ('GMZ', 'La Gomera'), ('PNA', 'Pamplona'), ('QSA', 'Sabadell'), ('VDE', 'El Hierro'),
+    ('MCV', 'Madrid-Cuatro Vientos'), ('HSK', 'Huesca-Pirineos'), ('MLN', 'Melilla'), ('SB-', 'Son Bonet'),
+    ('JCU', 'Ceuta'), ('AEI', 'Algeciras'), ('RJL', 'Logroño'), ('SLM', 'Salamanca'), ('ZAZ', 'Zaragoza'),
+    ('BJZ', 'Badajoz'), ('LEN', 'León'), ('VLL', 'Valladolid'),
+]
+
+# Clasificación y peso (proporciones del libro de 2024)
+CLASIFICACIONES = {
+    'Edificación': 1184, 'Obra Civil': 568, 'Electricidad': 242, 'Mecánicas': 147,
+    'Señalización': 143, 'Climatización': 140, 'Contraincendios': 73,
+}
+
+# Piezas de los nombres de empresa y del objeto del contrato
+_RAICES = [
+    'FERROVIAL', 'ACCIONA', 'SACYR', 'DRAGADOS', 'ELECNOR', 'INDRA', 'IMESAPI', 'COFELY', 'SERVEO',
+    'ELSAMEX', 'CONELSAN', 'INSAE', 'INDUTEC', 'LICUAS', 'URBALUX', 'ETRALUX', 'PADECASA', 'CYCASA',
+    'APIMOSA', 'LANTANIA', 'SAMPOL', 'MONCOSA', 'TESEC', 'EIFFAGE', 'COMSA', 'COBRA', 'CYMI', 'AMPER',
+]
+_ACTIVIDADES = [
+    'CONSTRUCCION', 'INFRAESTRUCTURAS', 'INSTALACIONES', 'SERVICIOS', 'OBRAS Y SERVICIOS',
+    'INGENIERIA Y OBRAS', 'MANTENIMIENTO', 'ENERGIA', 'SEÑALIZACIONES', 'OBRA CIVIL',
+]
+_SUFIJOS = ['SA', 'SL', 'S.A.', 'S.L.', 'SAU', 'SLU', ', S.A.', ', S.L.']
+_ACCIONES = [
+    'Adecuación De', 'Renovación De', 'Reforma Del', 'Suministro E Instalación De', 'Mejora De',
+    'Actuaciones De Mejora En', 'Reparación De', 'Ampliación De', 'Sustitución De', 'Obra Para La Reforma De',
+]
+_ELEMENTOS = [
+    'Locales Comerciales', 'Cubiertas Del Edificio Terminal', 'Vallado Perimetral', 'Plataforma De Estacionamiento',
+    'Calle De Rodaje', 'Pista De Vuelo', 'Balizamiento', 'Climatización De La Sala De Llegadas',
+    'Sistema De Detección De Incendios', 'Aparcamiento P1', 'Centro De Transformación', 'Cableado Eléctrico',
+    'Puntos De Recarga', 'Separador De Hidrocarburos', 'Señalización Vertical', 'Hangares De Mantenimiento',
+    'Oficinas Del Dique Este', 'Control De Seguridad', 'Pasarelas De Embarque', 'Red De Saneamiento',
+]
+
+
+def _pesos_zipf(n, exponente):
+    pesos = 1.0 / np.arange(1, n + 1) ** exponente
+    return pesos / pesos.sum()
+
+
+def _nombres_empresa(n, rng):
+    """n adjudicatarios distintos: empresas con variantes de sufijo y ~15 % de UTE"""
+    nombres, vistos = [], set()
+    while len(nombres) < n:
+        base = f"{rng.choice(_RAICES)} {rng.choice(_ACTIVIDADES)} {len(nombres)}"
+        if rng.random() < 0.15:
+            otro = f"{rng.choice(_RAICES)} {rng.choice(_ACTIVIDADES)}"
+            nombre = f"UTE {base} {rng.choice(_SUFIJOS[:2])}-{otro} {rng.choice(_SUFIJOS[:2])}"
+        else:
+            nombre = f"{base} {rng.choice(_SUFIJOS)}".replace(' ,', ',')
+        if nombre not in vistos:
+            vistos.add(nombre)
+            nombres.append(nombre)
+    return np.array(nombres, dtype=object)
+
+
+def _texto(categorias, codigos):
+    return pd.Series(np.asarray(categorias, dtype=object)[codigos]).astype('str')
+
+
+def generar_licitaciones(filas, ejercicio=2024, semilla=0):
+    """DataFrame con las columnas del libro Excel de un ejercicio (sin procesar)
+
+    El número de empresas crece con las filas como en los datos reales (unas
+    650 para 2.500 licitaciones) y su frecuencia sigue una ley de Zipf.
+    """
+    rng = np.random.default_rng(semilla)
+    n_empresas = max(20, int(25 * filas ** 0.42))
+    aeropuertos = rng.choice(len(AEROPUERTOS), filas, p=_pesos_zipf(len(AEROPUERTOS), 1.1))
+    tipos = rng.choice(len(CLASIFICACIONES), filas, p=np.array(list(CLASIFICACIONES.values())) / sum(CLASIFICACIONES.values()))
+    empresas = rng.choice(n_empresas, filas, p=_pesos_zipf(n_empresas, 0.9))
+
+    # Presupuesto log-normal (mediana ~275.000 €) y baja con media ~14 %
+    presupuesto = np.round(np.exp(rng.normal(np.log(275_000), 1.6, filas)), 2)
+    baja = np.where(rng.random(filas) < 0.08, 0.0, rng.beta(1.3, 7.5, filas))
+    fecha = pd.Timestamp(f'{ejercicio}-01-01') + pd.to_timedelta(rng.integers(0, 365, filas), unit='D')
+
+    # Objeto del contrato: acción + elemento + aeropuerto
+    n_objetos = min(filas, 20_000)
+    objetos = np.array([
+        f"{rng.choice(_ACCIONES)} {rng.choice(_ELEMENTOS)} En El Aeropuerto De {AEROPUERTOS[a][1]}"
+        for a in rng.choice(len(AEROPUERTOS), n_objetos)
+    ], dtype=object)
+
+    codigos = [codigo for codigo, _ in AEROPUERTOS]
+    numero = pd.Series(np.arange(1, filas + 1)).astype('str')
+    aeropuerto = _texto(codigos, aeropuertos)
+    return pd.DataFrame({
+        'Link licitación': 'https://contrataciondelestado.es/wps/poc?uri=deeplink:detalle_licitacion&idEvl=' + numero,
+        'Estado': _texto(['Adjudicada', 'Resuelta'], (rng.random(filas) < 0.1).astype(np.int8)),
+        'Aeropuerto': aeropuerto,
+        'Número de expediente': aeropuerto + '-' + numero + f'/{ejercicio}',
+        'Objeto del Contrato': _texto(objetos, rng.integers(0, n_objetos, filas)),
+        'Presupuesto base sin impuestos': presupuesto,
+        'Órgano de Contratación': _texto([f"Aena. Dirección del Aeropuerto de {ciudad}" for _, ciudad in AEROPUERTOS], aeropuertos),
+        'Fecha presentación licitación': fecha,
+        'Adjudicatario licitación/lote': _texto(_nombres_empresa(n_empresas, rng), empresas),
+        'Importe adjudicación sin impuestos licitación/lote': np.round(presupuesto * (1 - baja), 2),
+        '%baja': baja,
+        'Clasificación': _texto(list(CLASIFICACIONES), tipos),
+    })
+
+
+def medir(funcion, repeticiones=3, preparar=None):
+    """(mejor tiempo en s, pico de memoria en MB) de funcion(*preparar())
+
+    preparar devuelve los argumentos de cada llamada y no cuenta en el tiempo.
+    """
+    preparar = preparar or tuple
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        argumentos = preparar()
+        inicio = time.perf_counter()
+        funcion(*argumentos)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    argumentos = preparar()
+    tracemalloc.start()
+    try:
+        funcion(*argumentos)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return mejor, pico / 1024 ** 2
+
+
+def _etapas(filas, crudo, datos_aena, dashboard, indices_aena, agregados_aena):
+    """Etapas a medir: nombre -> (función, preparar)"""
+    etapas = {}
+
+    if filas <= MAX_FILAS_EXCEL:
+        libro = os.path.join(datos_aena.DIRECTORIO_DATOS, '2024_AENA.xlsx')
+        crudo.to_excel(libro, index=False)
+
+        def cargar_en_frio():
+            datos_aena.limpiar_cache()
+            datos_aena.REGISTRO.invalidar()
+
+        def cargar_desde_cache():
+            datos_aena.REGISTRO.invalidar()
+
+        etapas['cargar_datos (Excel)'] = (dashboard.cargar_datos, lambda: cargar_en_frio() or ())
+        etapas['cargar_datos (caché)'] = (dashboard.cargar_datos, lambda: cargar_desde_cache() or ())
+
+    canonico = datos_aena.canonicalizar_columnas(crudo.assign(Ejercicio=2024))
+    etapas['procesar_datos'] = (dashboard.procesar_datos, lambda: (canonico.copy(),))
+    df = dashboard.procesar_datos(canonico.copy())
+
+    # Filtros: sin filtro, aeropuerto principal y aeropuerto + tipo de obra
+    sin_filtro = {
+        'aeropuerto': 'Todos', 'tipo_obra': 'Todos', 'empresa': 'Todas',
+        'presupuesto_min': 0.0, 'presupuesto_max': float(df['Presupuesto_Base'].max()),
+        'baja_min': 0.0, 'baja_max': 100.0,
+    }
+    escenarios = {
+        'todos': sin_filtro,
+        'aeropuerto': {**sin_filtro, 'aeropuerto': AEROPUERTOS[0][0]},
+        'aeropuerto+tipo': {**sin_filtro, 'aeropuerto': AEROPUERTOS[0][0], 'tipo_obra': 'Obra Civil', 'baja_min': 5.0},
+    }
+    etapas['IndiceFiltros'] = (indices_aena.IndiceFiltros, lambda: (df,))
+    indice = indices_aena.IndiceFiltros(df)
+    for nombre, filtros in escenarios.items():
+        etapas[f'aplicar_filtros [{nombre}]'] = (dashboard.aplicar_filtros, lambda f=filtros: (df, f))
+        etapas[f'aplicar_filtros índice [{nombre}]'] = (dashboard.aplicar_filtros, lambda f=filtros: (df, f, indice))
+
+    # Opciones de los desplegables en cascada (sin memorizar: el peor caso)
+    etapas['DiccionarioDimensiones'] = (indices_aena.DiccionarioDimensiones.desde_df, lambda: (df,))
+    dimensiones = indices_aena.DiccionarioDimensiones.desde_df(df)
+    seleccion = {'Aeropuerto': AEROPUERTOS[0][0], 'Tipo_Obra': 'Obra Civil', 'Empresa_Adjudicataria': None}
+
+    def opciones_filtros():
+        for columna in dimensiones.columnas:
+            dimensiones.opciones(columna, seleccion)
+
+    etapas['opciones filtros'] = (opciones_filtros, lambda: dimensiones._memo.clear() or ())
+
+    # Búsqueda: índice invertido y, en tamaños moderados, la máscara sin índice
+    etapas['IndiceTexto'] = (indices_aena.IndiceTexto, lambda: (df,))
+    indice_texto = indices_aena.IndiceTexto(df)
+    etapas['búsqueda índice'] = (indice_texto.buscar, lambda: ('cubierta aero',))
+    if filas <= MAX_FILAS_MASCARA:
+        tabla = df[[c for c in dashboard.COLUMNAS_TABLA if c in df.columns]]
+
+        def mascara(busqueda):
+            return tabla.astype(str).apply(lambda x: x.str.contains(busqueda, case=False, na=False)).any(axis=1)
+
+        etapas['búsqueda máscara'] = (mascara, lambda: ('cubierta',))
+
+    # Cubo de agregados y todo lo que se construye a partir de él
+    etapas['construir_cubo'] = (agregados_aena.construir_cubo, lambda: (df,))
+    cubo = agregados_aena.construir_cubo(df)
+    graficos = sorted(nombre for nombre in dir(dashboard) if nombre.startswith('crear_grafico_'))
+    for nombre in graficos:
+        funcion = getattr(dashboard, nombre)
+        if 'dimension' in inspect.signature(funcion).parameters:
+            for dimension in dashboard.DIMENSIONES_BAJA:
+                etapas[f'{nombre} [{dimension}]'] = (funcion, lambda d=dimension: (cubo, d))
+        else:
+            etapas[nombre] = (funcion, lambda: (cubo,))
+
+    # Percentiles de la baja: sumando los bocetos del cubo frente a ordenar las filas
+    for dimension in ['Aeropuerto', 'Empresa_Adjudicataria']:
+        etapas[f'percentiles bocetos [{dimension}]'] = (cubo.percentiles, lambda d=dimension: cubo._distribuciones.clear() or (d,))
+        etapas[f'percentiles filas [{dimension}]'] = (
+            lambda d: df.groupby(d, observed=True)['Porcentaje_Baja'].quantile(agregados_aena.bocetos_aena.PERCENTILES),
+            lambda d=dimension: (d,),
+        )
+    etapas['mostrar_empresas_por_aeropuerto'] = (dashboard.mostrar_empresas_por_aeropuerto, lambda: (cubo,))
+    return etapas
+
+
+def ejecutar(escalas=ESCALAS, repeticiones=3, semilla=0):
+    """Medir todas las etapas a cada escala. Devuelve {filas: {etapa: {s, mb}}}
+
+    Los datos y la caché en disco van a un directorio temporal: no se toca la
+    caché del dashboard.
+    """
+    temporal = tempfile.mkdtemp(prefix='benchmark_aena_')
+    os.environ['AENA_DATA_DIR'] = os.path.join(temporal, 'datos')
+    os.environ['AENA_CACHE_DIR'] = os.path.join(temporal, 'cache')
+    os.makedirs(os.environ['AENA_DATA_DIR'])
+    try:
+        import agregados_aena
+        import datos_aena
+        import dashboard_aena
+        import indices_aena
+
+        datos_aena.activar_copy_on_write()
+        resultados = {}
+        for filas in escalas:
+            crudo = generar_licitaciones(filas, semilla=semilla)
+            etapas = _etapas(filas, crudo, datos_aena, dashboard_aena, indices_aena, agregados_aena)
+            resultados[str(filas)] = {}
+            for nombre, (funcion, preparar) in etapas.items():
+                segundos, mb = medir(funcion, repeticiones, preparar)
+                resultados[str(filas)][nombre] = {'s': segundos, 'mb': mb}
+                print(f"{filas:>10,} {nombre:<45} {segundos * 1000:>10.1f} ms {mb:>9.1f} MB", flush=True)
+            del crudo, etapas
+        return resultados
+    finally:
+        shutil.rmtree(temporal, ignore_errors=True)
+
+
+# Scripts de las etapas de arranque: imprimen segundos y MB residentes
+_MEDIDA_PROCESO = """
+import json, resource, sys, time
+def fin(inicio):
+    mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 ** 2 if sys.platform == 'darwin' else 1024)
+    print(json.dumps({'s': time.perf_counter() - inicio, 'mb': mb}))
+"""
+_SCRIPTS_ARRANQUE = {
+    'importar dashboard_aena': """
+import streamlit
+inicio = time.perf_counter()
+import dashboard_aena
+fin(inicio)
+""",
+    'primer render': """
+from streamlit.testing.v1 import AppTest
+inicio = time.perf_counter()
+app = AppTest.from_file('dashboard_aena.py', default_timeout=600)
+app.run()
+if app.exception:
+    sys.exit(app.exception[0].value)
+fin(inicio)
+""",
+}
+
+
+def _medir_proceso(script, entorno_proceso, repeticiones, preparar=None):
+    """Mejor tiempo y máximo de memoria de script, cada repetición en un proceso nuevo"""
+    mejor = {'s': float('inf'), 'mb': 0.0}
+    for _ in range(repeticiones):
+        if preparar:
+            preparar()
+        salida = subprocess.run(
+            [sys.executable, '-c', _MEDIDA_PROCESO + script], env=entorno_proceso, cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        )
+        medida = json.loads(salida.stdout.strip().splitlines()[-1])
+        mejor = {'s': min(mejor['s'], medida['s']), 'mb': max(mejor['mb'], medida['mb'])}
+    return mejor
+
+
+def ejecutar_arranque(repeticiones=3, semilla=0):
+    """Medir el arranque en frío del dashboard. Devuelve {etapa: {s, mb}}"""
+    temporal = tempfile.mkdtemp(prefix='benchmark_aena_')
+    datos, cache = os.path.join(temporal, 'datos'), os.path.join(temporal, 'cache')
+    os.makedirs(datos)
+    directorio = os.path.dirname(os.path.abspath(__file__))
+    entorno_proceso = {
+        **os.environ,
+        'AENA_DATA_DIR': datos,
+        'AENA_CACHE_DIR': cache,
+        'PYTHONPATH': os.pathsep.join(filter(None, [directorio, os.environ.get('PYTHONPATH')])),
+    }
+    try:
+        generar_licitaciones(FILAS_ARRANQUE, semilla=semilla).to_excel(os.path.join(datos, '2024_AENA.xlsx'), index=False)
+
+        def sin_cache():
+            shutil.rmtree(cache, ignore_errors=True)
+
+        etapas = {
+            'importar dashboard_aena': (_SCRIPTS_ARRANQUE['importar dashboard_aena'], None),
+            'primer render (sin caché)': (_SCRIPTS_ARRANQUE['primer render'], sin_cache),
+            # Tras la etapa anterior la caché en disco ya está creada
+            'primer render (caché)': (_SCRIPTS_ARRANQUE['primer render'], None),
+        }
+        resultados = {}
+        for nombre, (script, preparar) in etapas.items():
+            resultados[nombre] = _medir_proceso(script, entorno_proceso, repeticiones, preparar)
+            print(f"{'arranque':>10} {nombre:<45} {resultados[nombre]['s'] * 1000:>10.1f} ms "
+                  f"{resultados[nombre]['mb']:>9.1f} MB", flush=True)
+        return resultados
+    finally:
+        shutil.rmtree(temporal, ignore_errors=True)
+
+
+def entorno():
+    return {
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def comparar(resultados, referencia, tolerancia=TOLERANCIA):
+    """Tabla de etapas comunes con la referencia: tiempos, cociente y regresión"""
+    filas = []
+    for escala, etapas in resultados.items():
+        for nombre, medida in etapas.items():
+            base = referencia.get(escala, {}).get(nombre)
+            if base is None:
+                continue
+            filas.append({
+                'filas': int(escala) if escala.isdigit() else escala,
+                'etapa': nombre,
+                'ms': medida['s'] * 1000,
+                'ms_ref': base['s'] * 1000,
+                'cociente': medida['s'] / base['s'] if base['s'] else float('nan'),
+                'mb': medida['mb'],
+                'mb_ref': base['mb'],
+                'regresion': medida['s'] > base['s'] * (1 + tolerancia) and medida['s'] - base['s'] > MARGEN_S,
+            })
+    return pd.DataFrame(filas)
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filas', type=int, nargs='*', default=ESCALAS, help="escalas a medir")
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--guardar', metavar='JSON', help="guardar los resultados como referencia")
+    parser.add_argument('--comparar', metavar='JSON', help="comparar con una referencia guardada")
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA)
+    parser.add_argument('--arranque', action='store_true', help="medir también el arranque en frío del dashboard")
+    opciones = parser.parse_args(argumentos)
+
+    resultados = ejecutar(opciones.filas, opciones.repeticiones, opciones.semilla) if opciones.filas else {}
+    if opciones.arranque:
+        resultados['arranque'] = ejecutar_arranque(opciones.repeticiones, opciones.semilla)
+
+    if opciones.guardar:
+        with open(opciones.guardar, 'w', encoding='utf-8') as f:
+            json.dump({'entorno': entorno(), 'resultados': resultados}, f, ensure_ascii=False, indent=1)
+        print(f"Referencia guardada en {opciones.guardar}")
+
+    if opciones.comparar:
+        with open(opciones.comparar, encoding='utf-8') as f:
+            referencia = json.load(f)
+        if referencia.get('entorno') != entorno():
+            print("Aviso: la referencia se tomó en otro entorno:", referencia.get('entorno'))
+        tabla = comparar(resultados, referencia['resultados'], opciones.tolerancia)
+        with pd.option_context('display.width', 200, 'display.max_rows', None, 'display.max_columns', None,
+                               'display.float_format', '{:.2f}'.format):
+            print(tabla)
+        regresiones = tabla[tabla['regresion']] if len(tabla) else tabla
+        if len(regresiones):
+            print(f"{len(regresiones)} etapas más lentas que la referencia (tolerancia {opciones.tolerancia:.0%})")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""Bocetos de la distribución de la baja: histogramas de cubetas fijas, sumables
+
+El cubo de agregados guarda, para cada celda de aeropuerto, tipo de obra,
+empresa y rango de importe, cuántas de sus licitaciones caen en cada cubeta de
+``ANCHO`` puntos de baja entre ``MINIMO`` y ``MAXIMO`` (solo las cubetas con
+alguna fila). Al ser cubetas fijas, el boceto de un grupo de celdas es la suma
+de los suyos: unir celdas (una vista por aeropuerto, por empresa...) es un
+``bincount`` sobre las entradas de las celdas y no hay que volver a ordenar las
+filas. Los bocetos también se pueden restar, así que se actualizan con los
+deltas de las recargas incrementales como el resto del cubo.
+
+Los percentiles siguen la interpolación lineal de ``Series.quantile``: cada
+una de las dos filas que rodean la posición del percentil se estima dentro de
+su cubeta, así que el resultado difiere del exacto en menos de ``ANCHO``. Las
+bajas fuera de [MINIMO, MAXIMO) cuentan en la primera o la última cubeta (ahí
+no hay cota); la media exacta sigue saliendo de las medidas del cubo.
+"""
+import numpy as np
+import pandas as pd
+
+# Cubetas de la baja (puntos porcentuales)
+MINIMO = -50.0
+MAXIMO = 100.0
+ANCHO = 0.25
+NUM_CUBETAS = int(round((MAXIMO - MINIMO) / ANCHO))
+
+# Suma sobre la matriz densa grupos x cubetas si no es más de DENSO veces mayor
+# que las entradas a sumar; si no, ordenando las entradas
+DENSO = 8
+
+# Percentiles de las vistas de distribución
+PERCENTILES = [0.1, 0.25, 0.5, 0.75, 0.9]
+
+
+def cubetas(baja):
+    """Cubeta de cada baja (-1 si está vacía)"""
+    valores = np.asarray(baja, dtype='float64')
+    with np.errstate(invalid='ignore'):
+        indices = np.clip(np.floor((valores - MINIMO) / ANCHO), 0, NUM_CUBETAS - 1)
+    return np.where(np.isnan(valores), -1, indices).astype('int64')
+
+
+def bordes(ancho=ANCHO):
+    """Límites de las cubetas de un ancho múltiplo de ANCHO"""
+    paso = _paso(ancho)
+    return MINIMO + ANCHO * np.arange(0, NUM_CUBETAS + paso, paso)
+
+
+def _paso(ancho):
+    paso = int(round(ancho / ANCHO))
+    if paso < 1 or NUM_CUBETAS % paso or abs(paso * ANCHO - ancho) > 1e-9:
+        raise ValueError(f"El ancho debe ser un múltiplo de {ANCHO} que divida el rango de la baja")
+    return paso
+
+
+class Bocetos:
+    """Histograma de la baja de cada grupo, disperso: solo las cubetas con filas
+
+    ``grupo``, ``cubeta`` y ``conteos`` son arrays paralelos ordenados por grupo
+    y cubeta; ``grupos`` tiene el valor de cada código de grupo.
+    """
+
+    def __init__(self, grupos, grupo, cubeta, conteos):
+        self.grupos = grupos
+        self.grupo = grupo
+        self.cubeta = cubeta
+        self.conteos = conteos
+
+    @classmethod
+    def sumar(cls, codigos, grupos, cubeta, n):
+        """Sumar las entradas (código de grupo, cubeta, filas) de las celdas de cada grupo"""
+        planos = np.asarray(codigos, dtype='int64') * NUM_CUBETAS + np.asarray(cubeta, dtype='int64')
+        if len(grupos) * NUM_CUBETAS <= DENSO * len(planos):
+            # Pocos grupos: se suma sobre todas las cubetas, sin ordenar
+            conteos = np.bincount(planos, weights=n, minlength=len(grupos) * NUM_CUBETAS)
+            claves = np.flatnonzero(conteos)
+            conteos = conteos[claves]
+        else:
+            claves, posiciones = np.unique(planos, return_inverse=True)
+            conteos = np.bincount(posiciones, weights=n, minlength=len(claves))
+            claves, conteos = claves[conteos > 0], conteos[conteos > 0]
+        return cls(grupos, claves // NUM_CUBETAS, claves % NUM_CUBETAS, conteos.astype('int64'))
+
+    def filas(self):
+        """Licitaciones con baja de cada grupo"""
+        return pd.Series(self._totales(), index=self.grupos, name='n_baja')
+
+    def _totales(self):
+        return np.bincount(self.grupo, weights=self.conteos, minlength=len(self.grupos)).astype('int64')
+
+    def cuantiles(self, percentiles=PERCENTILES):
+        """Percentiles de la baja de cada grupo (DataFrame con columnas p10, p50...)
+
+        Como en ``Series.quantile``, el percentil q está en la posición
+        h = (n - 1) * q de las filas ordenadas y se interpola linealmente entre
+        las filas floor(h) y ceil(h). Cada una se estima en su cubeta (ver
+        ``_filas``), así que el error frente a ``Series.quantile`` es menor que
+        ``ANCHO`` salvo para bajas fuera de [MINIMO, MAXIMO). Los grupos sin
+        filas quedan a NaN.
+        """
+        acumulado = np.cumsum(self.conteos)
+        total = self._totales()
+        inicio = np.cumsum(total) - total
+        resultado = {}
+        for q in percentiles:
+            posicion = np.maximum(total - 1, 0) * q
+            fraccion = posicion - np.floor(posicion)
+            inferior = self._filas(acumulado, inicio + np.floor(posicion))
+            superior = self._filas(acumulado, inicio + np.ceil(posicion))
+            valor = inferior + (superior - inferior) * fraccion
+            resultado[f'p{round(q * 100):g}'] = np.where(total > 0, valor, np.nan)
+        return pd.DataFrame(resultado, index=self.grupos)
+
+    def _filas(self, acumulado, posiciones):
+        """Baja estimada de las filas en ``posiciones`` del orden global (grupo y cubeta)
+
+        Una búsqueda binaria sobre el acumulado de las entradas da la cubeta de
+        cada fila; dentro de ella se suponen sus filas repartidas por igual,
+        cada una en el centro de su parte.
+        """
+        if not len(acumulado):
+            return np.full(len(posiciones), np.nan)
+        entrada = np.minimum(np.searchsorted(acumulado, posiciones, side='right'), len(acumulado) - 1)
+        anteriores = acumulado[entrada] - self.conteos[entrada]
+        fraccion = (posiciones - anteriores + 0.5) / self.conteos[entrada]
+        return MINIMO + ANCHO * (self.cubeta[entrada] + np.clip(fraccion, 0, 1))
+
+    def histograma(self, ancho=5.0):
+        """Filas de cada grupo por cubetas de ``ancho`` puntos (columnas: límite inferior)"""
+        columnas = NUM_CUBETAS // _paso(ancho)
+        planos = self.grupo * columnas + self.cubeta // _paso(ancho)
+        conteos = np.bincount(planos, weights=self.conteos, minlength=len(self.grupos) * columnas)
+        return pd.DataFrame(conteos.astype('int64').reshape(len(self.grupos), columnas), index=self.grupos, columns=bordes(ancho)[:-1])
+
+    def __len__(self):
+        return len(self.grupos)
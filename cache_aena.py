@@ -0,0 +1,86 @@
+"""Caché LRU de resultados por estado de filtros, compartida por todas las sesiones
+
+La clave de cada entrada parte de ``clave_estado``: un hash canónico de la
+versión de los datos y del diccionario de filtros del sidebar. Se guardan el
+cubo de agregados de la selección (las series agregadas de todos los gráficos)
+y cada figura serializada en JSON. Cuando el tamaño estimado de lo guardado
+supera el límite se descartan las entradas usadas hace más tiempo.
+"""
+import hashlib
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+# Límite de memoria de la caché (AENA_CACHE_MB, por defecto 64 MB)
+LIMITE_BYTES = int(float(os.environ.get('AENA_CACHE_MB', '64')) * 1024 * 1024)
+
+
+def clave_estado(version, filtros):
+    """Hash canónico de la versión de datos y los filtros (no depende del orden)"""
+    texto = json.dumps({'version': version, 'filtros': filtros}, sort_keys=True, default=str)
+    return hashlib.sha1(texto.encode('utf-8')).hexdigest()
+
+
+def tamano(valor):
+    """Tamaño aproximado en bytes de un valor guardado en la caché"""
+    if isinstance(valor, (str, bytes)):
+        return len(valor)
+    celdas = getattr(valor, 'celdas', None)  # CuboAgregados: celdas, bocetos + vistas
+    if celdas is not None:
+        return int(celdas.memory_usage(deep=True).sum() + valor.bocetos.memory_usage(deep=True).sum()) * 2
+    return sys.getsizeof(valor)
+
+
+class CacheLRU:
+    """Diccionario LRU con límite de memoria, seguro entre hilos"""
+
+    def __init__(self, limite_bytes=LIMITE_BYTES):
+        self.limite_bytes = limite_bytes
+        self._entradas = OrderedDict()  # clave -> (valor, bytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave, construir):
+        """Valor guardado para clave, o construir() guardado si no está"""
+        with self._lock:
+            if clave in self._entradas:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                return self._entradas[clave][0]
+            self.fallos += 1
+        valor = construir()
+        self.guardar(clave, valor)
+        return valor
+
+    def guardar(self, clave, valor):
+        """Guardar valor y descartar las entradas más antiguas si se supera el límite"""
+        bytes_valor = tamano(valor)
+        if bytes_valor > self.limite_bytes:
+            return
+        with self._lock:
+            if clave in self._entradas:
+                self._bytes -= self._entradas.pop(clave)[1]
+            self._entradas[clave] = (valor, bytes_valor)
+            self._bytes += bytes_valor
+            while self._bytes > self.limite_bytes:
+                _, (_, liberados) = self._entradas.popitem(last=False)
+                self._bytes -= liberados
+
+    def vaciar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._bytes = 0
+
+    @property
+    def bytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entradas)
+
+
+CACHE = CacheLRU()
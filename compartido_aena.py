@@ -0,0 +1,165 @@
+"""Dataset compartido entre varios procesos del dashboard (Arrow IPC mapeado en memoria)
+
+Con ``AENA_COMPARTIDO=1``, el primer proceso que necesita una versión de datos
+la carga como siempre (``cargar_libros``) y la publica como un archivo Arrow IPC
+sin comprimir en ``DIRECTORIO``. El resto de procesos, y los que arrancan
+después, no leen ni procesan nada: mapean ese archivo en memoria en solo
+lectura y construyen el DataFrame sobre él sin copiar las columnas de texto,
+que son casi toda la memoria del dataset. Las páginas mapeadas las comparte
+el sistema operativo entre todos los procesos.
+
+La publicación es atómica: el archivo de datos se escribe con otro nombre y
+luego se sustituye el puntero ``actual.json`` (versión y archivo) con un
+renombrado. Entre procesos, la carga se serializa con un cerrojo de archivo
+(fcntl) para que solo uno la haga; los demás esperan y mapean el resultado.
+
+Uso como script (cargar y publicar la versión actual, por ejemplo desde un
+proceso cargador aparte):
+
+    python compartido_aena.py
+"""
+import glob
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin cerrojo entre procesos
+    fcntl = None
+
+from datos_aena import DIRECTORIO_CACHE, PARQUET_DISPONIBLE, _escribir_atomico, _volcar_json
+
+ACTIVO = os.environ.get('AENA_COMPARTIDO', '').lower() in ('1', 'true', 'si', 'sí') and PARQUET_DISPONIBLE
+
+# Directorio de los archivos publicados (el mismo para todos los procesos)
+DIRECTORIO = os.environ.get('AENA_COMPARTIDO_DIR', os.path.join(DIRECTORIO_CACHE, 'compartido'))
+
+PUNTERO = 'actual.json'
+BLOQUEO = '.bloqueo'
+
+# Versiones publicadas que se conservan (la actual y la anterior, que algún
+# proceso puede tener aún mapeada)
+VERSIONES_CONSERVADAS = 2
+
+_lock = threading.Lock()
+
+
+def _archivo(version):
+    return f'datos-{version}.arrow'
+
+
+def version_publicada(directorio=DIRECTORIO):
+    """(versión, ruta del archivo) publicados, o (None, None)"""
+    try:
+        with open(os.path.join(directorio, PUNTERO), encoding='utf-8') as f:
+            puntero = json.load(f)
+        ruta = os.path.join(directorio, puntero['archivo'])
+        return (puntero['version'], ruta) if os.path.exists(ruta) else (None, None)
+    except (OSError, ValueError, KeyError):
+        return None, None
+
+
+def publicar(df, version, directorio=DIRECTORIO):
+    """Escribir el dataset de una versión y hacerlo la versión publicada"""
+    import pyarrow as pa
+
+    os.makedirs(directorio, exist_ok=True)
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+
+    def escribir(destino):
+        # Sin compresión: los buffers del archivo se usan tal cual al mapearlo
+        with pa.OSFile(destino, 'wb') as salida, pa.ipc.new_file(salida, tabla.schema) as escritor:
+            escritor.write_table(tabla)
+
+    _escribir_atomico(os.path.join(directorio, _archivo(version)), escribir)
+    puntero = {'version': version, 'archivo': _archivo(version), 'filas': len(df), 'publicado': time.time()}
+    _escribir_atomico(os.path.join(directorio, PUNTERO), lambda destino: _volcar_json(puntero, destino))
+    _limpiar(directorio, version)
+
+
+def _limpiar(directorio, version):
+    """Borrar las versiones antiguas (en Linux, quien las tenga mapeadas las conserva)"""
+    archivos = sorted(glob.glob(os.path.join(directorio, 'datos-*.arrow')), key=os.path.getmtime, reverse=True)
+    actual = os.path.join(directorio, _archivo(version))
+    antiguos = [ruta for ruta in archivos if ruta != actual][VERSIONES_CONSERVADAS - 1:]
+    for ruta in antiguos:
+        try:
+            os.remove(ruta)
+        except OSError:
+            pass  # En uso (Windows): se borrará en otra publicación
+
+
+def mapear(ruta):
+    """DataFrame sobre el archivo publicado, mapeado en memoria en solo lectura
+
+    Las columnas de texto (cadenas de Arrow) y las numéricas sin vacíos quedan
+    sobre las páginas del archivo; solo se copian los códigos de las
+    categóricas y las columnas con vacíos.
+    """
+    import pyarrow as pa
+
+    with pa.memory_map(ruta, 'r') as fuente:
+        tabla = pa.ipc.open_file(fuente).read_all()
+    return tabla.to_pandas(split_blocks=True)
+
+
+@contextmanager
+def _bloqueo(directorio):
+    """Cerrojo entre procesos (y entre hilos del proceso) para cargar y publicar"""
+    os.makedirs(directorio, exist_ok=True)
+    with _lock, open(os.path.join(directorio, BLOQUEO), 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def obtener(version, cargar, directorio=DIRECTORIO):
+    """Dataset de la versión indicada como (df, delta), mapeado del archivo publicado
+
+    Si no está publicada, la carga ``cargar()`` (que devuelve (df, delta), como
+    ``datos_aena.cargar_libros``) en un solo proceso, que la publica.
+    """
+    publicada, ruta = version_publicada(directorio)
+    if publicada == version:
+        return mapear(ruta), None
+    with _bloqueo(directorio):
+        # Otro proceso pudo publicarla mientras esperábamos
+        publicada, ruta = version_publicada(directorio)
+        if publicada == version:
+            return mapear(ruta), None
+        df, delta = cargar()
+        if df is None:
+            return None, None
+        publicar(df, version, directorio)
+    # También quien la carga se queda con la copia mapeada (y libera la suya)
+    return mapear(os.path.join(directorio, _archivo(version))), delta
+
+
+def main():
+    import dashboard_aena
+    import datos_aena
+    import empresas_aena
+
+    datos_aena.activar_copy_on_write()
+    libros = datos_aena.descubrir_libros()
+    if not libros:
+        print(f"No se encontraron archivos {datos_aena.PATRON_LIBROS} en: {os.path.abspath(datos_aena.DIRECTORIO_DATOS)}")
+        return 1
+    procesado = datos_aena.version_procesado(dashboard_aena.procesar_datos, empresas_aena)
+    clave = datos_aena.clave_libros(libros, procesado)
+    inicio = time.perf_counter()
+    df, _ = obtener(clave, lambda: datos_aena.cargar_libros(libros, dashboard_aena.procesar_datos, procesado))
+    print(f"Versión {clave} publicada en {os.path.abspath(DIRECTORIO)}: {len(df)} filas ({time.perf_counter() - inicio:.1f} s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,81 +1,158 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+from streamlit.errors import StreamlitAPIException
 import os
-from datetime import datetime, timedelta
-import numpy as np
-
-# Configuración de la página
-st.set_page_config(
-    page_title="Dashboard Licitaciones AENA",
-    page_icon="✈️",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
-
-# CSS personalizado
-st.markdown("""
-<style>
-    .main-header {
-        background: linear-gradient(90deg, #1f4e79 0%, #2d5a87 100%);
-        padding: 1rem;
-        border-radius: 10px;
-        color: white;
-        text-align: center;
-        margin-bottom: 2rem;
-    }
-    .metric-card {
-        background: white;
-        padding: 1rem;
-        border-radius: 10px;
-        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        border-left: 4px solid #1f4e79;
-    }
-    .sidebar .sidebar-content {
-        background: linear-gradient(180deg, #f8f9fa 0%, #e9ecef 100%);
-    }
-</style>
-""", unsafe_allow_html=True)
+from datetime import datetime
+
+import arranque_aena
+import instrumentacion_aena
+import vigilante_aena
+
+# Módulos pesados: se importan al usarlos por primera vez (en el hilo de
+# precalentamiento), de modo que la página empieza a dibujarse enseguida
+importar_diferido = arranque_aena.importar_diferido
+pd = importar_diferido('pandas')
+np = importar_diferido('numpy')
+px = importar_diferido('plotly.express')
+go = importar_diferido('plotly.graph_objects')
+pio = importar_diferido('plotly.io')
+agregados_aena = importar_diferido('agregados_aena')
+api_aena = importar_diferido('api_aena')
+cache_aena = importar_diferido('cache_aena')
+compartido_aena = importar_diferido('compartido_aena')
+datos_aena = importar_diferido('datos_aena')
+empresas_aena = importar_diferido('empresas_aena')
+exportar_aena = importar_diferido('exportar_aena')
+indices_aena = importar_diferido('indices_aena')
+sql_aena = importar_diferido('sql_aena')
 
 def cargar_datos():
-    """Cargar datos de licitaciones desde archivo Excel"""
+    """Cargar datos de licitaciones de todos los libros Excel anuales (o desde la caché en disco)
+
+    El DataFrame resultante se comparte entre todas las sesiones y no debe modificarse.
+    """
     try:
-        excel_file = "2024_AENA.xlsx"
-        if os.path.exists(excel_file):
-            df = pd.read_excel(excel_file)
-            
-            # Mantener las columnas originales del Excel y crear columnas adicionales para el dashboard
-            df_processed = df.copy()
-            
-            # Crear columnas adicionales para compatibilidad con el dashboard
-            if 'Clasificación' in df_processed.columns:
-                df_processed['Tipo_Obra'] = df_processed['Clasificación']
-            if 'Adjudicatario licitación/lote' in df_processed.columns:
-                df_processed['Empresa_Adjudicataria'] = df_processed['Adjudicatario licitación/lote']
-            if 'Presupuesto base sin impuestos' in df_processed.columns:
-                df_processed['Presupuesto_Base'] = df_processed['Presupuesto base sin impuestos']
-            if 'Importe adjudicación sin impuestos licitación/lote' in df_processed.columns:
-                df_processed['Importe_Adjudicado'] = df_processed['Importe adjudicación sin impuestos licitación/lote']
-            if 'Fecha presentación licitación' in df_processed.columns:
-                df_processed['Fecha_Publicacion'] = df_processed['Fecha presentación licitación']
-            if '%baja' in df_processed.columns:
-                df_processed['Porcentaje_Baja'] = df_processed['%baja']
-            
-            # Limpiar y procesar los datos
-            df_processed = procesar_datos(df_processed)
+        # Con el vigilante en marcha los libros nuevos se cargan en segundo plano
+        if vigilante_aena.en_marcha() and datos_aena.REGISTRO.df is not None:
+            return datos_aena.REGISTRO.df
+        libros = datos_aena.descubrir_libros()
+        if libros:
+            # Un libro solo se vuelve a leer si cambia el archivo o la lógica de procesado
+            version = datos_aena.version_procesado(procesar_datos, empresas_aena)
+            clave = datos_aena.clave_libros(libros, version)
+            cargar_libros = lambda: datos_aena.cargar_libros(libros, procesar_datos, version)
+            if compartido_aena.ACTIVO:
+                # Un solo proceso carga y publica la versión; el resto la mapea
+                cargar = lambda: compartido_aena.obtener(clave, cargar_libros)
+            else:
+                cargar = cargar_libros
+            df_processed = datos_aena.REGISTRO.obtener(clave, cargar)
             
             return df_processed
         else:
-            st.error(f"Archivo no encontrado: {excel_file}")
+            st.error(f"No se encontraron archivos {datos_aena.PATRON_LIBROS} en: {os.path.abspath(datos_aena.DIRECTORIO_DATOS)}")
             return None
     except Exception as e:
         st.error(f"Error al cargar datos: {e}")
         return None
 
-def procesar_datos(df):
-    """Procesar y limpiar los datos del Excel"""
+def instantanea_datos():
+    """Cargar los datos y devolver la instantánea del registro (None si no hay datos)
+
+    Versión, dataset y derivados salen de una sola lectura del registro: si el
+    vigilante cambia el dataset durante un rerun, la sesión termina el rerun
+    con la versión de su instantánea.
+    """
+    for _ in range(2):
+        if cargar_datos() is None:
+            return None
+        datos = datos_aena.REGISTRO.instantanea()
+        if datos.df is not None:
+            return datos
+        # Otra sesión ha vaciado el registro (Recargar datos) entretanto: se vuelve a cargar
+    return None
+
+def cargar_almacen():
+    """Abrir el backend SQL (sql_aena) con la versión actual de los libros Excel
+
+    Los libros solo se cargan y vuelcan a la base de datos si han cambiado.
+    """
+    try:
+        if vigilante_aena.en_marcha() and sql_aena.almacen_actual() is not None:
+            return sql_aena.almacen_actual()
+        libros = datos_aena.descubrir_libros()
+        if libros:
+            version = datos_aena.version_procesado(procesar_datos, empresas_aena)
+            return sql_aena.obtener_almacen(
+                datos_aena.clave_libros(libros, version),
+                lambda: datos_aena.cargar_libros(libros, procesar_datos, version)[0]
+            )
+        else:
+            st.error(f"No se encontraron archivos {datos_aena.PATRON_LIBROS} en: {os.path.abspath(datos_aena.DIRECTORIO_DATOS)}")
+            return None
+    except Exception as e:
+        st.error(f"Error al cargar datos: {e}")
+        return None
+
+def firma_datos():
+    """Clave de la versión de datos de los libros del directorio, sin leerlos (None si no hay)"""
+    libros = datos_aena.descubrir_libros()
+    if not libros:
+        return None
+    return datos_aena.clave_libros(libros, datos_aena.version_procesado(procesar_datos, empresas_aena))
+
+def recargar_datos(clave):
+    """Cargar, validar y poner en uso la versión ``clave`` de firma_datos (en el hilo del vigilante)
+
+    Lanza una excepción, sin tocar la versión en uso, si los libros no se pueden
+    leer, el resultado no es válido o los libros ya no corresponden a ``clave``
+    (han vuelto a cambiar: el vigilante cargará la nueva firma).
+    """
+    libros = datos_aena.descubrir_libros()
+    version = datos_aena.version_procesado(procesar_datos, empresas_aena)
+    if datos_aena.clave_libros(libros, version) != clave:
+        raise ValueError(f"los libros han cambiado desde la firma {clave}")
+    
+    def cargar():
+        df, delta = datos_aena.cargar_libros(libros, procesar_datos, version)
+        datos_aena.validar_dataset(df)
+        return df, delta
+    
+    if sql_aena.ACTIVO:
+        sql_aena.obtener_almacen(clave, lambda: cargar()[0])
+        return clave
+    if compartido_aena.ACTIVO:
+        df, delta = compartido_aena.obtener(clave, cargar)
+    else:
+        df, delta = cargar()
+    datos_aena.REGISTRO.sustituir(clave, df, delta)
+    return clave
+
+def version_vigente():
+    """Versión de datos en uso en el proceso"""
+    if sql_aena.ACTIVO:
+        almacen = sql_aena.almacen_actual()
+        return almacen.version if almacen is not None else None
+    return datos_aena.REGISTRO.version
+
+def vigilar_datos():
+    """Arrancar (una vez por proceso) el vigilante de los libros con la versión en uso"""
+    if vigilante_aena.ACTIVO:
+        vigilante_aena.arrancar(firma_datos, recargar_datos, vigente=version_vigente())
+
+def aviso_datos_nuevos(version):
+    """Avisar si hay una versión de datos más reciente que la que muestra la sesión"""
+    if version_vigente() not in (None, version):
+        st.info("🔄 Hay datos nuevos disponibles. Se mostrarán al actualizar o al cambiar cualquier filtro.")
+        if st.button("Actualizar datos", key="actualizar_datos"):
+            st.rerun()
+
+# En versiones de Streamlit con fragmentos el aviso se comprueba solo, sin rerun de la página
+if vigilante_aena.ACTIVO and hasattr(st, 'fragment'):
+    aviso_datos_nuevos = st.fragment(run_every=vigilante_aena.INTERVALO)(aviso_datos_nuevos)
+
+@instrumentacion_aena.tramo('procesado')
+def procesar_datos(df, tipar=True):
+    """Procesar y limpiar los datos del Excel (con tipar=True, en tipos compactos)"""
     try:
         # Convertir fecha a datetime
         if 'Fecha_Publicacion' in df.columns:
@@ -106,23 +183,65 @@ def procesar_datos(df):
             if col in df.columns:
                 df[col] = df[col].fillna('No especificado')
         
+        # Nombre canónico del adjudicatario y miembros de las UTE
+        if 'Empresa_Adjudicataria' in df.columns:
+            df = empresas_aena.RESOLUTOR.aplicar(df)
+        
         # Eliminar filas con datos críticos faltantes
         df = df.dropna(subset=['Aeropuerto', 'Presupuesto_Base'])
         
+        # Categorical para las dimensiones y números reducidos sin pérdida
+        if tipar:
+            df = datos_aena.aplicar_esquema(df)
+        
         return df
     except Exception as e:
         st.error(f"Error al procesar datos: {e}")
         return df
 
-def mostrar_tabla_detallada(df):
-    """Mostrar tabla detallada de licitaciones como el Excel con búsqueda"""
-    st.subheader("📊 Datos Detallados")
+# Tamaños de página de la tabla detallada
+TAMANOS_PAGINA = [25, 50, 100, 250, 500]
+
+def posiciones_pagina(df, columna, descendente, inicio, fin):
+    """Posiciones de las filas de una página de df ordenado por columna (None: orden original)"""
+    if columna is None:
+        return np.arange(inicio, min(fin, len(df)))
+    ordenada = df[columna].reset_index(drop=True).sort_values(
+        ascending=not descendente, kind='stable', na_position='last'
+    )
+    return ordenada.index.to_numpy()[inicio:fin]
+
+class TablaPandas:
+    """Resultado de la tabla detallada sobre un DataFrame en memoria (ver sql_aena.TablaSQL)"""
     
-    # Crear una copia del DataFrame para mostrar
-    df_mostrar = df.copy()
+    def __init__(self, df):
+        self.df = df
+        self.columnas = df.columns.tolist()
     
-    # Usar las columnas exactas del Excel (omitir Estado y Órgano de Contratación)
-    columnas_mostrar = [
+    def __len__(self):
+        return len(self.df)
+    
+    def pagina(self, orden, descendente, inicio, tamano):
+        return self.df.iloc[posiciones_pagina(self.df, orden, descendente, inicio, inicio + tamano)]
+    
+    def exportar(self, formato, orden, descendente):
+        posiciones = posiciones_pagina(self.df, orden, descendente, 0, len(self.df))
+        return exportar_aena.exportar(self.df, formato, posiciones)
+
+def boton_descarga(label, generar, file_name, mime):
+    """Botón de descarga que solo genera el fichero cuando se pide
+
+    Con versiones de Streamlit que no aceptan un callable en ``data`` se
+    genera en un segundo paso, tras pulsar "Preparar".
+    """
+    try:
+        st.download_button(label=label, data=generar, file_name=file_name, mime=mime)
+    except (TypeError, RuntimeError, StreamlitAPIException):
+        if st.button(f"⚙️ Preparar: {label}", key=f"preparar_{label}"):
+            st.download_button(label=label, data=generar(), file_name=file_name, mime=mime)
+
+# Columnas de la tabla detallada: las exactas del Excel (sin Estado ni Órgano de Contratación)
+COLUMNAS_TABLA = [
         'Link licitación',
         'Aeropuerto', 
         'Número de expediente',
@@ -133,32 +252,27 @@ def mostrar_tabla_detallada(df):
         'Importe adjudicación sin impuestos licitación/lote',
         '%baja',
         'Clasificación'
-    ]
+]
+
+def mostrar_tabla_detallada(df, indice_texto=None, almacen=None, filtros=None):
+    """Mostrar tabla detallada de licitaciones como el Excel con búsqueda
+
+    Con un índice de texto (indices_aena.IndiceTexto) del dataset completo, la
+    búsqueda se resuelve en el índice; df debe conservar sus etiquetas de fila.
+    Con el backend SQL (almacen y filtros, sin df) la búsqueda, el orden y la
+    paginación se resuelven en la base de datos.
+    """
+    st.subheader("📊 Datos Detallados")
     
-    # Filtrar solo las columnas que existen
-    columnas_existentes = [col for col in columnas_mostrar if col in df_mostrar.columns]
-    df_tabla = df_mostrar[columnas_existentes].copy()
-    
-    # Formatear la columna de porcentaje de baja (multiplicar por 100 para mostrar como porcentaje)
-    if '%baja' in df_tabla.columns:
-        df_tabla['%baja'] = df_tabla['%baja'].apply(lambda x: f"{x*100:.2f}%")
-    
-    # Formatear números con separadores de miles
-    if 'Presupuesto base sin impuestos' in df_tabla.columns:
-        df_tabla['Presupuesto base sin impuestos'] = df_tabla['Presupuesto base sin impuestos'].apply(lambda x: f"{x:,.2f}€")
-    if 'Importe adjudicación sin impuestos licitación/lote' in df_tabla.columns:
-        df_tabla['Importe adjudicación sin impuestos licitación/lote'] = df_tabla['Importe adjudicación sin impuestos licitación/lote'].apply(lambda x: f"{x:,.2f}€")
-    
-    # Formatear fechas correctamente
-    if 'Fecha presentación licitación' in df_tabla.columns:
-        df_tabla['Fecha presentación licitación'] = df_tabla['Fecha presentación licitación'].dt.strftime('%d/%m/%Y')
-    
-    # Mantener el link completo sin modificar
-    if 'Link licitación' in df_tabla.columns:
-        # Mantener el link original para que se vea completo
-        df_tabla['Link licitación'] = df_tabla['Link licitación'].apply(
-            lambda x: str(x) if pd.notna(x) and str(x).strip() != '' else ''
-        )
+    # Filtrar solo las columnas que existen. Importes, fechas y links se pasan
+    # sin formatear: el formato lo aplica la tabla (column_config) a las filas visibles
+    if almacen is not None:
+        columnas_existentes = [col for col in COLUMNAS_TABLA if col in almacen.columnas]
+        total_tabla = almacen.contar(filtros)
+    else:
+        columnas_existentes = [col for col in COLUMNAS_TABLA if col in df.columns]
+        df_tabla = df[columnas_existentes]
+        total_tabla = len(df_tabla)
     
     # Buscador
     st.subheader("🔍 Buscar Licitación")
@@ -168,17 +282,51 @@ def mostrar_tabla_detallada(df):
     )
     
     # Filtrar datos según la búsqueda
-    if busqueda:
+    filas_encontradas = indice_texto.buscar(busqueda) if busqueda and indice_texto is not None else None
+    if almacen is not None:
+        resultado = sql_aena.TablaSQL(almacen, filtros, busqueda, columnas_existentes)
+    elif filas_encontradas is not None:
+        # Filas encontradas que siguen en la tabla tras los filtros del sidebar
+        resultado = TablaPandas(df_tabla.iloc[indices_aena.posiciones_de(df_tabla.index.to_numpy(), filas_encontradas)])
+    elif busqueda:
         # Crear máscara para búsqueda en todas las columnas de texto
         mask = df_tabla.astype(str).apply(lambda x: x.str.contains(busqueda, case=False, na=False)).any(axis=1)
-        df_filtrado = df_tabla[mask]
-        st.info(f"📊 Mostrando {len(df_filtrado)} resultados de {len(df_tabla)} licitaciones")
+        resultado = TablaPandas(df_tabla[mask])
+    else:
+        resultado = TablaPandas(df_tabla)
+    if busqueda:
+        st.info(f"📊 Mostrando {len(resultado)} resultados de {total_tabla} licitaciones")
     else:
-        df_filtrado = df_tabla
-        st.info(f"📊 Mostrando todas las {len(df_tabla)} licitaciones")
+        st.info(f"📊 Mostrando todas las {total_tabla} licitaciones")
     
     # Mostrar información sobre las columnas
-    st.write(f"**Columnas mostradas:** {', '.join(df_filtrado.columns.tolist())}")
+    st.write(f"**Columnas mostradas:** {', '.join(resultado.columnas)}")
+    
+    # Orden y paginación en el servidor: solo se envía al navegador la página visible
+    sin_orden = "(orden original)"
+    col_orden, col_sentido, col_tamano, col_pagina = st.columns([3, 2, 2, 2])
+    with col_orden:
+        orden = st.selectbox("Ordenar por", [sin_orden] + resultado.columnas, key="datos_orden")
+    with col_sentido:
+        sentido = st.selectbox("Sentido", ["Ascendente", "Descendente"], key="datos_sentido")
+    with col_tamano:
+        tamano = st.selectbox("Filas por página", TAMANOS_PAGINA, index=1, key="datos_tamano")
+    total_paginas = max(1, -(-len(resultado) // tamano))
+    # Si la búsqueda o los filtros reducen las páginas, volver a la última
+    if st.session_state.get("datos_pagina", 1) > total_paginas:
+        st.session_state["datos_pagina"] = total_paginas
+    with col_pagina:
+        pagina = st.number_input("Página", min_value=1, max_value=total_paginas, step=1, key="datos_pagina")
+    
+    inicio = (int(pagina) - 1) * tamano
+    columna_orden = None if orden == sin_orden else orden
+    df_vista = resultado.pagina(columna_orden, sentido == "Descendente", inicio, tamano)
+    if len(resultado):
+        st.caption(f"Filas {inicio + 1}-{inicio + len(df_vista)} de {len(resultado)} · página {int(pagina)} de {total_paginas}")
+    
+    # %baja se guarda como fracción; se muestra en porcentaje (solo la página visible)
+    if '%baja' in df_vista.columns:
+        df_vista = df_vista.assign(**{'%baja': df_vista['%baja'].astype('float64') * 100})
     
     # Mostrar la tabla usando st.dataframe (más confiable)
     st.markdown("""
@@ -194,12 +342,12 @@ def mostrar_tabla_detallada(df):
     
     # Mostrar la tabla con st.dataframe
     st.dataframe(
-        df_filtrado,
+        df_vista,
         use_container_width=True,
         height=600,
         hide_index=True,
         column_config={
-            "Link licitación": st.column_config.TextColumn(
+            "Link licitación": st.column_config.LinkColumn(
                 "Link licitación",
                 help="URL completa de la licitación",
                 width="large"
@@ -216,24 +364,28 @@ def mostrar_tabla_detallada(df):
                 "Objeto del Contrato",
                 width="large"
             ),
-            "Presupuesto base sin impuestos": st.column_config.TextColumn(
+            "Presupuesto base sin impuestos": st.column_config.NumberColumn(
                 "Presupuesto base sin impuestos",
+                format="%,.2f€",
                 width="medium"
             ),
-            "Fecha presentación licitación": st.column_config.TextColumn(
+            "Fecha presentación licitación": st.column_config.DateColumn(
                 "Fecha presentación licitación",
+                format="DD/MM/YYYY",
                 width="medium"
             ),
             "Adjudicatario licitación/lote": st.column_config.TextColumn(
                 "Adjudicatario licitación/lote",
                 width="large"
             ),
-            "Importe adjudicación sin impuestos licitación/lote": st.column_config.TextColumn(
+            "Importe adjudicación sin impuestos licitación/lote": st.column_config.NumberColumn(
                 "Importe adjudicación sin impuestos licitación/lote",
+                format="%,.2f€",
                 width="medium"
             ),
-            "%baja": st.column_config.TextColumn(
+            "%baja": st.column_config.NumberColumn(
                 "%baja",
+                format="%.2f%%",
                 width="small"
             ),
             "Clasificación": st.column_config.TextColumn(
@@ -247,15 +399,19 @@ def mostrar_tabla_detallada(df):
     st.markdown("</div>", unsafe_allow_html=True)
     
     # Mostrar información adicional sobre los links
-    if 'Link licitación' in df_filtrado.columns:
+    if 'Link licitación' in resultado.columnas:
         st.info("💡 **Nota:** Los links completos se muestran en la primera columna. Puedes copiar la URL para acceder a la información detallada.")
         
         # Mostrar algunos enlaces de ejemplo clickeables
-        if len(df_filtrado) > 0:
+        if len(resultado) > 0:
             st.subheader("🔗 Enlaces clickeables (primeras 10 licitaciones)")
             
             # Obtener los datos originales con los links
-            df_links_ejemplo = df_mostrar[['Link licitación', 'Aeropuerto', 'Número de expediente', 'Objeto del Contrato']].head(10)
+            columnas_links = ['Link licitación', 'Aeropuerto', 'Número de expediente', 'Objeto del Contrato']
+            if almacen is not None:
+                df_links_ejemplo = almacen.pagina(columnas_links, filtros, tamano=10)
+            else:
+                df_links_ejemplo = df[columnas_links].head(10)
             df_links_ejemplo = df_links_ejemplo[df_links_ejemplo['Link licitación'].notna()]
             
             # Crear columnas para mostrar los enlaces
@@ -269,81 +425,87 @@ def mostrar_tabla_detallada(df):
                         st.markdown(f"*{row['Objeto del Contrato'][:50]}...*")
                         st.markdown("---")
     
-    # Botón de descarga
-    csv = df_filtrado.to_csv(index=False)
-    st.download_button(
-        label="📥 Descargar datos filtrados como CSV",
-        data=csv,
-        file_name=f"licitaciones_aena_filtradas_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-        mime="text/csv"
+    # Descarga de todas las filas encontradas, en el orden elegido y con los
+    # valores tipados; el fichero se escribe por bloques solo al pulsar el botón
+    formato = st.radio("Formato de descarga", exportar_aena.formatos_disponibles(), horizontal=True, key="datos_formato")
+    extension, mime = exportar_aena.FORMATOS[formato]
+    
+    def generar_exportacion():
+        # Streamlit guarda el fichero entero para servirlo: se lee una sola vez
+        with resultado.exportar(formato, columna_orden, sentido == "Descendente") as fichero:
+            return fichero.read()
+    
+    boton_descarga(
+        f"📥 Descargar datos filtrados como {formato}",
+        generar_exportacion,
+        file_name=f"licitaciones_aena_filtradas_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}",
+        mime=mime
     )
 
 # ===== FUNCIONES PARA ANÁLISIS TEMPORAL =====
+# Todos los gráficos reciben el cubo de agregados del DataFrame filtrado
+# (agregados_aena.construir_cubo) en lugar de recorrer las filas
 
-def crear_grafico_licitaciones_tiempo(df):
+def crear_grafico_licitaciones_tiempo(cubo):
     """Crear gráfico de licitaciones a lo largo del tiempo (anual)"""
-    df_temp = df.copy()
-    df_temp['Año'] = df_temp['Fecha_Publicacion'].dt.year
-    df_temporal = df_temp.groupby('Año').size().reset_index(name='Licitaciones')
+    df_temporal = cubo.vista('Año')['n'].reset_index(name='Licitaciones')
     df_temporal = df_temporal.sort_values('Año')
     fig = px.line(df_temporal, x='Año', y='Licitaciones', title="Licitaciones a lo largo del tiempo (Anual)", markers=True)
     fig.update_layout(height=400, xaxis_title="Año", yaxis_title="Número de Licitaciones")
     return fig
 
-def crear_grafico_presupuesto_tiempo(df):
+def crear_grafico_presupuesto_tiempo(cubo):
     """Crear gráfico de presupuesto base e importe adjudicado a lo largo del tiempo (anual)"""
-    df_temp = df.copy()
-    df_temp['Año'] = df_temp['Fecha_Publicacion'].dt.year
-    df_temporal = df_temp.groupby('Año').agg({'Presupuesto_Base': 'sum', 'Importe_Adjudicado': 'sum'}).reset_index()
+    df_temporal = cubo.vista('Año')[['presupuesto', 'importe']].reset_index()
     df_temporal = df_temporal.sort_values('Año')
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=df_temporal['Año'], y=df_temporal['Presupuesto_Base'] / 1e6, mode='lines+markers', name='Presupuesto Base', line=dict(color='blue')))
-    fig.add_trace(go.Scatter(x=df_temporal['Año'], y=df_temporal['Importe_Adjudicado'] / 1e6, mode='lines+markers', name='Importe Adjudicado', line=dict(color='red')))
+    fig.add_trace(go.Scatter(x=df_temporal['Año'], y=df_temporal['presupuesto'] / 1e6, mode='lines+markers', name='Presupuesto Base', line=dict(color='blue')))
+    fig.add_trace(go.Scatter(x=df_temporal['Año'], y=df_temporal['importe'] / 1e6, mode='lines+markers', name='Importe Adjudicado', line=dict(color='red')))
     fig.update_layout(title="Presupuesto Base e Importe Adjudicado a lo largo del tiempo (Anual)", xaxis_title="Año", yaxis_title="Importe (M€)", height=400)
     return fig
 
-def crear_grafico_licitaciones_mes(df):
+def crear_grafico_licitaciones_mes(cubo):
     """Crear gráfico de número total de adjudicaciones por mes"""
-    df_mensual = df.groupby('Mes').size().reset_index(name='Licitaciones')
+    df_mensual = cubo.vista('Mes')['n'].reset_index(name='Licitaciones')
     fig = px.bar(df_mensual, x='Mes', y='Licitaciones', title="Número total de adjudicaciones por mes", color='Licitaciones', color_continuous_scale='Blues')
     fig.update_layout(height=400, xaxis_title="Mes", yaxis_title="Número de Licitaciones")
     return fig
 
 # ===== FUNCIONES PARA ANÁLISIS POR AEROPUERTO =====
 
-def crear_grafico_aeropuerto_licitaciones(df):
+def crear_grafico_aeropuerto_licitaciones(cubo):
     """Top 10 Aeropuertos por número de licitaciones"""
-    licitaciones_aeropuerto = df['Aeropuerto'].value_counts().head(10)
+    licitaciones_aeropuerto = agregados_aena.top_k(cubo, 'Aeropuerto', 'n')
     fig = px.bar(x=licitaciones_aeropuerto.values, y=licitaciones_aeropuerto.index, orientation='h', title="Top 10 Aeropuertos por Número de Licitaciones", labels={'x': 'Número de Licitaciones', 'y': 'Aeropuerto'}, color=licitaciones_aeropuerto.values, color_continuous_scale='Blues')
     fig.update_layout(height=400, showlegend=False, yaxis={'categoryorder': 'total ascending'})
     return fig
 
-def crear_grafico_aeropuerto_baja(df):
+def crear_grafico_aeropuerto_baja(cubo):
     """Top 10 Aeropuertos por porcentaje de baja (horizontal)"""
-    baja_aeropuerto = df.groupby('Aeropuerto')['Porcentaje_Baja'].mean().sort_values(ascending=False).head(10)
+    baja_aeropuerto = agregados_aena.top_k(cubo, 'Aeropuerto', 'baja_media')
     fig = px.bar(x=baja_aeropuerto.values, y=baja_aeropuerto.index, orientation='h', title="Top 10 Aeropuertos por Porcentaje de Baja", labels={'x': 'Porcentaje de Baja (%)', 'y': 'Aeropuerto'}, color=baja_aeropuerto.values, color_continuous_scale='Reds')
     fig.update_layout(height=400, showlegend=False, yaxis={'categoryorder': 'total ascending'})
     return fig
 
-def crear_grafico_aeropuerto_presupuesto(df):
+def crear_grafico_aeropuerto_presupuesto(cubo):
     """Top 10 Aeropuertos por presupuesto base"""
-    presupuesto_aeropuerto = df.groupby('Aeropuerto')['Presupuesto_Base'].sum().sort_values(ascending=False).head(10)
+    presupuesto_aeropuerto = agregados_aena.top_k(cubo, 'Aeropuerto', 'presupuesto')
     fig = px.bar(x=presupuesto_aeropuerto.values / 1e6, y=presupuesto_aeropuerto.index, orientation='h', title="Top 10 Aeropuertos por Presupuesto Base", labels={'x': 'Presupuesto Base (M€)', 'y': 'Aeropuerto'}, color=presupuesto_aeropuerto.values, color_continuous_scale='Greens')
     fig.update_layout(height=400, showlegend=False, yaxis={'categoryorder': 'total ascending'})
     return fig
 
-def crear_grafico_aeropuerto_adjudicacion(df):
+def crear_grafico_aeropuerto_adjudicacion(cubo):
     """Top 10 Aeropuertos por importe adjudicado"""
-    adjudicacion_aeropuerto = df.groupby('Aeropuerto')['Importe_Adjudicado'].sum().sort_values(ascending=False).head(10)
+    adjudicacion_aeropuerto = agregados_aena.top_k(cubo, 'Aeropuerto', 'importe')
     fig = px.bar(x=adjudicacion_aeropuerto.values / 1e6, y=adjudicacion_aeropuerto.index, orientation='h', title="Top 10 Aeropuertos por Importe Adjudicado", labels={'x': 'Importe Adjudicado (M€)', 'y': 'Aeropuerto'}, color=adjudicacion_aeropuerto.values, color_continuous_scale='Purples')
     fig.update_layout(height=400, showlegend=False, yaxis={'categoryorder': 'total ascending'})
     return fig
 
-def crear_grafico_aeropuerto_tipo_obra(df):
+def crear_grafico_aeropuerto_tipo_obra(cubo):
     """Gráfico de aeropuertos con distribución por tipo de obra"""
-    df_agrupado = df.groupby(['Aeropuerto', 'Tipo_Obra']).size().reset_index(name='Licitaciones')
+    df_agrupado = cubo.vista('Aeropuerto', 'Tipo_Obra')['n'].reset_index(name='Licitaciones')
     df_agrupado = df_agrupado.sort_values('Licitaciones', ascending=False)
-    top_aeropuertos = df['Aeropuerto'].value_counts().head(10).index
+    top_aeropuertos = agregados_aena.top_k(cubo, 'Aeropuerto', 'n').index
     df_agrupado = df_agrupado[df_agrupado['Aeropuerto'].isin(top_aeropuertos)]
     fig = px.bar(df_agrupado, x='Licitaciones', y='Aeropuerto', color='Tipo_Obra', orientation='h', title="Distribución de Licitaciones por Aeropuerto y Tipo de Obra", labels={'x': 'Número de Licitaciones', 'y': 'Aeropuerto'})
     fig.update_layout(height=500, yaxis={'categoryorder': 'total ascending'})
@@ -351,45 +513,45 @@ def crear_grafico_aeropuerto_tipo_obra(df):
 
 # ===== FUNCIONES PARA ANÁLISIS POR TIPO DE OBRA =====
 
-def crear_grafico_tipo_obra_licitaciones(df):
+def crear_grafico_tipo_obra_licitaciones(cubo):
     """Tipo de obra VS número de licitaciones"""
-    licitaciones_tipo = df['Tipo_Obra'].value_counts()
+    licitaciones_tipo = cubo.vista('Tipo_Obra')['n'].sort_values(ascending=False)
     fig = px.bar(x=licitaciones_tipo.values, y=licitaciones_tipo.index, orientation='h', title="Tipo de Obra VS Número de Licitaciones", labels={'x': 'Número de Licitaciones', 'y': 'Tipo de Obra'}, color=licitaciones_tipo.values, color_continuous_scale='Blues')
     fig.update_layout(height=400, showlegend=False, yaxis={'categoryorder': 'total ascending'})
     return fig
 
-def crear_grafico_tipo_obra_presupuesto(df):
+def crear_grafico_tipo_obra_presupuesto(cubo):
     """Tipo de obra VS presupuesto total"""
-    presupuesto_tipo = df.groupby('Tipo_Obra')['Presupuesto_Base'].sum().sort_values(ascending=False)
+    presupuesto_tipo = cubo.vista('Tipo_Obra')['presupuesto'].sort_values(ascending=False)
     fig = px.bar(x=presupuesto_tipo.values / 1e6, y=presupuesto_tipo.index, orientation='h', title="Tipo de Obra VS Presupuesto Total", labels={'x': 'Presupuesto Total (M€)', 'y': 'Tipo de Obra'}, color=presupuesto_tipo.values, color_continuous_scale='Greens')
     fig.update_layout(height=400, showlegend=False, yaxis={'categoryorder': 'total ascending'})
     return fig
 
-def crear_grafico_tipo_obra_importe(df):
+def crear_grafico_tipo_obra_importe(cubo):
     """Tipo de obra VS importe total"""
-    importe_tipo = df.groupby('Tipo_Obra')['Importe_Adjudicado'].sum().sort_values(ascending=False)
+    importe_tipo = cubo.vista('Tipo_Obra')['importe'].sort_values(ascending=False)
     fig = px.bar(x=importe_tipo.values / 1e6, y=importe_tipo.index, orientation='h', title="Tipo de Obra VS Importe Total", labels={'x': 'Importe Total (M€)', 'y': 'Tipo de Obra'}, color=importe_tipo.values, color_continuous_scale='Purples')
     fig.update_layout(height=400, showlegend=False, yaxis={'categoryorder': 'total ascending'})
     return fig
 
-def crear_grafico_tipo_obra_baja(df):
+def crear_grafico_tipo_obra_baja(cubo):
     """Tipo de obra VS baja promedio"""
-    baja_tipo = df.groupby('Tipo_Obra')['Porcentaje_Baja'].mean().sort_values(ascending=False)
+    baja_tipo = cubo.vista('Tipo_Obra')['baja_media'].sort_values(ascending=False)
     fig = px.bar(x=baja_tipo.values, y=baja_tipo.index, orientation='h', title="Tipo de Obra VS Baja Promedio", labels={'x': 'Baja Promedio (%)', 'y': 'Tipo de Obra'}, color=baja_tipo.values, color_continuous_scale='Reds')
     fig.update_layout(height=400, showlegend=False, yaxis={'categoryorder': 'total ascending'})
     return fig
 
-def crear_grafico_tipo_obra_tiempo(df):
+def crear_grafico_tipo_obra_tiempo(cubo):
     """Tipo de obra VS tiempo (evolución mensual)"""
-    df_mensual_tipo = df.groupby(['Mes', 'Tipo_Obra']).size().reset_index(name='Licitaciones')
+    df_mensual_tipo = cubo.vista('Mes', 'Tipo_Obra')['n'].reset_index(name='Licitaciones')
     fig = px.bar(df_mensual_tipo, x='Mes', y='Licitaciones', color='Tipo_Obra', title="Evolución Mensual por Tipo de Obra", labels={'x': 'Mes', 'y': 'Número de Licitaciones'})
     fig.update_layout(height=400, xaxis_title="Mes", yaxis_title="Número de Licitaciones")
     return fig
 
-def crear_grafico_tipo_obra_aeropuertos(df):
+def crear_grafico_tipo_obra_aeropuertos(cubo):
     """Tipo de obra VS aeropuertos (distribución)"""
-    df_aeropuerto_tipo = df.groupby(['Tipo_Obra', 'Aeropuerto']).size().reset_index(name='Licitaciones')
-    top_aeropuertos = df['Aeropuerto'].value_counts().head(10).index
+    df_aeropuerto_tipo = cubo.vista('Tipo_Obra', 'Aeropuerto')['n'].reset_index(name='Licitaciones')
+    top_aeropuertos = agregados_aena.top_k(cubo, 'Aeropuerto', 'n').index
     df_aeropuerto_tipo = df_aeropuerto_tipo[df_aeropuerto_tipo['Aeropuerto'].isin(top_aeropuertos)]
     fig = px.bar(df_aeropuerto_tipo, x='Licitaciones', y='Tipo_Obra', color='Aeropuerto', orientation='h', title="Distribución de Tipos de Obra por Aeropuerto", labels={'x': 'Número de Licitaciones', 'y': 'Tipo de Obra'})
     fig.update_layout(height=500, yaxis={'categoryorder': 'total ascending'})
@@ -397,115 +559,230 @@ def crear_grafico_tipo_obra_aeropuertos(df):
 
 # ===== FUNCIONES PARA ANÁLISIS POR EMPRESA =====
 
-def crear_grafico_empresa_licitaciones(df):
+def crear_grafico_empresa_licitaciones(cubo):
     """Top 10 empresas VS número de licitaciones"""
-    licitaciones_empresa = df['Empresa_Adjudicataria'].value_counts().head(10)
+    licitaciones_empresa = agregados_aena.top_k(cubo, 'Empresa_Adjudicataria', 'n')
     fig = px.bar(x=licitaciones_empresa.values, y=licitaciones_empresa.index, orientation='h', title="Top 10 Empresas VS Número de Licitaciones", labels={'x': 'Número de Licitaciones', 'y': 'Empresa'}, color=licitaciones_empresa.values, color_continuous_scale='Blues')
     fig.update_layout(height=400, showlegend=False, yaxis={'categoryorder': 'total ascending'})
     return fig
 
-def crear_grafico_empresa_presupuesto(df):
+def crear_grafico_empresa_presupuesto(cubo):
     """Top 10 empresas VS presupuesto total"""
-    presupuesto_empresa = df.groupby('Empresa_Adjudicataria')['Presupuesto_Base'].sum().sort_values(ascending=False).head(10)
+    presupuesto_empresa = agregados_aena.top_k(cubo, 'Empresa_Adjudicataria', 'presupuesto')
     fig = px.bar(x=presupuesto_empresa.values / 1e6, y=presupuesto_empresa.index, orientation='h', title="Top 10 Empresas VS Presupuesto Total", labels={'x': 'Presupuesto Total (M€)', 'y': 'Empresa'}, color=presupuesto_empresa.values, color_continuous_scale='Greens')
     fig.update_layout(height=400, showlegend=False, yaxis={'categoryorder': 'total ascending'})
     return fig
 
-def crear_grafico_empresa_importe(df):
+def crear_grafico_empresa_importe(cubo):
     """Top 10 empresas VS importe total"""
-    importe_empresa = df.groupby('Empresa_Adjudicataria')['Importe_Adjudicado'].sum().sort_values(ascending=False).head(10)
+    importe_empresa = agregados_aena.top_k(cubo, 'Empresa_Adjudicataria', 'importe')
     fig = px.bar(x=importe_empresa.values / 1e6, y=importe_empresa.index, orientation='h', title="Top 10 Empresas VS Importe Total", labels={'x': 'Importe Total (M€)', 'y': 'Empresa'}, color=importe_empresa.values, color_continuous_scale='Purples')
     fig.update_layout(height=400, showlegend=False, yaxis={'categoryorder': 'total ascending'})
     return fig
 
-def crear_grafico_empresa_baja(df):
+def crear_grafico_empresa_baja(cubo):
     """Top 10 empresas VS baja promedio"""
-    baja_empresa = df.groupby('Empresa_Adjudicataria')['Porcentaje_Baja'].mean().sort_values(ascending=False).head(10)
+    baja_empresa = agregados_aena.top_k(cubo, 'Empresa_Adjudicataria', 'baja_media')
     fig = px.bar(x=baja_empresa.values, y=baja_empresa.index, orientation='h', title="Top 10 Empresas VS Baja Promedio", labels={'x': 'Baja Promedio (%)', 'y': 'Empresa'}, color=baja_empresa.values, color_continuous_scale='Reds')
     fig.update_layout(height=400, showlegend=False, yaxis={'categoryorder': 'total ascending'})
     return fig
 
-def mostrar_empresas_por_aeropuerto(df):
+def tabla_empresas_por_aeropuerto(cubo):
+    """Empresa líder (y 2ª y 3ª) de cada aeropuerto por número de contratos"""
+    top = agregados_aena.top_k_por_grupo(cubo, 'Aeropuerto', 'Empresa_Adjudicataria', k=3, medida='n', cuota='importe')
+    resultado = top[top['Puesto'] == 1].rename(columns={'Empresa_Adjudicataria': 'Empresa_Lider', 'n': 'Contratos'})
+    resultado = resultado.assign(Contratos=resultado['Contratos'].astype('int64'), Cuota_Importe=resultado['Cuota'] * 100)
+    # Siguientes empresas de cada aeropuerto en columnas (2ª y 3ª)
+    siguientes = top[top['Puesto'] > 1].pivot(index='Aeropuerto', columns='Puesto', values='Empresa_Adjudicataria')
+    siguientes.columns = [f"Empresa_{puesto}" for puesto in siguientes.columns]
+    resultado = resultado[['Aeropuerto', 'Empresa_Lider', 'Contratos', 'Cuota_Importe']].join(siguientes, on='Aeropuerto')
+    return resultado.sort_values('Contratos', ascending=False, kind='stable').reset_index(drop=True)
+
+def mostrar_empresas_por_aeropuerto(cubo):
     """Mostrar listado de empresas con más contratos en cada aeropuerto"""
     st.subheader("🏢 Empresa Líder por Aeropuerto")
-    empresa_lider = df.groupby('Aeropuerto')['Empresa_Adjudicataria'].apply(lambda x: x.value_counts().index[0]).reset_index()
-    empresa_lider.columns = ['Aeropuerto', 'Empresa_Lider']
-    contratos_lider = df.groupby(['Aeropuerto', 'Empresa_Adjudicataria']).size().reset_index(name='Contratos')
-    contratos_lider = contratos_lider.loc[contratos_lider.groupby('Aeropuerto')['Contratos'].idxmax()]
-    resultado = empresa_lider.merge(contratos_lider[['Aeropuerto', 'Contratos']], on='Aeropuerto')
-    resultado = resultado.sort_values('Contratos', ascending=False)
-    st.dataframe(resultado, use_container_width=True)
+    st.dataframe(
+        tabla_empresas_por_aeropuerto(cubo),
+        use_container_width=True,
+        column_config={
+            "Cuota_Importe": st.column_config.NumberColumn("Cuota_Importe", help="% del importe adjudicado en el aeropuerto", format="%.1f%%")
+        }
+    )
 
 # ===== FUNCIONES PARA ANÁLISIS POR BAJA =====
 
-def crear_grafico_baja_aeropuertos(df):
+def crear_grafico_baja_aeropuertos(cubo):
     """Baja VS Aeropuertos (vertical)"""
-    baja_aeropuerto = df.groupby('Aeropuerto')['Porcentaje_Baja'].mean().sort_values(ascending=False)
+    baja_aeropuerto = cubo.vista('Aeropuerto')['baja_media'].sort_values(ascending=False)
     fig = px.bar(x=baja_aeropuerto.index, y=baja_aeropuerto.values, title="Porcentaje de Baja por Aeropuerto", labels={'x': 'Aeropuerto', 'y': 'Porcentaje de Baja (%)'}, color=baja_aeropuerto.values, color_continuous_scale='Reds')
     fig.update_layout(height=600, showlegend=False, xaxis_tickangle=-45)
     return fig
 
-def crear_grafico_baja_rangos_importe(df):
+def crear_grafico_baja_rangos_importe(cubo):
     """Baja en función del importe total (Rangos)"""
-    df['Rango_Importe'] = pd.cut(df['Importe_Adjudicado'], bins=[0, 10000, 50000, 100000, 500000, 1000000, float('inf')], labels=['<10K€', '10K-50K€', '50K-100K€', '100K-500K€', '500K-1M€', '>1M€'])
-    baja_rango = df.groupby('Rango_Importe')['Porcentaje_Baja'].mean().dropna()
+    baja_rango = cubo.vista('Rango_Importe')['baja_media'].dropna()
     fig = px.bar(x=baja_rango.index, y=baja_rango.values, title="Porcentaje de Baja por Rango de Importe", labels={'x': 'Rango de Importe', 'y': 'Porcentaje de Baja (%)'}, color=baja_rango.values, color_continuous_scale='Reds')
     fig.update_layout(height=400, showlegend=False)
     return fig
 
+# Distribución de la baja: percentiles e histogramas de los bocetos del cubo
+# (agregados_aena.CuboAgregados.distribucion), sin volver a ordenar las filas
+
+# Dimensión de los gráficos de distribución -> etiqueta
+DIMENSIONES_BAJA = {
+    'Aeropuerto': "Aeropuerto",
+    'Tipo_Obra': "Tipo de Obra",
+    'Empresa_Adjudicataria': "Empresa",
+    'Rango_Importe': "Rango de Importe",
+}
+
+# Grupos con más licitaciones que se muestran por gráfico de distribución
+MAX_GRUPOS_BAJA = 20
+
+# Ancho (puntos de baja) de las barras de los histogramas
+ANCHO_HISTOGRAMA_BAJA = 2.5
+
+def grupos_baja(cubo, dimension):
+    """Percentiles de la baja de los grupos con más licitaciones, ordenados por mediana"""
+    percentiles = cubo.percentiles(dimension)
+    percentiles = percentiles[percentiles['n_baja'] > 0]
+    if dimension != 'Rango_Importe':
+        percentiles = percentiles.nlargest(MAX_GRUPOS_BAJA, 'n_baja', keep='first').sort_values('p50')
+    return percentiles
+
+def recortar_histograma(histograma):
+    """Columnas del histograma entre la primera y la última cubeta con licitaciones"""
+    con_filas = (histograma.to_numpy().sum(axis=0) > 0).nonzero()[0]
+    if len(con_filas) == 0:
+        return histograma.iloc[:, :0]
+    return histograma.iloc[:, con_filas[0]:con_filas[-1] + 1]
+
+def crear_grafico_baja_distribucion(cubo):
+    """Histograma de la baja con la mediana, los percentiles 10 y 90 y la media"""
+    histograma = recortar_histograma(cubo.distribucion().histograma(ANCHO_HISTOGRAMA_BAJA)).iloc[0]
+    percentiles = cubo.percentiles().iloc[0]
+    fig = px.bar(x=histograma.index + ANCHO_HISTOGRAMA_BAJA / 2, y=histograma.values, title="Distribución del Porcentaje de Baja", labels={'x': 'Porcentaje de Baja (%)', 'y': 'Número de Licitaciones'})
+    fig.update_traces(width=ANCHO_HISTOGRAMA_BAJA * 0.95, marker_color='indianred')
+    for columna, nombre, estilo in [('p10', 'P10', 'dot'), ('p50', 'Mediana', 'solid'), ('p90', 'P90', 'dot'), ('baja_media', 'Media', 'dash')]:
+        if pd.notna(percentiles[columna]):
+            fig.add_vline(x=percentiles[columna], line_dash=estilo, line_color='black', annotation_text=f"{nombre}: {percentiles[columna]:.1f}%")
+    fig.update_layout(height=400, showlegend=False, bargap=0)
+    return fig
+
+def crear_grafico_baja_percentiles(cubo, dimension):
+    """Mediana de la baja por grupo con el rango entre los percentiles 10 y 90"""
+    percentiles = grupos_baja(cubo, dimension)
+    etiquetas = percentiles.index.astype(str)
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=percentiles['p50'], y=etiquetas, mode='markers', name='Mediana', marker=dict(color='firebrick', size=9),
+        error_x=dict(type='data', symmetric=False, array=percentiles['p90'] - percentiles['p50'], arrayminus=percentiles['p50'] - percentiles['p10'], color='firebrick'),
+        customdata=percentiles[['p10', 'p90', 'n_baja']].to_numpy(),
+        hovertemplate="%{y}<br>Mediana: %{x:.1f}%<br>P10-P90: %{customdata[0]:.1f}% - %{customdata[1]:.1f}%<br>Licitaciones: %{customdata[2]}<extra></extra>",
+    ))
+    fig.add_trace(go.Scatter(x=percentiles['baja_media'], y=etiquetas, mode='markers', name='Media', marker=dict(color='black', symbol='diamond-open', size=8)))
+    fig.update_layout(
+        title=f"Porcentaje de Baja por {DIMENSIONES_BAJA[dimension]}: Mediana y Percentiles 10-90",
+        xaxis_title="Porcentaje de Baja (%)", yaxis_title=DIMENSIONES_BAJA[dimension],
+        height=max(400, 28 * len(percentiles) + 150), yaxis={'type': 'category'},
+    )
+    return fig
+
+def crear_grafico_baja_histograma(cubo, dimension):
+    """Histograma de la baja de cada grupo (% de sus licitaciones por tramo de baja)"""
+    grupos = grupos_baja(cubo, dimension)
+    histograma = cubo.distribucion(dimension).histograma(ANCHO_HISTOGRAMA_BAJA).loc[grupos.index]
+    histograma = recortar_histograma(histograma)
+    porcentaje = histograma.div(histograma.sum(axis=1), axis=0) * 100
+    tramos = [f"{inicio:g}-{inicio + ANCHO_HISTOGRAMA_BAJA:g}%" for inicio in porcentaje.columns]
+    fig = px.imshow(porcentaje.to_numpy(), x=tramos, y=porcentaje.index.astype(str), aspect='auto', color_continuous_scale='Reds', title=f"Distribución de la Baja por {DIMENSIONES_BAJA[dimension]}", labels={'x': 'Porcentaje de Baja', 'y': DIMENSIONES_BAJA[dimension], 'color': '% de licitaciones'})
+    fig.update_layout(height=max(400, 28 * len(porcentaje) + 150))
+    return fig
+
 # ===== FUNCIONES DE MÉTRICAS Y FILTROS =====
 
-def mostrar_metricas_principales(df):
+def mostrar_metricas_principales(cubo):
     """Mostrar métricas principales del dashboard"""
     st.markdown("### 📊 Datos Generales")
+    metricas = agregados_aena.calcular_metricas(cubo)
     
     col1, col2, col3, col4, col5, col6 = st.columns(6)
     
     with col1:
-        st.metric("Total Licitaciones", f"{len(df):,}")
+        st.metric("Total Licitaciones", f"{metricas['total_licitaciones']:,}")
     
     with col2:
-        presupuesto_total = df['Presupuesto_Base'].sum() / 1e6
+        presupuesto_total = metricas['presupuesto_total'] / 1e6
         st.metric("Presupuesto Total", f"{presupuesto_total:.1f} M€")
     
     with col3:
-        importe_total = df['Importe_Adjudicado'].sum() / 1e6
+        importe_total = metricas['importe_total'] / 1e6
         st.metric("Importe Adjudicado", f"{importe_total:.1f} M€")
     
     with col4:
-        ahorro_total = (df['Presupuesto_Base'].sum() - df['Importe_Adjudicado'].sum()) / 1e6
+        ahorro_total = metricas['ahorro_total'] / 1e6
         st.metric("Ahorro Total", f"{ahorro_total:.1f} M€")
     
     with col5:
-        baja_media = df['Porcentaje_Baja'].mean()
+        baja_media = metricas['baja_media']
         st.metric("% Baja Media", f"{baja_media:.1f}%")
     
     with col6:
         # Baja ponderada en función del presupuesto
-        total_presupuesto = df['Presupuesto_Base'].sum()
-        baja_ponderada = (df['Porcentaje_Baja'] * df['Presupuesto_Base']).sum() / total_presupuesto
+        baja_ponderada = metricas['baja_ponderada']
         st.metric("% Baja Ponderada", f"{baja_ponderada:.1f}%")
 
-def mostrar_filtros_sidebar(df):
-    """Mostrar filtros en el sidebar"""
+# Filtro del sidebar -> etiqueta del desplegable
+ETIQUETAS_FILTROS = {
+    'aeropuerto': "Aeropuerto",
+    'tipo_obra': "Tipo de Obra",
+    'empresa': "Empresa Adjudicataria",
+}
+
+def seleccion_dimensiones(dimensiones):
+    """Selección de los desplegables (columna -> valor, o None si es "Todos")
+
+    Sale de session_state, de modo que cada desplegable se reduce a lo elegido
+    en los otros antes de dibujarlos. Un valor que ya no tiene filas bajo el
+    resto (por ejemplo, tras recargar los datos) vuelve a "Todos".
+    """
+    seleccion = {}
+    for clave, (columna, todos) in indices_aena.FILTROS_IGUALDAD.items():
+        valor = st.session_state.get(f'filtro_{clave}', todos)
+        seleccion[columna] = None if valor == todos else valor
+    for clave, (columna, todos) in indices_aena.FILTROS_IGUALDAD.items():
+        if seleccion[columna] is not None and seleccion[columna] not in dimensiones.opciones(columna, seleccion):
+            seleccion[columna] = None
+            st.session_state[f'filtro_{clave}'] = todos
+    return seleccion
+
+def mostrar_filtros_sidebar(dimensiones):
+    """Mostrar filtros en el sidebar
+
+    Las opciones salen del diccionario de dimensiones de la versión de datos
+    (indices_aena.DiccionarioDimensiones): cada desplegable solo ofrece los
+    valores con licitaciones bajo lo elegido en los demás, con su número.
+    """
     st.sidebar.header("🔍 Filtros")
     
-    # Filtro por aeropuerto
-    aeropuertos = ['Todos'] + sorted(df['Aeropuerto'].unique().tolist())
-    aeropuerto_seleccionado = st.sidebar.selectbox("Aeropuerto", aeropuertos)
-    
-    # Filtro por tipo de obra
-    tipos_obra = ['Todos'] + sorted(df['Tipo_Obra'].unique().tolist())
-    tipo_obra_seleccionado = st.sidebar.selectbox("Tipo de Obra", tipos_obra)
-    
-    # Filtro por empresa
-    empresas = ['Todas'] + sorted(df['Empresa_Adjudicataria'].unique().tolist())
-    empresa_seleccionada = st.sidebar.selectbox("Empresa Adjudicataria", empresas)
+    # Filtros por aeropuerto, tipo de obra y empresa, en cascada
+    seleccion = seleccion_dimensiones(dimensiones)
+    elegidos = {}
+    for clave, (columna, todos) in indices_aena.FILTROS_IGUALDAD.items():
+        opciones = dimensiones.opciones(columna, seleccion)
+        total = sum(opciones.values())
+        elegidos[clave] = st.sidebar.selectbox(
+            ETIQUETAS_FILTROS[clave],
+            [todos] + list(opciones),
+            key=f'filtro_{clave}',
+            format_func=lambda valor, opciones=opciones, todos=todos, total=total:
+                f"{valor} ({total if valor == todos else opciones[valor]})",
+        )
     
     # Filtro por rango de presupuesto
     st.sidebar.subheader("Rango de Presupuesto (€)")
     presupuesto_min = st.sidebar.number_input("Presupuesto Mínimo", min_value=0.0, value=0.0, step=1000.0)
-    presupuesto_max = st.sidebar.number_input("Presupuesto Máximo", min_value=0.0, value=float(df['Presupuesto_Base'].max()), step=1000.0)
+    presupuesto_max = st.sidebar.number_input("Presupuesto Máximo", min_value=0.0, value=dimensiones.maximos['Presupuesto_Base'], step=1000.0)
     
     # Filtro por rango de baja
     st.sidebar.subheader("Rango de Baja (%)")
@@ -513,18 +790,23 @@ def mostrar_filtros_sidebar(df):
     baja_max = st.sidebar.number_input("Baja Máxima", min_value=0.0, value=100.0, step=0.1)
     
     return {
-        'aeropuerto': aeropuerto_seleccionado,
-        'tipo_obra': tipo_obra_seleccionado,
-        'empresa': empresa_seleccionada,
+        **elegidos,
         'presupuesto_min': presupuesto_min,
         'presupuesto_max': presupuesto_max,
         'baja_min': baja_min,
         'baja_max': baja_max
     }
 
-def aplicar_filtros(df, filtros):
-    """Aplicar filtros al DataFrame"""
-    df_filtrado = df.copy()
+def aplicar_filtros(df, filtros, indice=None):
+    """Aplicar filtros al DataFrame (sin copiar: cada filtro devuelve un DataFrame nuevo)
+
+    Con un índice precalculado (indices_aena.IndiceFiltros) los filtros se
+    resuelven sobre listas de posiciones y se hace un único take.
+    """
+    if indice is not None:
+        return indice.filtrar(df, filtros)
+    
+    df_filtrado = df
     
     # Filtro por aeropuerto
     if filtros['aeropuerto'] != 'Todos':
@@ -552,9 +834,130 @@ def aplicar_filtros(df, filtros):
     
     return df_filtrado
 
+def describir_ejercicios(ejercicios):
+    """Texto con los ejercicios cargados: '2024' o '2022-2024'"""
+    ejercicios = sorted(ejercicios)
+    if not ejercicios:
+        return ""
+    if len(ejercicios) == 1:
+        return f"{int(ejercicios[0])}"
+    return f"{int(ejercicios[0])}-{int(ejercicios[-1])}"
+
+# ===== RENDERIZADO PEREZOSO DE PESTAÑAS =====
+
+PESTANAS = [
+    "📅 Análisis Temporal", 
+    "🏢 Por Aeropuerto", 
+    "🔧 Por Tipo de Obra", 
+    "🏭 Por Empresa", 
+    "📉 Por Baja",
+    "📊 Datos",
+    "🤖 IA"
+]
+
+def crear_pestanas(nombres):
+    """Crear las pestañas y devolver [(contenedor, abierta)]
+
+    Solo se calcula el contenido de la pestaña abierta. Con versiones de
+    Streamlit cuyo st.tabs no informa de la pestaña elegida se usa un selector
+    horizontal en su lugar.
+    """
+    try:
+        pestanas = st.tabs(nombres, key="pestana", on_change="rerun")
+        return [(pestana, bool(pestana.open)) for pestana in pestanas]
+    except TypeError:
+        elegida = st.radio("Sección", nombres, horizontal=True, key="pestana", label_visibility="collapsed")
+        return [(st.container(), nombre == elegida) for nombre in nombres]
+
+def memo_estado(clave):
+    """Resultados memorizados en la sesión para el estado actual (datos + filtros)
+
+    Al cambiar la clave se descarta lo memorizado para el estado anterior.
+    """
+    memo = st.session_state.get("memo_estado")
+    if memo is None or memo["clave"] != clave:
+        memo = st.session_state["memo_estado"] = {"clave": clave}
+    return memo
+
+def mostrar_grafico(memo, crear_grafico, cubo, *argumentos):
+    """Mostrar la figura de crear_grafico sobre el cubo que devuelve cubo()
+
+    La figura se busca primero en la sesión y después, en JSON, en la caché
+    compartida (cache_aena.CACHE) bajo la clave del estado de filtros. Los
+    argumentos adicionales se pasan a crear_grafico y forman parte de la clave.
+    """
+    nombre = ' '.join([crear_grafico.__name__, *map(str, argumentos)])
+    
+    def construir():
+        with instrumentacion_aena.tramo(f'figura {nombre}'):
+            figura = crear_grafico(cubo(), *argumentos)
+        with instrumentacion_aena.tramo(f'serialización {nombre}'):
+            return figura.to_json()
+    
+    if nombre not in memo:
+        figura_json = cache_aena.CACHE.obtener(('figura', memo['clave'], nombre), construir)
+        with instrumentacion_aena.tramo(f'deserialización {nombre}'):
+            memo[nombre] = pio.from_json(figura_json)
+    with instrumentacion_aena.tramo(f'render {nombre}'):
+        st.plotly_chart(memo[nombre], use_container_width=True)
+
+def configurar_pagina():
+    """Configuración de la página y CSS personalizado"""
+    st.set_page_config(
+        page_title="Dashboard Licitaciones AENA",
+        page_icon="✈️",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
+    
+    st.markdown("""
+    <style>
+        .main-header {
+            background: linear-gradient(90deg, #1f4e79 0%, #2d5a87 100%);
+            padding: 1rem;
+            border-radius: 10px;
+            color: white;
+            text-align: center;
+            margin-bottom: 2rem;
+        }
+        .metric-card {
+            background: white;
+            padding: 1rem;
+            border-radius: 10px;
+            box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+            border-left: 4px solid #1f4e79;
+        }
+        .sidebar .sidebar-content {
+            background: linear-gradient(180deg, #f8f9fa 0%, #e9ecef 100%);
+        }
+    </style>
+    """, unsafe_allow_html=True)
+
+def precalentar():
+    """Importar los módulos pesados y cargar el dataset y sus derivados compartidos
+
+    Se ejecuta una vez por proceso, en segundo plano, mientras se dibuja la
+    cabecera de la primera sesión.
+    """
+    arranque_aena.cargar(pd, np, px, go, pio, agregados_aena, cache_aena, compartido_aena, datos_aena,
+                         empresas_aena, exportar_aena, indices_aena, sql_aena)
+    datos_aena.activar_copy_on_write()
+    if sql_aena.ACTIVO:
+        almacen = cargar_almacen()
+        if almacen is not None:
+            almacen.dimensiones()
+        return
+    datos = instantanea_datos()
+    if datos is not None and len(datos.df):
+        datos_aena.REGISTRO.derivado('dimensiones', indices_aena.DiccionarioDimensiones.desde_df, indices_aena.DiccionarioDimensiones.actualizar, instantanea=datos)
+        datos_aena.REGISTRO.derivado('indice_filtros', indices_aena.IndiceFiltros, instantanea=datos)
+        datos_aena.REGISTRO.derivado('cubo', agregados_aena.construir_cubo, agregados_aena.actualizar_cubo, instantanea=datos)
+
 def main():
     """Función principal del dashboard"""
     
+    configurar_pagina()
+    
     # Header principal
     st.markdown("""
     <div class="main-header">
@@ -563,154 +966,225 @@ def main():
     </div>
     """, unsafe_allow_html=True)
     
-    # Cargar datos
-    df = cargar_datos()
-    if df is None or len(df) == 0:
+    # Importaciones y carga de datos en curso (solo en el arranque del proceso)
+    listo = arranque_aena.preparar(precalentar)
+    if not listo.is_set():
+        with instrumentacion_aena.tramo('preparación'), st.spinner("Preparando datos..."):
+            listo.wait()
+    
+    # API JSON local servida desde este proceso, con sus datos y cachés (AENA_API_PUERTO)
+    if api_aena.PUERTO:
+        api_aena.arrancar()
+    
+    # Recargar datos para todas las sesiones
+    if st.sidebar.button("🔄 Recargar datos", help="Vuelve a cargar los datos del Excel para todos los usuarios"):
+        datos_aena.REGISTRO.invalidar()
+        if sql_aena.ACTIVO:
+            sql_aena.invalidar()
+    
+    # Cargar datos (con el backend SQL no se cargan en memoria: se consultan)
+    with instrumentacion_aena.tramo('carga'):
+        if sql_aena.ACTIVO:
+            df = None
+            almacen = cargar_almacen()
+            total = almacen.total if almacen is not None else 0
+        else:
+            # Una sola instantánea del registro para todo el rerun
+            almacen = None
+            datos = instantanea_datos()
+            df = datos.df if datos is not None else None
+            total = len(df) if df is not None else 0
+    if total == 0:
         st.warning("⚠️ No se pudieron cargar los datos del archivo Excel.")
         return
     else:
-        st.success(f"✅ Datos cargados correctamente: {len(df)} licitaciones de AENA 2024")
+        if almacen is not None:
+            ejercicios = almacen.ejercicios()
+        else:
+            ejercicios = df['Ejercicio'].dropna().unique().tolist() if 'Ejercicio' in df.columns else []
+        st.success(f"✅ Datos cargados correctamente: {total} licitaciones de AENA {describir_ejercicios(ejercicios)}")
+    
+    delta = datos.delta if almacen is None else None
+    if delta is not None and not delta.vacio:
+        st.caption(
+            f"🔄 Última actualización incremental: {delta.resumen['insertadas']} nuevas, "
+            f"{delta.resumen['actualizadas']} modificadas y {delta.resumen['eliminadas']} eliminadas"
+        )
+    
+    # Los libros nuevos o modificados se cargan en segundo plano; la sesión
+    # sigue con la versión que muestra y se le avisa de que hay otra
+    vigilar_datos()
+    if vigilante_aena.ACTIVO:
+        aviso_datos_nuevos(almacen.version if almacen is not None else datos.version)
     
     # Mostrar filtros en sidebar
-    filtros = mostrar_filtros_sidebar(df)
+    with instrumentacion_aena.tramo('filtros'):
+        if almacen is not None:
+            filtros = mostrar_filtros_sidebar(almacen.dimensiones())
+            version_datos = almacen.version
+        else:
+            dimensiones = datos_aena.REGISTRO.derivado(
+                'dimensiones', indices_aena.DiccionarioDimensiones.desde_df, indices_aena.DiccionarioDimensiones.actualizar, instantanea=datos
+            )
+            filtros = mostrar_filtros_sidebar(dimensiones)
+            version_datos = datos.version
+            
+            # Aplicar filtros con el índice de la misma versión que el dataset
+            indice = datos_aena.REGISTRO.derivado('indice_filtros', indices_aena.IndiceFiltros, instantanea=datos)
+            df_filtrado = aplicar_filtros(df, filtros, indice)
+    
+    # Cubo y figuras se memorizan por versión de datos y filtros (en la sesión y
+    # en la caché compartida): si los filtros no cambian no se recalcula nada
+    memo = memo_estado(cache_aena.clave_estado(version_datos, filtros))
     
-    # Aplicar filtros
-    df_filtrado = aplicar_filtros(df, filtros)
+    # Una sola pasada por los datos filtrados para todas las métricas y gráficos.
+    # Si los filtros no quitan ninguna fila se usa el cubo compartido del dataset,
+    # que se actualiza con los deltas de las recargas incrementales. Con el
+    # backend SQL el cubo se agrega en la base de datos.
+    def cubo():
+        with instrumentacion_aena.tramo('agregado'):
+            if almacen is not None:
+                return cache_aena.CACHE.obtener(('cubo', memo['clave']), lambda: almacen.cubo(filtros))
+            if len(df_filtrado) == len(df):
+                return datos_aena.REGISTRO.derivado('cubo', agregados_aena.construir_cubo, agregados_aena.actualizar_cubo, instantanea=datos)
+            return cache_aena.CACHE.obtener(('cubo', memo['clave']), lambda: agregados_aena.construir_cubo(df_filtrado))
     
     # Mostrar métricas principales
-    mostrar_metricas_principales(df_filtrado)
-    
-    # Crear pestañas
-    tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs([
-        "📅 Análisis Temporal", 
-        "🏢 Por Aeropuerto", 
-        "🔧 Por Tipo de Obra", 
-        "🏭 Por Empresa", 
-        "📉 Por Baja",
-        "📊 Datos",
-        "🤖 IA"
-    ])
+    with instrumentacion_aena.tramo('métricas'):
+        mostrar_metricas_principales(cubo())
+    
+    # Crear pestañas (solo se calcula el contenido de la abierta)
+    (tab1, abierta1), (tab2, abierta2), (tab3, abierta3), (tab4, abierta4), \
+        (tab5, abierta5), (tab6, abierta6), (tab7, abierta7) = crear_pestanas(PESTANAS)
     
     with tab1:
-        st.subheader("📅 Análisis Temporal")
-        
-        # Gráfico de licitaciones a lo largo del tiempo (anual)
-        fig_licitaciones_tiempo = crear_grafico_licitaciones_tiempo(df_filtrado)
-        st.plotly_chart(fig_licitaciones_tiempo, use_container_width=True)
-        
-        # Gráfico de presupuesto base e importe adjudicado a lo largo del tiempo (anual)
-        fig_presupuesto_tiempo = crear_grafico_presupuesto_tiempo(df_filtrado)
-        st.plotly_chart(fig_presupuesto_tiempo, use_container_width=True)
-        
-        # Gráfico de licitaciones por mes
-        fig_licitaciones_mes = crear_grafico_licitaciones_mes(df_filtrado)
-        st.plotly_chart(fig_licitaciones_mes, use_container_width=True)
+        if abierta1:
+            st.subheader("📅 Análisis Temporal")
+            
+            # Gráfico de licitaciones a lo largo del tiempo (anual)
+            mostrar_grafico(memo, crear_grafico_licitaciones_tiempo, cubo)
+            
+            # Gráfico de presupuesto base e importe adjudicado a lo largo del tiempo (anual)
+            mostrar_grafico(memo, crear_grafico_presupuesto_tiempo, cubo)
+            
+            # Gráfico de licitaciones por mes
+            mostrar_grafico(memo, crear_grafico_licitaciones_mes, cubo)
     
     with tab2:
-        st.subheader("🏢 Análisis por Aeropuerto")
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            fig_aeropuerto_licitaciones = crear_grafico_aeropuerto_licitaciones(df_filtrado)
-            st.plotly_chart(fig_aeropuerto_licitaciones, use_container_width=True)
-        
-        with col2:
-            fig_aeropuerto_baja = crear_grafico_aeropuerto_baja(df_filtrado)
-            st.plotly_chart(fig_aeropuerto_baja, use_container_width=True)
-        
-        col3, col4 = st.columns(2)
-        
-        with col3:
-            fig_aeropuerto_presupuesto = crear_grafico_aeropuerto_presupuesto(df_filtrado)
-            st.plotly_chart(fig_aeropuerto_presupuesto, use_container_width=True)
-        
-        with col4:
-            fig_aeropuerto_adjudicacion = crear_grafico_aeropuerto_adjudicacion(df_filtrado)
-            st.plotly_chart(fig_aeropuerto_adjudicacion, use_container_width=True)
-        
-        # Gráfico de distribución por tipo de obra
-        fig_aeropuerto_tipo_obra = crear_grafico_aeropuerto_tipo_obra(df_filtrado)
-        st.plotly_chart(fig_aeropuerto_tipo_obra, use_container_width=True)
+        if abierta2:
+            st.subheader("🏢 Análisis por Aeropuerto")
+            
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                mostrar_grafico(memo, crear_grafico_aeropuerto_licitaciones, cubo)
+            
+            with col2:
+                mostrar_grafico(memo, crear_grafico_aeropuerto_baja, cubo)
+            
+            col3, col4 = st.columns(2)
+            
+            with col3:
+                mostrar_grafico(memo, crear_grafico_aeropuerto_presupuesto, cubo)
+            
+            with col4:
+                mostrar_grafico(memo, crear_grafico_aeropuerto_adjudicacion, cubo)
+            
+            # Gráfico de distribución por tipo de obra
+            mostrar_grafico(memo, crear_grafico_aeropuerto_tipo_obra, cubo)
     
     with tab3:
-        st.subheader("🔧 Análisis por Tipo de Obra")
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            fig_tipo_obra_licitaciones = crear_grafico_tipo_obra_licitaciones(df_filtrado)
-            st.plotly_chart(fig_tipo_obra_licitaciones, use_container_width=True)
-        
-        with col2:
-            fig_tipo_obra_presupuesto = crear_grafico_tipo_obra_presupuesto(df_filtrado)
-            st.plotly_chart(fig_tipo_obra_presupuesto, use_container_width=True)
-        
-        col3, col4 = st.columns(2)
-        
-        with col3:
-            fig_tipo_obra_importe = crear_grafico_tipo_obra_importe(df_filtrado)
-            st.plotly_chart(fig_tipo_obra_importe, use_container_width=True)
-        
-        with col4:
-            fig_tipo_obra_baja = crear_grafico_tipo_obra_baja(df_filtrado)
-            st.plotly_chart(fig_tipo_obra_baja, use_container_width=True)
-        
-        # Gráfico de evolución mensual por tipo de obra (ancho completo)
-        fig_tipo_obra_tiempo = crear_grafico_tipo_obra_tiempo(df_filtrado)
-        st.plotly_chart(fig_tipo_obra_tiempo, use_container_width=True)
-        
-        # Gráfico de distribución de tipos de obra por aeropuerto (ancho completo)
-        fig_tipo_obra_aeropuertos = crear_grafico_tipo_obra_aeropuertos(df_filtrado)
-        st.plotly_chart(fig_tipo_obra_aeropuertos, use_container_width=True)
+        if abierta3:
+            st.subheader("🔧 Análisis por Tipo de Obra")
+            
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                mostrar_grafico(memo, crear_grafico_tipo_obra_licitaciones, cubo)
+            
+            with col2:
+                mostrar_grafico(memo, crear_grafico_tipo_obra_presupuesto, cubo)
+            
+            col3, col4 = st.columns(2)
+            
+            with col3:
+                mostrar_grafico(memo, crear_grafico_tipo_obra_importe, cubo)
+            
+            with col4:
+                mostrar_grafico(memo, crear_grafico_tipo_obra_baja, cubo)
+            
+            # Gráfico de evolución mensual por tipo de obra (ancho completo)
+            mostrar_grafico(memo, crear_grafico_tipo_obra_tiempo, cubo)
+            
+            # Gráfico de distribución de tipos de obra por aeropuerto (ancho completo)
+            mostrar_grafico(memo, crear_grafico_tipo_obra_aeropuertos, cubo)
     
     with tab4:
-        st.subheader("🏭 Análisis por Empresa")
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            fig_empresa_licitaciones = crear_grafico_empresa_licitaciones(df_filtrado)
-            st.plotly_chart(fig_empresa_licitaciones, use_container_width=True)
-        
-        with col2:
-            fig_empresa_presupuesto = crear_grafico_empresa_presupuesto(df_filtrado)
-            st.plotly_chart(fig_empresa_presupuesto, use_container_width=True)
-        
-        col3, col4 = st.columns(2)
-        
-        with col3:
-            fig_empresa_importe = crear_grafico_empresa_importe(df_filtrado)
-            st.plotly_chart(fig_empresa_importe, use_container_width=True)
-        
-        with col4:
-            fig_empresa_baja = crear_grafico_empresa_baja(df_filtrado)
-            st.plotly_chart(fig_empresa_baja, use_container_width=True)
-        
-        # Listado de empresas líderes por aeropuerto
-        mostrar_empresas_por_aeropuerto(df_filtrado)
+        if abierta4:
+            st.subheader("🏭 Análisis por Empresa")
+            
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                mostrar_grafico(memo, crear_grafico_empresa_licitaciones, cubo)
+            
+            with col2:
+                mostrar_grafico(memo, crear_grafico_empresa_presupuesto, cubo)
+            
+            col3, col4 = st.columns(2)
+            
+            with col3:
+                mostrar_grafico(memo, crear_grafico_empresa_importe, cubo)
+            
+            with col4:
+                mostrar_grafico(memo, crear_grafico_empresa_baja, cubo)
+            
+            # Listado de empresas líderes por aeropuerto
+            with instrumentacion_aena.tramo('empresas por aeropuerto'):
+                mostrar_empresas_por_aeropuerto(cubo())
     
     with tab5:
-        st.subheader("📉 Análisis por Baja")
-        
-        # Gráfico de porcentaje de baja por aeropuerto (vertical)
-        fig_baja_aeropuertos = crear_grafico_baja_aeropuertos(df_filtrado)
-        st.plotly_chart(fig_baja_aeropuertos, use_container_width=True)
-        
-        # Gráfico de baja por rangos de importe
-        fig_baja_rangos = crear_grafico_baja_rangos_importe(df_filtrado)
-        st.plotly_chart(fig_baja_rangos, use_container_width=True)
+        if abierta5:
+            st.subheader("📉 Análisis por Baja")
+            
+            # Gráfico de porcentaje de baja por aeropuerto (vertical)
+            mostrar_grafico(memo, crear_grafico_baja_aeropuertos, cubo)
+            
+            # Gráfico de baja por rangos de importe
+            mostrar_grafico(memo, crear_grafico_baja_rangos_importe, cubo)
+            
+            # Distribución de la baja: la media oculta los valores extremos
+            st.markdown("### Distribución de la Baja")
+            mostrar_grafico(memo, crear_grafico_baja_distribucion, cubo)
+            
+            dimension = st.radio("Agrupar por", list(DIMENSIONES_BAJA), format_func=DIMENSIONES_BAJA.get, horizontal=True, key="baja_dimension")
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                mostrar_grafico(memo, crear_grafico_baja_percentiles, cubo, dimension)
+            
+            with col2:
+                mostrar_grafico(memo, crear_grafico_baja_histograma, cubo, dimension)
     
     with tab6:
-        mostrar_tabla_detallada(df_filtrado)
+        if abierta6:
+            with instrumentacion_aena.tramo('tabla detallada'):
+                if almacen is not None:
+                    mostrar_tabla_detallada(None, almacen=almacen, filtros=filtros)
+                else:
+                    indice_texto = datos_aena.REGISTRO.derivado('indice_texto', indices_aena.IndiceTexto, instantanea=datos)
+                    mostrar_tabla_detallada(df_filtrado, indice_texto)
     
     with tab7:
-        st.subheader("🤖 IA")
-        
-        # Botón para GPT Competenc-IA
-        st.markdown("### GPT Competenc-IA")
-        st.markdown("Haz clic en el enlace para acceder al GPT especializado:")
-        st.markdown("[🚀 **Acceder a GPT Competenc-IA**](https://chatgpt.com/g/g-68db911ff44481919538e7bc1da992ff-competenc-ia)")
+        if abierta7:
+            st.subheader("🤖 IA")
+            
+            # Botón para GPT Competenc-IA
+            st.markdown("### GPT Competenc-IA")
+            st.markdown("Haz clic en el enlace para acceder al GPT especializado:")
+            st.markdown("[🚀 **Acceder a GPT Competenc-IA**](https://chatgpt.com/g/g-68db911ff44481919538e7bc1da992ff-competenc-ia)")
 
 if __name__ == "__main__":
-    main()
+    # Con AENA_DEBUG=1 el rerun se mide por tramos (instrumentacion_aena)
+    with instrumentacion_aena.rerun():
+        main()
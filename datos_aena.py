@@ -0,0 +1,813 @@
+"""Capa de carga de datos de licitaciones AENA con caché en disco
+
+Leer el Excel con openpyxl es la parte más lenta de cada recarga del dashboard.
+Este módulo guarda el DataFrame ya procesado en formato Parquet junto con la
+firma del archivo de origen (ruta, fecha de modificación y tamaño) y la versión
+de la lógica de procesado, y lo reutiliza mientras ninguna de ellas cambie.
+
+Se cargan todos los libros anuales ``<año>_AENA.xlsx`` del directorio de datos:
+los que no están en caché se leen en paralelo en un pool de procesos y el
+resultado se concatena en un único dataset con la columna ``Ejercicio``.
+
+Cada libro guarda además un manifiesto con la huella de cada fila (clave:
+número de expediente + lote). Cuando un libro cambia, solo se procesan las filas
+insertadas o modificadas y el cambio se aplica como un ``Delta`` sobre la
+partición en caché y sobre los agregados derivados del registro.
+
+Uso como script (informe de tiempos en frío y en caliente, o de memoria por
+columna antes y después del esquema compacto):
+
+    python datos_aena.py [2024_AENA.xlsx | directorio]
+    python datos_aena.py --memoria [2024_AENA.xlsx]
+"""
+import glob
+import hashlib
+import importlib.util
+import inspect
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import unicodedata
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import instrumentacion_aena
+
+# Motor de Parquet: se comprueba sin importarlo (se importa al usarlo)
+PARQUET_DISPONIBLE = importlib.util.find_spec('pyarrow') is not None
+
+# Directorio con los libros Excel anuales y patrón de sus nombres
+DIRECTORIO_DATOS = os.environ.get("AENA_DATA_DIR", ".")
+PATRON_LIBROS = "*_AENA.xlsx"
+
+# Directorio donde se guardan los datos procesados
+DIRECTORIO_CACHE = os.environ.get("AENA_CACHE_DIR", ".cache_aena")
+
+# Segundos que un dataset permanece en memoria antes de volver a comprobarse
+TTL_DATOS = float(os.environ.get("AENA_TTL_DATOS", 3600))
+
+# Incrementar cuando cambie el formato de lo que se guarda en la caché
+VERSION_CACHE = 1
+
+# Columnas del Excel original -> columnas que usa el dashboard
+COLUMNAS_CANONICAS = {
+    'Clasificación': 'Tipo_Obra',
+    'Adjudicatario licitación/lote': 'Empresa_Adjudicataria',
+    'Presupuesto base sin impuestos': 'Presupuesto_Base',
+    'Importe adjudicación sin impuestos licitación/lote': 'Importe_Adjudicado',
+    'Fecha presentación licitación': 'Fecha_Publicacion',
+    '%baja': 'Porcentaje_Baja',
+}
+# Columnas que identifican un contrato (el lote es opcional)
+COLUMNA_EXPEDIENTE = 'Número de expediente'
+COLUMNAS_LOTE = ['Lote', 'Número de lote', 'Nº lote', 'Lote licitación']
+
+# Columnas sin las que el dashboard no puede usar un dataset (filtros y cubo)
+COLUMNAS_REQUERIDAS = [
+    'Aeropuerto', 'Tipo_Obra', 'Empresa_Adjudicataria', 'Presupuesto_Base',
+    'Importe_Adjudicado', 'Porcentaje_Baja', 'Fecha_Publicacion', 'Mes',
+]
+
+# Esquema compacto del dataset procesado: dimensiones de pocos valores como
+# Categorical, texto largo en cadenas de Arrow y números en el tipo más pequeño
+# que no pierda precisión
+COLUMNAS_CATEGORICAS = [
+    'Aeropuerto', 'Tipo_Obra', 'Empresa_Adjudicataria', 'Estado',
+    'Empresa_Miembros', 'Clasificación', 'Adjudicatario licitación/lote', 'Órgano de Contratación',
+]
+COLUMNAS_TEXTO = ['Objeto del Contrato', 'Link licitación', 'Número de expediente', '_clave']
+COLUMNAS_IMPORTES = [
+    'Presupuesto_Base', 'Importe_Adjudicado', 'Porcentaje_Baja', 'Ahorro',
+    'Presupuesto base sin impuestos', 'Importe adjudicación sin impuestos licitación/lote', '%baja',
+]
+COLUMNAS_CALENDARIO = ['Mes', 'Trimestre', 'Ejercicio']
+COLUMNAS_FECHA = ['Fecha_Publicacion', 'Fecha presentación licitación']
+
+# Cabeceras que cambian de nombre entre ejercicios -> cabecera del libro de 2024
+SINONIMOS_COLUMNAS = {
+    'Fecha de presentación': 'Fecha presentación licitación',
+    'Fecha presentación': 'Fecha presentación licitación',
+    'Adjudicatario': 'Adjudicatario licitación/lote',
+    'Adjudicatario licitación': 'Adjudicatario licitación/lote',
+    'Importe adjudicación sin impuestos': 'Importe adjudicación sin impuestos licitación/lote',
+    'Importe adjudicación': 'Importe adjudicación sin impuestos licitación/lote',
+    'Presupuesto base': 'Presupuesto base sin impuestos',
+    '% baja': '%baja',
+    'Baja': '%baja',
+    'Objeto del contrato': 'Objeto del Contrato',
+    'Nº de expediente': 'Número de expediente',
+    'Expediente': 'Número de expediente',
+    'Link': 'Link licitación',
+    'Enlace licitación': 'Link licitación',
+}
+
+
+def activar_copy_on_write():
+    """Activar Copy-on-Write en pandas (lo llaman los puntos de entrada)
+
+    Con Copy-on-Write los filtros y vistas no duplican el DataFrame compartido
+    (en pandas >= 3.0 siempre está activado).
+    """
+    if int(pd.__version__.split('.')[0]) < 3:
+        pd.options.mode.copy_on_write = True
+
+
+def _normalizar_cabecera(nombre):
+    """Cabecera sin tildes, en minúsculas y sin espacios repetidos"""
+    nombre = unicodedata.normalize('NFKD', str(nombre))
+    nombre = ''.join(c for c in nombre if not unicodedata.combining(c))
+    return re.sub(r'\s+', ' ', nombre).strip().lower()
+
+
+_CABECERAS_CONOCIDAS = {
+    _normalizar_cabecera(variante): original
+    for variante, original in [
+        *SINONIMOS_COLUMNAS.items(),
+        *((original, original) for original in SINONIMOS_COLUMNAS.values()),
+        *((original, original) for original in COLUMNAS_CANONICAS),
+        ('Aeropuerto', 'Aeropuerto'),
+        ('Estado', 'Estado'),
+        ('Órgano de Contratación', 'Órgano de Contratación'),
+    ]
+}
+
+
+def canonicalizar_columnas(df):
+    """Crear las columnas del dashboard a partir de las columnas originales del Excel"""
+    # Unificar las cabeceras de todos los ejercicios con las del libro de 2024
+    renombrar = {}
+    for columna in df.columns:
+        original = _CABECERAS_CONOCIDAS.get(_normalizar_cabecera(columna))
+        if original is not None and original != columna and original not in df.columns:
+            renombrar[columna] = original
+    # Mantener las columnas originales del Excel y crear columnas adicionales para el dashboard
+    df_processed = df.rename(columns=renombrar)
+    for original, canonica in COLUMNAS_CANONICAS.items():
+        if original in df_processed.columns:
+            df_processed[canonica] = df_processed[original]
+    return df_processed
+
+
+def leer_excel(ruta):
+    """Leer un libro Excel de licitaciones y crear las columnas del dashboard"""
+    return canonicalizar_columnas(pd.read_excel(ruta))
+
+
+def ejercicio_de(ruta):
+    """Año del ejercicio según el nombre del libro (2024_AENA.xlsx -> 2024)"""
+    coincidencia = re.match(r'(\d{4})_', os.path.basename(ruta))
+    return int(coincidencia.group(1)) if coincidencia else None
+
+
+def _reducir_importe(serie):
+    """float64 -> float32 solo si todos los valores se conservan exactamente"""
+    if serie.dtype != np.float64:
+        return serie
+    valores = serie.to_numpy()
+    reducidos = valores.astype(np.float32)
+    if np.array_equal(reducidos.astype(np.float64), valores, equal_nan=True):
+        return pd.Series(reducidos, index=serie.index, name=serie.name)
+    return serie
+
+
+def _reducir_calendario(serie):
+    """Mes, trimestre y año: entero pequeño, o float32 si hay fechas vacías"""
+    if serie.dtype.kind not in 'fiu':
+        serie = pd.to_numeric(serie, errors='coerce')
+    if serie.isna().any():
+        return serie.astype(np.float32)
+    return pd.to_numeric(serie, downcast='integer')
+
+
+def aplicar_esquema(df):
+    """Convertir el dataset procesado a tipos compactos
+
+    Es idempotente: se vuelve a aplicar tras concatenar particiones, que pueden
+    traer categorías distintas.
+    """
+    tipos = {}
+    for col in COLUMNAS_CATEGORICAS:
+        if col in df.columns:
+            tipos[col] = 'category'
+    if PARQUET_DISPONIBLE:
+        for col in COLUMNAS_TEXTO:
+            if col in df.columns and df[col].dtype == object:
+                tipos[col] = pd.StringDtype('pyarrow')
+    df = df.astype(tipos)
+    for col in COLUMNAS_IMPORTES:
+        if col in df.columns:
+            df[col] = _reducir_importe(df[col])
+    for col in COLUMNAS_CALENDARIO:
+        if col in df.columns:
+            df[col] = _reducir_calendario(df[col])
+    for col in COLUMNAS_FECHA:
+        if col in df.columns and df[col].dtype == object:
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+    return df
+
+
+def informe_memoria(antes, despues):
+    """Bytes por columna antes y después del esquema compacto"""
+    informe = pd.DataFrame({
+        'tipo_antes': antes.dtypes.astype(str),
+        'bytes_antes': antes.memory_usage(deep=True, index=False),
+        'tipo_despues': despues.dtypes.astype(str),
+        'bytes_despues': despues.memory_usage(deep=True, index=False),
+    })
+    informe.loc['TOTAL'] = ['', informe['bytes_antes'].sum(), '', informe['bytes_despues'].sum()]
+    informe['reduccion'] = informe['bytes_antes'] / informe['bytes_despues']
+    return informe
+
+
+def descubrir_libros(directorio=None):
+    """Lista de (ejercicio, ruta) de los libros <año>_AENA.xlsx, ordenada por año"""
+    directorio = DIRECTORIO_DATOS if directorio is None else directorio
+    libros = []
+    for ruta in glob.glob(os.path.join(directorio, PATRON_LIBROS)):
+        if os.path.basename(ruta).startswith('~$'):
+            continue  # Archivo de bloqueo de Excel
+        libros.append((ejercicio_de(ruta), ruta))
+    return sorted(libros, key=lambda libro: (libro[0] is None, libro[0] or 0, libro[1]))
+
+
+def _leer_particion(ejercicio, ruta):
+    """Leer un libro en un proceso del pool (debe ser una función de módulo)"""
+    df = leer_excel(ruta)
+    df['Ejercicio'] = ejercicio
+    return df
+
+
+def claves_filas(df):
+    """Clave estable de cada fila: número de expediente + lote
+
+    Si el libro no tiene columna de lote, o hay filas con la misma clave, se
+    añade a la clave el número de aparición.
+    """
+    vacia = pd.Series('', index=df.index)
+    expediente = df[COLUMNA_EXPEDIENTE].astype(str) if COLUMNA_EXPEDIENTE in df.columns else vacia
+    columna_lote = next((c for c in COLUMNAS_LOTE if c in df.columns), None)
+    lote = df[columna_lote].astype(str) if columna_lote else vacia
+    base = expediente + '|' + lote
+    return (base + '|' + base.groupby(base).cumcount().astype(str)).to_numpy()
+
+
+def huellas_filas(df):
+    """Huella de 64 bits del contenido de cada fila
+
+    Los decimales se redondean para que reescribir el libro (que puede cambiar
+    el último dígito de un float) no cuente como modificación.
+    """
+    columnas = sorted(c for c in df.columns if c != '_clave')
+    contenido = df[columnas].apply(lambda col: col.round(9) if col.dtype.kind == 'f' else col)
+    return pd.util.hash_pandas_object(contenido, index=False).to_numpy()
+
+
+# Huellas ya calculadas por conjunto de funciones (leer el código fuente es lento)
+_versiones_procesado = {}
+
+
+def version_procesado(*funciones):
+    """Huella de la lógica de procesado: cambia si cambia el código de las funciones
+
+    Se calcula una vez por conjunto de funciones: al recargar un módulo sus
+    funciones son objetos nuevos y la huella se vuelve a calcular.
+    """
+    version = _versiones_procesado.get(funciones)
+    if version is not None:
+        return version
+    h = hashlib.sha1()
+    h.update(f"cache={VERSION_CACHE};pandas={pd.__version__.split('.')[0]}".encode())
+    h.update(repr(sorted(COLUMNAS_CANONICAS.items())).encode())
+    for funcion in (canonicalizar_columnas,) + funciones:
+        try:
+            h.update(inspect.getsource(funcion).encode())
+        except (OSError, TypeError):
+            h.update(funcion.__qualname__.encode())
+    version = _versiones_procesado[funciones] = h.hexdigest()[:16]
+    return version
+
+
+def firma_archivo(ruta):
+    """Firma del archivo de origen: ruta absoluta, fecha de modificación y tamaño"""
+    estado = os.stat(ruta)
+    return {
+        'ruta': os.path.abspath(ruta),
+        'mtime_ns': estado.st_mtime_ns,
+        'tamano': estado.st_size,
+    }
+
+
+def clave_datos(ruta, version):
+    """Clave de la versión de datos: firma del archivo más versión del procesado"""
+    firma = json.dumps(firma_archivo(ruta), sort_keys=True)
+    return hashlib.sha1(f"{firma}|{version}".encode()).hexdigest()[:16]
+
+
+def clave_libros(libros, version):
+    """Clave de la versión de datos de un conjunto de libros"""
+    return _clave_firmas([firma_archivo(ruta) for _, ruta in libros], version)
+
+
+def _clave_firmas(firmas, version):
+    firmas = json.dumps(firmas, sort_keys=True)
+    return hashlib.sha1(f"{firmas}|{version}".encode()).hexdigest()[:16]
+
+
+def _directorio_entrada(ruta):
+    """Directorio de caché de un archivo de origen"""
+    ruta_abs = os.path.abspath(ruta)
+    h = hashlib.sha1(ruta_abs.encode()).hexdigest()[:12]
+    nombre = os.path.splitext(os.path.basename(ruta_abs))[0]
+    return os.path.join(DIRECTORIO_CACHE, f"{nombre}-{h}")
+
+
+def _leer_meta(directorio):
+    try:
+        with open(os.path.join(directorio, 'meta.json'), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _escribir_atomico(ruta, escribir):
+    """Escribir en un temporal y renombrar, para no dejar nunca archivos a medias"""
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    try:
+        escribir(temporal)
+        os.replace(temporal, ruta)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+
+def _leer_parquet(directorio, nombre):
+    try:
+        return pd.read_parquet(os.path.join(directorio, f'{nombre}.parquet'))
+    except Exception:
+        # Caché corrupta o incompleta: se reconstruye desde el Excel
+        return None
+
+
+def leer_cache(ruta, version):
+    """Devolver el DataFrame en caché si la firma y la versión coinciden, o None"""
+    if not PARQUET_DISPONIBLE:
+        return None
+    directorio = _directorio_entrada(ruta)
+    meta = _leer_meta(directorio)
+    if meta is None or meta.get('firma') != firma_archivo(ruta) or meta.get('version') != version:
+        return None
+    return _leer_parquet(directorio, 'datos')
+
+
+def guardar_cache(ruta, version, df, manifiesto=None, firma=None):
+    """Guardar el DataFrame procesado en la caché. Devuelve False si no se pudo
+
+    ``firma`` debe tomarse antes de leer el libro, para que un cambio durante la
+    lectura no quede marcado como ya procesado.
+    """
+    if not PARQUET_DISPONIBLE:
+        return False
+    directorio = _directorio_entrada(ruta)
+    meta = {'firma': firma or firma_archivo(ruta), 'version': version, 'filas': len(df)}
+    try:
+        os.makedirs(directorio, exist_ok=True)
+        _escribir_atomico(
+            os.path.join(directorio, 'datos.parquet'),
+            lambda destino: df.to_parquet(destino, index=False),
+        )
+        if manifiesto is not None:
+            _escribir_atomico(
+                os.path.join(directorio, 'manifiesto.parquet'),
+                lambda destino: manifiesto.to_parquet(destino, index=False),
+            )
+        _escribir_atomico(
+            os.path.join(directorio, 'meta.json'),
+            lambda destino: _volcar_json(meta, destino),
+        )
+        return True
+    except Exception:
+        # La caché es una optimización: si no se puede escribir se sigue sin ella
+        return False
+
+
+def _volcar_json(datos, destino):
+    with open(destino, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, ensure_ascii=False)
+
+
+def limpiar_cache():
+    """Borrar todo el contenido de la caché en disco"""
+    shutil.rmtree(DIRECTORIO_CACHE, ignore_errors=True)
+
+
+class Delta:
+    """Cambios de una recarga respecto a la versión de datos anterior
+
+    ``insertados`` son las filas procesadas que hay que añadir (nuevas y nueva
+    versión de las modificadas) y ``eliminados`` las que hay que quitar
+    (borradas y versión anterior de las modificadas). ``clave_base`` es la clave
+    de la versión de datos sobre la que se aplica el cambio.
+    """
+
+    def __init__(self, clave_base, insertados, eliminados, resumen):
+        self.clave_base = clave_base
+        self.insertados = insertados
+        self.eliminados = eliminados
+        self.resumen = resumen
+
+    @classmethod
+    def combinar(cls, clave_base, deltas):
+        """Unir los cambios de varias particiones en un único delta"""
+        resumen = {'insertadas': 0, 'actualizadas': 0, 'eliminadas': 0}
+        for delta in deltas:
+            for campo, valor in delta.resumen.items():
+                resumen[campo] += valor
+        insertados = [d.insertados for d in deltas if len(d.insertados)]
+        eliminados = [d.eliminados for d in deltas if len(d.eliminados)]
+        return cls(
+            clave_base,
+            pd.concat(insertados, ignore_index=True) if insertados else pd.DataFrame(),
+            pd.concat(eliminados, ignore_index=True) if eliminados else pd.DataFrame(),
+            resumen,
+        )
+
+    @property
+    def vacio(self):
+        return not any(self.resumen.values())
+
+
+def _aplicar_cambios(crudo, manifiesto, previo, manifiesto_previo, procesar):
+    """Procesar solo las filas nuevas o modificadas y aplicarlas a la partición previa"""
+    anterior = pd.Series(manifiesto_previo['huella'].to_numpy(), index=manifiesto_previo['clave'].to_numpy())
+    actual = pd.Series(manifiesto['huella'].to_numpy(), index=manifiesto['clave'].to_numpy())
+
+    comunes = actual.index.intersection(anterior.index)
+    actualizadas = comunes[actual[comunes].to_numpy() != anterior[comunes].to_numpy()]
+    insertadas = actual.index.difference(anterior.index)
+    eliminadas = anterior.index.difference(actual.index)
+
+    cambiadas = insertadas.union(actualizadas)
+    if len(cambiadas):
+        insertados = procesar(crudo[crudo['_clave'].isin(cambiadas)])
+    else:
+        insertados = previo.iloc[:0]
+    fuera = previo['_clave'].isin(eliminadas.union(actualizadas))
+    eliminados = previo[fuera]
+
+    # Mantener el orden de las filas del libro
+    df = aplicar_esquema(pd.concat([previo[~fuera], insertados], ignore_index=True))
+    posicion = pd.Series(np.arange(len(actual)), index=actual.index)
+    df = df.iloc[np.argsort(posicion[df['_clave']].to_numpy(), kind='stable')].reset_index(drop=True)
+
+    resumen = {'insertadas': len(insertadas), 'actualizadas': len(actualizadas), 'eliminadas': len(eliminadas)}
+    return df, Delta(None, insertados, eliminados, resumen)
+
+
+def _contexto_pool():
+    """Contexto de multiprocessing para el pool de lectura
+
+    Con ``fork`` los procesos hijos heredan pandas ya importado y no vuelven a
+    ejecutar el script principal (con Streamlit, ``spawn`` re-importaría el
+    dashboard completo en cada hijo). Los hijos solo leen Excel, sin tocar el
+    estado de los hilos del servidor. En macOS y Windows se usa ``spawn``.
+    """
+    if sys.platform.startswith('linux'):
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context('spawn')
+
+
+def leer_particiones(pendientes, max_procesos=None):
+    """Leer en paralelo los libros pendientes. Devuelve {ruta: df sin procesar}"""
+    if len(pendientes) <= 1 or max_procesos == 1:
+        return {ruta: _leer_particion(ejercicio, ruta) for ejercicio, ruta in pendientes}
+    procesos = min(len(pendientes), max_procesos or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=procesos, mp_context=_contexto_pool()) as pool:
+        futuros = {ruta: pool.submit(_leer_particion, ejercicio, ruta) for ejercicio, ruta in pendientes}
+        return {ruta: futuro.result() for ruta, futuro in futuros.items()}
+
+
+def cargar_libros(libros, procesar, version, max_procesos=None):
+    """Cargar y concatenar varios libros anuales ya procesados
+
+    Cada libro es una partición que se guarda en caché por separado, de modo
+    que al añadir o modificar un ejercicio solo se vuelve a leer ese libro, y
+    de él solo se procesan las filas que han cambiado.
+
+    Devuelve una tupla (df, delta). ``delta`` describe los cambios respecto a la
+    versión anterior en caché, o es None si hubo que reconstruir desde cero.
+    """
+    particiones = {}
+    firmas = {}
+    previas = {}
+    firmas_base = []  # Firmas de la versión anterior, para la clave base del delta
+    incremental = True
+    for ejercicio, ruta in libros:
+        firmas[ruta] = firma_archivo(ruta)
+        meta = _leer_meta(_directorio_entrada(ruta)) if PARQUET_DISPONIBLE else None
+        if meta is not None and meta.get('version') != version:
+            incremental = False
+            meta = None
+        if meta is not None and meta.get('firma') == firmas[ruta]:
+            df = _leer_parquet(_directorio_entrada(ruta), 'datos')
+            if df is not None:
+                particiones[ruta] = df
+                firmas_base.append(firmas[ruta])
+                continue
+        if meta is not None:
+            previas[ruta] = meta
+            firmas_base.append(meta['firma'])
+        # Sin meta: libro nuevo, que no existía en la versión anterior
+
+    pendientes = [(ejercicio, ruta) for ejercicio, ruta in libros if ruta not in particiones]
+    deltas = []
+    with instrumentacion_aena.tramo('lectura Excel'):
+        leidas = leer_particiones(pendientes, max_procesos)
+    for ruta, crudo in leidas.items():
+        crudo['_clave'] = claves_filas(crudo)
+        manifiesto = pd.DataFrame({'clave': crudo['_clave'].to_numpy(), 'huella': huellas_filas(crudo)})
+
+        directorio = _directorio_entrada(ruta)
+        previo = _leer_parquet(directorio, 'datos') if ruta in previas else None
+        manifiesto_previo = _leer_parquet(directorio, 'manifiesto') if previo is not None else None
+        if manifiesto_previo is not None:
+            df, delta = _aplicar_cambios(crudo, manifiesto, previo, manifiesto_previo, procesar)
+        else:
+            if ruta in previas:
+                incremental = False
+            df = procesar(crudo).reset_index(drop=True)
+            delta = Delta(None, df, df.iloc[:0], {'insertadas': len(df), 'actualizadas': 0, 'eliminadas': 0})
+        deltas.append(delta)
+
+        guardar_cache(ruta, version, df, manifiesto, firmas[ruta])
+        particiones[ruta] = df
+
+    if not particiones:
+        return None, None
+    df = pd.concat([particiones[ruta] for _, ruta in libros], ignore_index=True)
+    if len(particiones) > 1:
+        df = aplicar_esquema(df)
+    delta = Delta.combinar(_clave_firmas(firmas_base, version), deltas) if incremental else None
+    return df, delta
+
+
+def validar_dataset(df):
+    """Comprobar que un dataset recién cargado se puede poner en uso (ValueError si no)"""
+    if df is None or len(df) == 0:
+        raise ValueError("el dataset está vacío")
+    faltan = [col for col in COLUMNAS_REQUERIDAS if col not in df.columns]
+    if faltan:
+        raise ValueError(f"faltan columnas: {', '.join(faltan)}")
+    if df['Presupuesto_Base'].isna().all():
+        raise ValueError("ninguna licitación tiene presupuesto base")
+
+
+# Estado del registro leído de una vez: versión, dataset, delta y derivados ya
+# calculados para esa versión (nombre -> valor)
+Instantanea = namedtuple('Instantanea', ['version', 'df', 'delta', 'derivados'])
+
+
+class RegistroDatos:
+    """Registro de datasets compartido por todas las sesiones del proceso
+
+    Guarda un único DataFrame por versión de datos, que las sesiones solo leen,
+    y las estructuras derivadas de él (índices, agregados...). La carga de una
+    versión se ejecuta como mucho una vez aunque lleguen varias sesiones a la
+    vez: la primera carga y las demás esperan a su resultado.
+
+    El dataset puede cambiar en cualquier momento (vigilante_aena). Quien use
+    varias piezas juntas (dataset, índice, cubo, versión) toma una sola
+    ``instantanea()`` por rerun o petición y la pasa a ``derivado``.
+    """
+
+    def __init__(self, ttl=TTL_DATOS):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._cargas = {}  # versión -> lock de la carga en curso
+        self._version = None
+        self._df = None
+        self._delta = None  # Cambios desde la versión anterior, si se conocen
+        self._derivados = {}  # nombre -> (versión, valor)
+        self._constructores = {}  # nombre -> (construir, actualizar) de cada derivado pedido
+        self._instante = 0.0
+
+    def _vigente(self, version):
+        return (
+            self._df is not None
+            and self._version == version
+            and (self.ttl is None or time.monotonic() - self._instante < self.ttl)
+        )
+
+    def obtener(self, version, cargar):
+        """Devolver el dataset de la versión indicada, cargándolo si hace falta
+
+        ``cargar`` devuelve una tupla (df, delta), como ``cargar_libros``.
+        """
+        with self._lock:
+            if self._vigente(version):
+                return self._df
+            lock_carga = self._cargas.setdefault(version, threading.Lock())
+
+        with lock_carga:
+            with self._lock:
+                # Otra sesión pudo terminar la carga mientras esperábamos
+                if self._vigente(version):
+                    return self._df
+            df, delta = cargar()
+            with self._lock:
+                self._cargas.pop(version, None)
+                if df is not None:
+                    # El delta solo sirve si parte de la versión que tenemos en memoria
+                    if delta is None or delta.clave_base != self._version:
+                        delta = None
+                    self._version, self._df, self._delta = version, df, delta
+                    self._instante = time.monotonic()
+            return df
+
+    def instantanea(self):
+        """Versión, dataset, delta y derivados vigentes, leídos a la vez bajo el cerrojo"""
+        with self._lock:
+            derivados = {nombre: valor for nombre, (v, valor) in self._derivados.items() if v == self._version}
+            return Instantanea(self._version, self._df, self._delta, derivados)
+
+    def derivado(self, nombre, construir, actualizar=None, instantanea=None):
+        """Estructura derivada del dataset, calculada una vez por versión
+
+        Con ``instantanea`` se obtiene la de su versión y su dataset, aunque el
+        registro haya cambiado después (entonces no se guarda en él); sin ella,
+        la del dataset vigente. Si existe la de la versión anterior y se conoce
+        el delta, se obtiene con ``actualizar(anterior, delta)`` en lugar de
+        ``construir(df)``. Sin dataset (registro vacío o invalidado) lanza
+        RuntimeError: construir no recibe nunca None.
+        """
+        if instantanea is not None and nombre in instantanea.derivados:
+            return instantanea.derivados[nombre]
+        with self._lock:
+            self._constructores.setdefault(nombre, (construir, actualizar))
+            if instantanea is None:
+                version, df, delta = self._version, self._df, self._delta
+            else:
+                version, df, delta = instantanea.version, instantanea.df, instantanea.delta
+            if df is None:
+                raise RuntimeError(f"No hay ningún dataset cargado para calcular {nombre!r}")
+            entrada = self._derivados.get(nombre)
+            if entrada is not None and entrada[0] == version:
+                valor = entrada[1]
+            else:
+                valor, lock_calculo = None, self._cargas.setdefault((nombre, version), threading.Lock())
+
+        if valor is None:
+            with lock_calculo:
+                with self._lock:
+                    entrada = self._derivados.get(nombre)
+                if entrada is not None and entrada[0] == version:
+                    valor = entrada[1]
+                else:
+                    if entrada is not None and actualizar is not None and delta is not None and entrada[0] == delta.clave_base:
+                        valor = actualizar(entrada[1], delta)
+                    else:
+                        valor = construir(df)
+                    with self._lock:
+                        self._cargas.pop((nombre, version), None)
+                        if self._version == version:
+                            self._derivados[nombre] = (version, valor)
+        if instantanea is not None:
+            instantanea.derivados[nombre] = valor
+        return valor
+
+    def sustituir(self, version, df, delta=None):
+        """Hacer vigente un dataset cargado fuera de las sesiones (vigilante_aena)
+
+        Antes del cambio se calculan para la nueva versión todos los derivados
+        que se han pedido alguna vez (a partir del delta si se puede), así que
+        ninguna sesión espera por ellos. Versión, dataset y derivados cambian a
+        la vez bajo el cerrojo: una ``instantanea()`` ve siempre los de una
+        misma versión. Quien lee las piezas por separado (``df``, ``version``,
+        ``derivado`` sin instantánea) puede mezclar versiones.
+        """
+        with self._lock:
+            version_base = self._version
+            anteriores = {nombre: valor for nombre, (v, valor) in self._derivados.items() if v == version_base}
+            constructores = dict(self._constructores)
+        if delta is not None and delta.clave_base != version_base:
+            delta = None
+        derivados = {}
+        for nombre, (construir, actualizar) in constructores.items():
+            if delta is not None and actualizar is not None and nombre in anteriores:
+                derivados[nombre] = (version, actualizar(anteriores[nombre], delta))
+            else:
+                derivados[nombre] = (version, construir(df))
+        with self._lock:
+            self._version, self._df, self._delta = version, df, delta
+            self._derivados = derivados
+            self._instante = time.monotonic()
+
+    def invalidar(self):
+        """Descartar el dataset en memoria: la siguiente petición lo vuelve a cargar"""
+        with self._lock:
+            self._version, self._df, self._delta = None, None, None
+            self._derivados.clear()
+
+    @property
+    def version(self):
+        return self._version
+
+    @property
+    def df(self):
+        """Dataset vigente (o None), sin comprobar si los libros han cambiado"""
+        return self._df
+
+    @property
+    def delta(self):
+        """Cambios de la última recarga incremental, o None"""
+        return self._delta
+
+
+# Registro único del proceso (el módulo no se vuelve a ejecutar en cada rerun)
+REGISTRO = RegistroDatos()
+
+
+def informe_tiempos(ruta, procesar, version, repeticiones=5):
+    """Medir la carga en frío (sin caché) y en caliente (con caché)"""
+    shutil.rmtree(_directorio_entrada(ruta), ignore_errors=True)
+    libros = [(ejercicio_de(ruta), ruta)]
+    inicio = time.perf_counter()
+    df, _ = cargar_libros(libros, procesar, version)
+    frio = time.perf_counter() - inicio
+
+    calientes = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        cargar_libros(libros, procesar, version)
+        calientes.append(time.perf_counter() - inicio)
+
+    return {
+        'archivo': ruta,
+        'filas': len(df),
+        'frio_ms': frio * 1000,
+        'caliente_ms': min(calientes) * 1000,
+        'aceleracion': frio / min(calientes) if min(calientes) > 0 else float('inf'),
+    }
+
+
+def informe_directorio(directorio, procesar, version):
+    """Comparar la carga en frío de todos los libros con la del libro más grande"""
+    libros = descubrir_libros(directorio)
+    mayor = max(libros, key=lambda libro: os.path.getsize(libro[1]))
+    for _, ruta in libros:
+        shutil.rmtree(_directorio_entrada(ruta), ignore_errors=True)
+
+    inicio = time.perf_counter()
+    df, _ = cargar_libros(libros, procesar, version)
+    todos = time.perf_counter() - inicio
+
+    shutil.rmtree(_directorio_entrada(mayor[1]), ignore_errors=True)
+    inicio = time.perf_counter()
+    cargar_libros([mayor], procesar, version)
+    uno = time.perf_counter() - inicio
+
+    return {
+        'libros': len(libros),
+        'filas': len(df),
+        'procesos': min(len(libros), os.cpu_count() or 1),
+        'todos_ms': todos * 1000,
+        'mayor_ms': uno * 1000,
+    }
+
+
+if __name__ == "__main__":
+    import empresas_aena
+    from dashboard_aena import procesar_datos
+
+    activar_copy_on_write()
+
+    if '--memoria' in sys.argv:
+        sys.argv.remove('--memoria')
+        archivo = sys.argv[1] if len(sys.argv) > 1 else "2024_AENA.xlsx"
+        crudo = _leer_particion(ejercicio_de(archivo), archivo)
+        informe = informe_memoria(procesar_datos(crudo.copy(), tipar=False), procesar_datos(crudo))
+        with pd.option_context('display.width', 200, 'display.max_columns', 10):
+            print(informe)
+        sys.exit(0)
+
+    archivo = sys.argv[1] if len(sys.argv) > 1 else "2024_AENA.xlsx"
+    version = version_procesado(procesar_datos, empresas_aena)
+    if os.path.isdir(archivo):
+        informe = informe_directorio(archivo, procesar_datos, version)
+        print(f"Libros:              {informe['libros']} ({informe['filas']} filas, {informe['procesos']} procesos)")
+        print(f"Todos en frío:       {informe['todos_ms']:.1f} ms")
+        print(f"Libro mayor en frío: {informe['mayor_ms']:.1f} ms")
+        sys.exit(0)
+
+    informe = informe_tiempos(archivo, procesar_datos, version)
+    print(f"Archivo:          {informe['archivo']} ({informe['filas']} filas)")
+    print(f"Carga en frío:    {informe['frio_ms']:.1f} ms (Excel + procesado + escritura Parquet)")
+    print(f"Carga en caliente: {informe['caliente_ms']:.1f} ms (Parquet)")
+    print(f"Aceleración:      x{informe['aceleracion']:.1f}")
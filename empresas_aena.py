@@ -0,0 +1,261 @@
+"""Normalización de nombres de empresa y resolución de entidades
+
+El adjudicatario llega tal cual del Excel, así que una misma empresa aparece
+con variantes ("FERROVIAL CONSTRUCCION, S.A.", "Ferrovial Construcción SA") y
+las UTE como nombres sueltos. ``ResolutorEmpresas`` asigna a cada nombre:
+
+- un nombre canónico: mayúsculas, sin puntuación ni paréntesis y con el sufijo
+  legal unificado (S.A.U. -> SA, S.L.U. -> SL...);
+- una clave de comparación sin tildes y con el sufijo legal canónico (una SA y
+  una SL con el mismo nombre comercial son entidades distintas), con la que se
+  agrupan los casi duplicados (erratas) con el mismo sufijo comparando solo
+  nombres vecinos en orden alfabético, por el principio y por el final, nunca
+  todos contra todos;
+- los miembros de una UTE, cada uno resuelto igual que una empresa suelta.
+
+Lo resuelto se guarda en disco por nombre original: en cada recarga solo se
+procesan los nombres nuevos.
+"""
+import difflib
+import json
+import os
+import re
+import sys
+import threading
+import unicodedata
+
+import pandas as pd
+
+from datos_aena import DIRECTORIO_CACHE, _escribir_atomico, _volcar_json, version_procesado
+
+# Caché de nombres resueltos (se descarta si cambian las reglas de este módulo)
+RUTA_CACHE = os.path.join(DIRECTORIO_CACHE, 'empresas.json')
+
+# Formas de los sufijos legales -> sufijo canónico
+SUFIJOS_LEGALES = [
+    (r'S\s?A\s?U', 'SA'),
+    (r'S\s?L\s?U', 'SL'),
+    (r'S\s?L\s?L', 'SLL'),
+    (r'S\s?COOP(?:\s?LTDA)?', 'S COOP'),
+    (r'S\s?A', 'SA'),
+    (r'S\s?L', 'SL'),
+]
+_SUFIJO = re.compile(r'\s(' + '|'.join(forma for forma, _ in SUFIJOS_LEGALES) + r')$')
+_SUFIJO_FINAL = re.compile(r'\b(SA|SL|SLL|S COOP)$')
+
+# Separadores entre miembros de una UTE ("A SA - B SL", "A SA / B SL")
+_SEPARADOR = re.compile(r'\s*[-/+]\s*')
+
+# Agrupación de casi duplicados: parecido mínimo y vecinos comparados
+UMBRAL_PARECIDO = 0.94
+LONGITUD_MINIMA = 10
+VENTANA = 4
+
+SIN_EMPRESA = 'No especificado'
+
+
+def sin_tildes(texto):
+    texto = unicodedata.normalize('NFKD', texto)
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+
+def limpiar_nombre(nombre):
+    """Mayúsculas, sin paréntesis ni puntuación y con el sufijo legal canónico"""
+    texto = re.sub(r'\([^)]*\)', ' ', str(nombre).upper())
+    texto = re.sub(r'(?<=\b[A-Z])\.', '', texto)  # S.A. -> SA, S.L.U. -> SLU
+    texto = re.sub(r'[.,;:"\']', ' ', texto)
+    texto = re.sub(r'\s+', ' ', texto).strip(' -/')
+    sufijo = _SUFIJO.search(texto)
+    if sufijo:
+        forma = re.sub(r'\s', '', sufijo.group(1))
+        for patron, canonico in SUFIJOS_LEGALES:
+            if re.fullmatch(patron.replace(r'\s?', ''), forma):
+                texto = texto[:sufijo.start()] + ' ' + canonico
+                break
+    return texto
+
+
+def clave_nombre(nombre_limpio):
+    """Clave de comparación: sin tildes, con el sufijo legal canónico"""
+    return sin_tildes(nombre_limpio)
+
+
+def sufijo_legal(nombre_limpio):
+    """Sufijo legal canónico del nombre ('' si no tiene)"""
+    sufijo = _SUFIJO_FINAL.search(nombre_limpio)
+    return sufijo.group(1) if sufijo else ''
+
+
+def separar_ute(nombre):
+    """Miembros de una UTE (nombres limpios), o [] si no es una UTE con miembros
+
+    Se parte por los separadores que siguen a un sufijo legal, de modo que los
+    guiones dentro de un nombre no lo dividen. Se descarta el prefijo "UTE" y el
+    nombre propio de la UTE que a veces sigue al último miembro.
+    """
+    texto = limpiar_nombre(nombre)
+    es_ute = bool(re.match(r'UTE\b', texto)) or ' UTE ' in f' {texto} '
+    texto = re.sub(r'^UTE\s+', '', texto)
+    miembros, inicio = [], 0
+    for separador in _SEPARADOR.finditer(texto):
+        previo = texto[inicio:separador.start()]
+        if _SUFIJO_FINAL.search(limpiar_nombre(previo)):
+            miembros.append(previo)
+            inicio = separador.end()
+    miembros.append(texto[inicio:])
+    miembros = [re.sub(r'\s+UTE\b.*$', '', limpiar_nombre(m)) for m in miembros]
+    miembros = [limpiar_nombre(m) for m in miembros if m]
+    if not es_ute and not _SUFIJO_FINAL.search(miembros[-1]):
+        return []  # "EMPRESA SL - SIGLAS": la misma empresa, no una UTE
+    if len(miembros) > 1 or (es_ute and len(miembros) == 1 and _SUFIJO_FINAL.search(miembros[0]) and miembros[0] != texto):
+        return miembros
+    return []
+
+
+def _parecidos(a, b):
+    """Claves casi iguales con el mismo sufijo legal (se comparan sin él)"""
+    if sufijo_legal(a) != sufijo_legal(b):
+        return False
+    a, b = (_SUFIJO_FINAL.sub('', clave).strip() for clave in (a, b))
+    if min(len(a), len(b)) < LONGITUD_MINIMA:
+        return False
+    return difflib.SequenceMatcher(None, a, b, autojunk=False).ratio() >= UMBRAL_PARECIDO
+
+
+def _vecinos(claves, nuevas):
+    """Pares (clave nueva, clave) a comparar: vecinas en orden alfabético y en
+    orden de la clave invertida (para errores al principio del nombre)"""
+    pares = set()
+    for orden in (sorted(claves), sorted(claves, key=lambda c: c[::-1])):
+        for i, clave in enumerate(orden):
+            if clave not in nuevas:
+                continue
+            for vecina in orden[max(0, i - VENTANA):i + VENTANA + 1]:
+                if vecina != clave:
+                    pares.add((clave, vecina))
+    return pares
+
+
+class ResolutorEmpresas:
+    """Nombre original -> (nombre canónico, miembros), con caché persistente"""
+
+    def __init__(self, ruta=RUTA_CACHE):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._nombres = {}  # original -> {'nombre': canónico, 'miembros': [...]}
+        self._grupos = {}  # clave -> nombre canónico del grupo
+        self._cargado = False
+        self._version = None
+
+    def _cargar(self):
+        if self._cargado:
+            return
+        self._cargado = True
+        self._version = version_procesado(sys.modules[__name__])
+        try:
+            with open(self.ruta, encoding='utf-8') as f:
+                datos = json.load(f)
+            if datos.get('version') == self._version:
+                self._nombres, self._grupos = datos['nombres'], datos['grupos']
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def _guardar(self):
+        datos = {'version': self._version, 'nombres': self._nombres, 'grupos': self._grupos}
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.ruta)), exist_ok=True)
+            _escribir_atomico(self.ruta, lambda destino: _volcar_json(datos, destino))
+        except OSError:
+            pass  # Sin caché en disco se resuelve igual, solo que cada vez
+
+    def _canonico(self, limpio, grupos_nuevos, pesos, filas):
+        """Clave del grupo de un nombre limpio (se crea el grupo si no existe)"""
+        clave = clave_nombre(limpio)
+        if clave not in self._grupos:
+            grupos_nuevos.add(clave)
+            self._grupos[clave] = limpio
+        pesos[self._grupos[clave]] = pesos.get(self._grupos[clave], 0) + filas
+        return clave
+
+    def _agrupar(self, nuevas, pesos):
+        """Unir cada clave nueva al grupo de una clave casi idéntica, si la hay
+
+        Los grupos que ya existían conservan su nombre (está guardado en la caché
+        de datos procesados), así que nunca se unen dos grupos existentes. Entre
+        dos grupos nuevos se queda el nombre con más filas, que rara vez es la
+        variante con erratas.
+        """
+        if not nuevas:
+            return
+        existentes = {nombre for clave, nombre in self._grupos.items() if clave not in nuevas}
+        for clave, vecina in sorted(_vecinos(list(self._grupos), nuevas)):
+            a, b = self._grupos[clave], self._grupos[vecina]
+            if a == b or (a in existentes and b in existentes) or not _parecidos(clave, vecina):
+                continue
+            if a in existentes or b in existentes:
+                destino = a if a in existentes else b
+            else:
+                destino = min(a, b, key=lambda nombre: (-pesos.get(nombre, 0), nombre))
+            origen = b if destino == a else a
+            pesos[destino] = pesos.get(destino, 0) + pesos.pop(origen, 0)
+            for c, nombre in self._grupos.items():
+                if nombre == origen:
+                    self._grupos[c] = destino
+
+    def resolver(self, nombres):
+        """Resolver los nombres que aún no estén en la caché
+
+        nombres es una colección de nombres originales o un diccionario
+        nombre -> número de filas, que decide el nombre de los grupos nuevos.
+        """
+        if not isinstance(nombres, dict):
+            nombres = dict.fromkeys(nombres, 1)
+        with self._lock:
+            self._cargar()
+            filas = {str(n): int(c) for n, c in nombres.items() if pd.notna(n)}
+            pendientes = sorted(set(filas) - set(self._nombres))
+            if not pendientes:
+                return
+            grupos_nuevos, pesos, resueltos = set(), {}, {}
+            for original in pendientes:
+                if original == SIN_EMPRESA:
+                    resueltos[original] = (None, [])
+                    continue
+                miembros = separar_ute(original)
+                claves_miembros = [self._canonico(m, grupos_nuevos, pesos, filas[original]) for m in miembros]
+                clave = None if miembros else self._canonico(limpiar_nombre(original), grupos_nuevos, pesos, filas[original])
+                resueltos[original] = (clave, claves_miembros)
+            self._agrupar(grupos_nuevos, pesos)
+            for original, (clave, claves_miembros) in resueltos.items():
+                miembros = [self._grupos[c] for c in claves_miembros]
+                if original == SIN_EMPRESA:
+                    nombre = SIN_EMPRESA
+                elif miembros:
+                    nombre = 'UTE ' + ' - '.join(sorted(set(miembros)))
+                else:
+                    nombre = self._grupos[clave]
+                self._nombres[original] = {'nombre': nombre, 'miembros': miembros}
+            self._guardar()
+
+    def nombre(self, original):
+        return self._nombres[original]['nombre']
+
+    def aplicar(self, df, origen='Empresa_Adjudicataria'):
+        """Sustituir la columna origen por el nombre canónico y añadir Empresa_Miembros
+
+        Empresa_Miembros lista los miembros de cada UTE separados por " | " (la
+        propia empresa si no es una UTE).
+        """
+        originales = df[origen].astype(object)
+        conteo = originales.value_counts()
+        unicos = conteo.index
+        self.resolver(conteo.to_dict())
+        nombres = {o: self._nombres[str(o)]['nombre'] for o in unicos}
+        miembros = {o: ' | '.join(self._nombres[str(o)]['miembros']) or nombres[o] for o in unicos}
+        return df.assign(**{
+            origen: originales.map(nombres),
+            'Empresa_Miembros': originales.map(miembros),
+        })
+
+
+RESOLUTOR = ResolutorEmpresas()
@@ -0,0 +1,131 @@
+"""Exportación por bloques de las licitaciones filtradas (CSV, Parquet, XLSX)
+
+Las filas se escriben en bloques de ``TAMANO_BLOQUE`` a un fichero temporal en
+disco, con sus valores tipados (importes y %baja como números, fechas como
+fechas), de modo que la memoria usada al generarlo no depende del tamaño del
+resultado. El fichero se devuelve abierto y rebobinado.
+
+Los bloques salen de un DataFrame (``exportar``) o de cualquier otra fuente que
+los genere por partes, como una consulta SQL (``exportar_bloques``).
+"""
+import io
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from datos_aena import PARQUET_DISPONIBLE
+
+# Filas por bloque
+TAMANO_BLOQUE = 10000
+
+# Límite de filas de una hoja de Excel (sin contar la cabecera)
+FILAS_HOJA_XLSX = 1048575
+
+# Formato -> (extensión, tipo MIME)
+FORMATOS = {
+    'CSV': ('csv', 'text/csv'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'XLSX': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+
+def formatos_disponibles():
+    """Formatos de exportación que se pueden generar en este entorno"""
+    return [f for f in FORMATOS if f != 'Parquet' or PARQUET_DISPONIBLE]
+
+
+def bloques(df, posiciones=None, tamano=TAMANO_BLOQUE):
+    """Recorrer las filas de df (en el orden de posiciones) en bloques de tamano filas"""
+    if posiciones is None:
+        posiciones = np.arange(len(df))
+    for inicio in range(0, len(posiciones), tamano):
+        yield df.iloc[posiciones[inicio:inicio + tamano]]
+
+
+def _escribir_csv(fichero, partes, vacio):
+    texto = io.TextIOWrapper(fichero, encoding='utf-8', newline='')
+    cabecera = True
+    for bloque in partes:
+        bloque.to_csv(texto, index=False, header=cabecera)
+        cabecera = False
+    if cabecera:  # Sin filas: solo la cabecera
+        vacio.to_csv(texto, index=False)
+    texto.flush()
+    texto.detach()  # El fichero binario sigue abierto
+
+
+def _escribir_parquet(fichero, partes, vacio):
+    # pyarrow.parquet solo se importa al exportar (retrasa el arranque)
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    escritor = None
+    for bloque in partes:
+        tabla = pa.Table.from_pandas(bloque, preserve_index=False)
+        if escritor is None:
+            escritor = pq.ParquetWriter(fichero, tabla.schema)
+        escritor.write_table(tabla.cast(escritor.schema))
+    if escritor is None:
+        escritor = pq.ParquetWriter(fichero, pa.Schema.from_pandas(vacio, preserve_index=False))
+    escritor.close()
+
+
+def _valores_celda(bloque):
+    """Filas del bloque como tuplas de valores que openpyxl sabe escribir"""
+    columnas = []
+    for _, serie in bloque.items():
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            serie = serie.astype(object)
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            valores = [None if pd.isna(v) else v.to_pydatetime() for v in serie]
+        else:
+            valores = serie.astype(object).where(serie.notna(), None).tolist()
+        columnas.append(valores)
+    return zip(*columnas)
+
+
+def _escribir_xlsx(fichero, partes, vacio):
+    from openpyxl import Workbook
+
+    libro = Workbook(write_only=True)
+    cabecera = list(vacio.columns)
+    hoja, filas_hoja = None, FILAS_HOJA_XLSX
+    for bloque in partes:
+        for fila in _valores_celda(bloque):
+            if filas_hoja == FILAS_HOJA_XLSX:
+                hoja = libro.create_sheet(f"Licitaciones {len(libro.worksheets) + 1}")
+                hoja.append(cabecera)
+                filas_hoja = 0
+            hoja.append(fila)
+            filas_hoja += 1
+    if hoja is None:
+        libro.create_sheet("Licitaciones 1").append(cabecera)
+    libro.save(fichero)
+
+
+_ESCRITORES = {
+    'CSV': _escribir_csv,
+    'Parquet': _escribir_parquet,
+    'XLSX': _escribir_xlsx,
+}
+
+
+def exportar_bloques(partes, formato, vacio):
+    """Escribir una secuencia de DataFrames (mismas columnas) a un fichero temporal
+
+    vacio es un DataFrame sin filas con las columnas y tipos del resultado, que
+    se usa para la cabecera cuando no hay ningún bloque. Devuelve el fichero
+    binario abierto al principio; se borra al cerrarlo.
+    """
+    if formato not in formatos_disponibles():
+        raise ValueError(f"Formato de exportación no disponible: {formato}")
+    fichero = tempfile.TemporaryFile()
+    _ESCRITORES[formato](fichero, partes, vacio)
+    fichero.seek(0)
+    return fichero
+
+
+def exportar(df, formato, posiciones=None):
+    """Exportar las filas de df; posiciones fija su orden (y subconjunto)"""
+    return exportar_bloques(bloques(df, posiciones), formato, df.iloc[:0])
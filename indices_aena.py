@@ -0,0 +1,302 @@
+"""Índices precalculados para filtrar el dataset sin recorrerlo entero
+
+Se construyen una vez por versión de datos (RegistroDatos.derivado):
+
+- Para los filtros de igualdad (aeropuerto, tipo de obra, empresa), la lista
+  ordenada de posiciones de fila de cada valor.
+- Para los filtros de rango (presupuesto, baja), las posiciones ordenadas por
+  valor, de modo que un rango se resuelve con dos búsquedas binarias.
+
+Filtrar consiste en partir del conjunto de posiciones más pequeño, comprobar
+sobre él el resto de condiciones y hacer un único ``take``.
+
+Las opciones de los desplegables salen de un diccionario de dimensiones
+(DiccionarioDimensiones): los valores ordenados de cada dimensión con su número
+de filas y las combinaciones presentes, con las que cada desplegable se reduce
+a los valores que tienen filas bajo lo elegido en los demás.
+
+El buscador de la pestaña de datos usa un índice invertido (IndiceTexto): cada
+palabra normalizada (sin tildes ni mayúsculas) apunta a las filas que la
+contienen, y el vocabulario ordenado permite buscar por prefijo.
+"""
+import bisect
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+# Filtro del sidebar -> columna de igualdad y valor que significa "sin filtro"
+FILTROS_IGUALDAD = {
+    'aeropuerto': ('Aeropuerto', 'Todos'),
+    'tipo_obra': ('Tipo_Obra', 'Todos'),
+    'empresa': ('Empresa_Adjudicataria', 'Todas'),
+}
+
+# Filtro del sidebar -> columna de rango
+FILTROS_RANGO = {
+    'presupuesto': 'Presupuesto_Base',
+    'baja': 'Porcentaje_Baja',
+}
+
+# Opciones memorizadas por diccionario de dimensiones (selecciones distintas)
+MAX_OPCIONES_MEMO = 4096
+
+# Columnas en las que busca el cuadro "Buscar Licitación"
+COLUMNAS_BUSQUEDA = [
+    'Objeto del Contrato',
+    'Aeropuerto',
+    'Adjudicatario licitación/lote',
+    'Número de expediente',
+    'Clasificación',
+]
+
+
+class IndiceFiltros:
+    """Listas de posiciones por valor y posiciones ordenadas por rango"""
+
+    def __init__(self, df):
+        self.filas = len(df)
+        self._igualdad = {}
+        for columna, _ in FILTROS_IGUALDAD.values():
+            categorias, codigos = _codificar(df[columna])
+            # argsort estable: dentro de cada valor las posiciones quedan ordenadas
+            orden = np.argsort(codigos, kind='stable')
+            limites = np.searchsorted(codigos[orden], np.arange(len(categorias) + 1))
+            self._igualdad[columna] = (
+                {valor: i for i, valor in enumerate(categorias)}, codigos, orden, limites,
+            )
+        self._rango = {}
+        for columna in FILTROS_RANGO.values():
+            valores = df[columna].to_numpy(dtype='float64', na_value=np.nan)
+            orden = np.argsort(valores, kind='stable')  # Los NaN quedan al final
+            self._rango[columna] = (valores, valores[orden], orden)
+
+    def posiciones_valor(self, columna, valor):
+        """Posiciones (ordenadas) de las filas con columna == valor"""
+        indice, _, orden, limites = self._igualdad[columna]
+        codigo = indice.get(valor)
+        if codigo is None:
+            return orden[:0]
+        return orden[limites[codigo]:limites[codigo + 1]]
+
+    def posiciones_rango(self, columna, minimo, maximo):
+        """Posiciones (sin ordenar) de las filas con minimo <= columna <= maximo"""
+        _, ordenados, orden = self._rango[columna]
+        inicio = np.searchsorted(ordenados, minimo, side='left')
+        fin = np.searchsorted(ordenados, maximo, side='right')
+        return orden[inicio:max(inicio, fin)]
+
+    def _condiciones(self, filtros):
+        """Lista de (posiciones, comprobar) de cada filtro activo"""
+        condiciones = []
+        for clave, (columna, todos) in FILTROS_IGUALDAD.items():
+            valor = filtros[clave]
+            if valor == todos:
+                continue
+            indice, codigos, _, _ = self._igualdad[columna]
+            codigo = indice.get(valor, -2)
+            condiciones.append((
+                self.posiciones_valor(columna, valor),
+                lambda pos, codigos=codigos, codigo=codigo: codigos[pos] == codigo,
+            ))
+        for clave, columna in FILTROS_RANGO.items():
+            minimo, maximo = filtros[f'{clave}_min'], filtros[f'{clave}_max']
+            valores = self._rango[columna][0]
+            condiciones.append((
+                self.posiciones_rango(columna, minimo, maximo),
+                lambda pos, valores=valores, minimo=minimo, maximo=maximo: (valores[pos] >= minimo) & (valores[pos] <= maximo),
+            ))
+        return condiciones
+
+    def posiciones(self, filtros):
+        """Posiciones ordenadas de las filas que cumplen todos los filtros"""
+        condiciones = sorted(self._condiciones(filtros), key=lambda c: len(c[0]))
+        if not condiciones:
+            return np.arange(self.filas)
+        candidatas = condiciones[0][0]
+        for _, comprobar in condiciones[1:]:
+            if len(candidatas) == 0:
+                break
+            candidatas = candidatas[comprobar(candidatas)]
+        return np.sort(candidatas)
+
+    def filtrar(self, df, filtros):
+        """Aplicar los filtros con un único take (df debe ser el DataFrame indexado)"""
+        posiciones = self.posiciones(filtros)
+        if len(posiciones) == self.filas:
+            return df
+        return df.take(posiciones)
+
+
+class DiccionarioDimensiones:
+    """Valores de las dimensiones de los filtros, su número de filas y sus combinaciones
+
+    Se construye una vez por versión de datos a partir de las combinaciones
+    (aeropuerto, tipo de obra, empresa) presentes y su número de filas, que son
+    muchas menos que las filas del dataset. Las opciones de una dimensión bajo
+    una selección de las demás se calculan sobre ellas y se memorizan.
+    """
+
+    def __init__(self, combinaciones, maximos):
+        self.columnas = [col for col, _ in FILTROS_IGUALDAD.values()]
+        self.combinaciones = combinaciones  # Una columna por dimensión y 'n'
+        self.maximos = maximos  # Columna de rango -> valor máximo
+        self._n = combinaciones['n'].to_numpy(dtype='int64')
+        self.valores = {}  # Columna -> valores ordenados
+        self.conteos = {}  # Columna -> {valor: filas}
+        self._codigos = {}  # Columna -> posición en valores de cada combinación (-1 vacíos)
+        self._posicion = {}
+        for col in self.columnas:
+            valores = sorted(pd.unique(combinaciones[col].dropna()).tolist())
+            codigos = pd.Categorical(combinaciones[col], categories=valores).codes.astype('int64')
+            self.valores[col] = valores
+            self._codigos[col] = codigos
+            self._posicion[col] = {valor: i for i, valor in enumerate(valores)}
+        self._memo = {}
+        for col in self.columnas:
+            self.conteos[col] = self.opciones(col, {})
+
+    @classmethod
+    def desde_df(cls, df):
+        """Diccionario de un DataFrame procesado"""
+        columnas = [col for col, _ in FILTROS_IGUALDAD.values()]
+        combinaciones = df.groupby(columnas, observed=True, dropna=False).size().rename('n').reset_index()
+        maximos = {col: float(df[col].max()) if df[col].notna().any() else 0.0 for col in FILTROS_RANGO.values()}
+        return cls(combinaciones, maximos)
+
+    def actualizar(self, delta):
+        """Diccionario con un delta aplicado (datos_aena.Delta), sin recorrer el dataset
+
+        Los máximos solo pueden crecer: si se borra la fila del máximo, el valor
+        sigue siendo una cota superior válida para el filtro.
+        """
+        partes = [self.combinaciones]
+        for filas, signo in ((delta.insertados, 1), (delta.eliminados, -1)):
+            if len(filas):
+                conteo = filas.groupby(self.columnas, observed=True, dropna=False).size()
+                partes.append((conteo * signo).rename('n').reset_index())
+        combinaciones = pd.concat(partes, ignore_index=True)
+        for col in self.columnas:
+            combinaciones[col] = combinaciones[col].astype(object)
+        combinaciones = combinaciones.groupby(self.columnas, dropna=False)['n'].sum().reset_index()
+        maximos = dict(self.maximos)
+        if len(delta.insertados):
+            for col in maximos:
+                nuevo = delta.insertados[col].max()
+                if pd.notna(nuevo):
+                    maximos[col] = max(maximos[col], float(nuevo))
+        return DiccionarioDimensiones(combinaciones[combinaciones['n'] > 0], maximos)
+
+    def opciones(self, columna, seleccion):
+        """{valor: filas} de columna bajo la selección de las demás dimensiones
+
+        seleccion es un diccionario columna -> valor (None o ausente: todas). Solo
+        aparecen los valores con alguna fila, en orden alfabético.
+        """
+        otras = tuple(
+            (col, seleccion[col]) for col in self.columnas
+            if col != columna and seleccion.get(col) is not None
+        )
+        clave = (columna, otras)
+        opciones = self._memo.get(clave)
+        if opciones is None:
+            mascara = np.ones(len(self._n), dtype=bool)
+            for col, valor in otras:
+                mascara &= self._codigos[col] == self._posicion[col].get(valor, -2)
+            codigos = self._codigos[columna][mascara]
+            validos = codigos >= 0
+            conteo = np.bincount(codigos[validos], weights=self._n[mascara][validos], minlength=len(self.valores[columna]))
+            opciones = {self.valores[columna][i]: int(conteo[i]) for i in np.flatnonzero(conteo)}
+            if len(self._memo) >= MAX_OPCIONES_MEMO:
+                self._memo.clear()
+            self._memo[clave] = opciones
+        return opciones
+
+
+def _codificar(serie):
+    """Categorías y códigos de una columna (-1 para vacíos)"""
+    if hasattr(serie, 'cat'):
+        return list(serie.cat.categories), serie.cat.codes.to_numpy()
+    codigos, categorias = serie.factorize()
+    return list(categorias), codigos
+
+
+def normalizar_texto(texto):
+    """Texto en minúsculas y sin tildes (la ñ se busca como n)"""
+    texto = unicodedata.normalize('NFKD', str(texto).lower())
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+
+def tokenizar(texto):
+    """Palabras normalizadas de un texto"""
+    return re.findall(r'[0-9a-z]+', normalizar_texto(texto))
+
+
+class IndiceTexto:
+    """Índice invertido palabra -> etiquetas de fila, con búsqueda por prefijo
+
+    Las listas de filas de todas las palabras se guardan en un único array,
+    agrupadas por palabra en orden alfabético. Así, las palabras que empiezan
+    por un prefijo ocupan un tramo contiguo del vocabulario y de ese array.
+    """
+
+    def __init__(self, df, columnas=COLUMNAS_BUSQUEDA):
+        filas_por_token = []
+        for columna in columnas:
+            if columna not in df.columns:
+                continue
+            # Se tokeniza cada valor distinto una sola vez
+            codigos, valores = pd.factorize(df[columna])
+            tokens = pd.Series([tokenizar(v) for v in valores], dtype=object).explode().dropna()
+            if tokens.empty:
+                continue
+            pares = pd.DataFrame({'codigo': tokens.index.to_numpy(), 'token': tokens.to_numpy()})
+            filas = pd.DataFrame({'codigo': codigos, 'fila': df.index.to_numpy()})
+            filas_por_token.append(filas.merge(pares, on='codigo')[['token', 'fila']])
+
+        if filas_por_token:
+            pares = pd.concat(filas_por_token, ignore_index=True).drop_duplicates()
+        else:
+            pares = pd.DataFrame({'token': pd.Series(dtype=object), 'fila': pd.Series(dtype='int64')})
+        pares = pares.sort_values(['token', 'fila'], kind='stable')
+        self.vocabulario, inicio = np.unique(pares['token'].to_numpy(dtype=object), return_index=True)
+        self.vocabulario = self.vocabulario.tolist()
+        self.filas = pares['fila'].to_numpy(dtype='int64')
+        self.limites = np.append(inicio, len(self.filas))
+
+    def filas_prefijo(self, prefijo):
+        """Filas (ordenadas, sin repetir) con alguna palabra que empieza por prefijo"""
+        desde = bisect.bisect_left(self.vocabulario, prefijo)
+        hasta = bisect.bisect_left(self.vocabulario, prefijo + '\uffff')
+        if desde == hasta:
+            return self.filas[:0]
+        tramo = self.filas[self.limites[desde]:self.limites[hasta]]
+        return tramo if hasta - desde == 1 else np.unique(tramo)
+
+    def buscar(self, consulta):
+        """Filas que contienen todas las palabras de la consulta (como prefijos)
+
+        Devuelve None si la consulta no tiene ninguna palabra.
+        """
+        terminos = sorted(set(tokenizar(consulta)), key=len, reverse=True)
+        if not terminos:
+            return None
+        resultado = None
+        for termino in terminos:
+            filas = self.filas_prefijo(termino)
+            resultado = filas if resultado is None else np.intersect1d(resultado, filas, assume_unique=True)
+            if len(resultado) == 0:
+                break
+        return resultado
+
+
+def posiciones_de(etiquetas, filas):
+    """Posiciones en ``etiquetas`` de las ``filas`` que aparecen en ella
+
+    Ambas deben estar ordenadas; se resuelve con una búsqueda binaria por fila.
+    """
+    posiciones = np.searchsorted(etiquetas, filas)
+    dentro = posiciones < len(etiquetas)
+    posiciones = posiciones[dentro]
+    return posiciones[etiquetas[posiciones] == filas[dentro]]
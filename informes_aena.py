@@ -0,0 +1,295 @@
+"""Informes estáticos por combinación de filtros, sin servidor de Streamlit
+
+Carga el dataset una vez, aplica ``aplicar_filtros`` para cada combinación de
+filtros (por defecto, una por aeropuerto más el total) y escribe para cada una
+las métricas principales, todas las figuras ``crear_grafico_*`` del dashboard y
+la tabla de empresas líderes:
+
+- ``html``: una página por informe (y un índice con todos) que usa una única
+  copia local de plotly.js;
+- ``json``: métricas, tabla y figuras en JSON de Plotly;
+- ``png`` / ``pdf``: una imagen por figura (requieren el paquete ``kaleido``).
+
+Los informes son independientes y se reparten en un pool de procesos; con
+``fork`` los procesos heredan el dataset ya cargado.
+
+Uso:
+
+    python informes_aena.py [--salida informes] [--aeropuertos MAD BCN ...]
+                            [--combinaciones filtros.json] [--formatos html json]
+                            [--procesos N]
+
+``filtros.json`` es una lista de diccionarios con los filtros del sidebar que
+cambian respecto a "sin filtro", p. ej. ``[{"aeropuerto": "MAD", "tipo_obra":
+"Obra Civil"}]``.
+"""
+import argparse
+import hashlib
+import html
+import importlib.util
+import json
+import os
+import re
+import sys
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Secciones del informe: las pestañas del dashboard y sus figuras, en orden
+# (nombre del gráfico, o (nombre, dimensión) en los que agrupan por una dimensión)
+SECCIONES = [
+    ("📅 Análisis Temporal", [
+        'crear_grafico_licitaciones_tiempo', 'crear_grafico_presupuesto_tiempo', 'crear_grafico_licitaciones_mes',
+    ]),
+    ("🏢 Análisis por Aeropuerto", [
+        'crear_grafico_aeropuerto_licitaciones', 'crear_grafico_aeropuerto_baja', 'crear_grafico_aeropuerto_presupuesto',
+        'crear_grafico_aeropuerto_adjudicacion', 'crear_grafico_aeropuerto_tipo_obra',
+    ]),
+    ("🔧 Análisis por Tipo de Obra", [
+        'crear_grafico_tipo_obra_licitaciones', 'crear_grafico_tipo_obra_presupuesto', 'crear_grafico_tipo_obra_importe',
+        'crear_grafico_tipo_obra_baja', 'crear_grafico_tipo_obra_tiempo', 'crear_grafico_tipo_obra_aeropuertos',
+    ]),
+    ("🏭 Análisis por Empresa", [
+        'crear_grafico_empresa_licitaciones', 'crear_grafico_empresa_presupuesto', 'crear_grafico_empresa_importe',
+        'crear_grafico_empresa_baja',
+    ]),
+    ("📉 Análisis por Baja", [
+        'crear_grafico_baja_aeropuertos', 'crear_grafico_baja_rangos_importe', 'crear_grafico_baja_distribucion',
+        ('crear_grafico_baja_percentiles', 'Aeropuerto'), ('crear_grafico_baja_percentiles', 'Tipo_Obra'),
+        ('crear_grafico_baja_percentiles', 'Empresa_Adjudicataria'), ('crear_grafico_baja_percentiles', 'Rango_Importe'),
+        ('crear_grafico_baja_histograma', 'Aeropuerto'), ('crear_grafico_baja_histograma', 'Tipo_Obra'),
+        ('crear_grafico_baja_histograma', 'Empresa_Adjudicataria'), ('crear_grafico_baja_histograma', 'Rango_Importe'),
+    ]),
+]
+
+FORMATOS_IMAGEN = ['png', 'pdf']
+
+
+def formatos_disponibles():
+    """Formatos que se pueden generar en este entorno (imágenes solo con kaleido)"""
+    formatos = ['html', 'json']
+    if importlib.util.find_spec('kaleido') is not None:
+        formatos += FORMATOS_IMAGEN
+    return formatos
+
+
+def clave_figura(grafico):
+    """Nombre de una figura de SECCIONES en el JSON y los ficheros de imagen"""
+    return grafico if isinstance(grafico, str) else '_'.join(grafico)
+
+
+def filtros_base(df):
+    """Filtros del sidebar con sus valores por defecto (sin filtrar nada)"""
+    return {
+        'aeropuerto': 'Todos',
+        'tipo_obra': 'Todos',
+        'empresa': 'Todas',
+        'presupuesto_min': 0.0,
+        'presupuesto_max': float(df['Presupuesto_Base'].max()),
+        'baja_min': 0.0,
+        'baja_max': 100.0,
+    }
+
+
+def _ascii(texto):
+    """Texto sin tildes, con guiones en lugar de espacios y símbolos"""
+    texto = unicodedata.normalize('NFKD', str(texto))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return re.sub(r'[^0-9A-Za-z]+', '-', texto).strip('-')
+
+
+def nombre_informe(cambios):
+    """Nombre de directorio a partir de los filtros aplicados ("todos" sin filtros)
+
+    Cada filtro aparece como clave-valor y al final va un hash corto de todos,
+    para que dos combinaciones distintas nunca escriban en el mismo directorio.
+    """
+    if not cambios:
+        return 'todos'
+    partes = [f"{_ascii(clave)}-{_ascii(valor)}" for clave, valor in sorted(cambios.items())]
+    resumen = hashlib.sha1(json.dumps(cambios, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()[:8]
+    return '_'.join(partes + [resumen])
+
+
+def _formato_metricas(metricas):
+    """Métricas con el mismo formato que las tarjetas del dashboard"""
+    return {
+        "Total Licitaciones": f"{metricas['total_licitaciones']:,}",
+        "Presupuesto Total": f"{metricas['presupuesto_total'] / 1e6:.1f} M€",
+        "Importe Adjudicado": f"{metricas['importe_total'] / 1e6:.1f} M€",
+        "Ahorro Total": f"{metricas['ahorro_total'] / 1e6:.1f} M€",
+        "% Baja Media": f"{metricas['baja_media']:.1f}%",
+        "% Baja Ponderada": f"{metricas['baja_ponderada']:.1f}%",
+    }
+
+
+def _pagina_html(titulo, metricas, secciones, empresas):
+    tarjetas = ''.join(
+        f'<div class="metrica"><span>{html.escape(etiqueta)}</span><b>{html.escape(valor)}</b></div>'
+        for etiqueta, valor in _formato_metricas(metricas).items()
+    )
+    cuerpo = ''.join(
+        f'<h2>{html.escape(seccion)}</h2>' + ''.join(f'<div class="figura">{figura}</div>' for figura in figuras)
+        for seccion, figuras in secciones
+    )
+    return f"""<!DOCTYPE html>
+<html lang="es"><head><meta charset="utf-8"><title>{html.escape(titulo)}</title>
+<script src="../plotly.min.js"></script>
+<style>
+body {{ font-family: sans-serif; margin: 2rem; color: #1f4e79; }}
+.metricas {{ display: flex; gap: 1rem; flex-wrap: wrap; }}
+.metrica {{ background: #f8f9fa; border-left: 4px solid #1f4e79; padding: .8rem 1rem; border-radius: 8px; }}
+.metrica span {{ display: block; font-size: .8rem; color: #555; }}
+table {{ border-collapse: collapse; font-size: .85rem; }}
+td, th {{ border: 1px solid #ddd; padding: .3rem .6rem; }}
+</style></head><body>
+<h1>✈️ {html.escape(titulo)}</h1>
+<div class="metricas">{tarjetas}</div>
+{cuerpo}
+<h2>🏢 Empresa Líder por Aeropuerto</h2>
+{empresas.to_html(index=False, float_format=lambda v: f'{v:.1f}', na_rep='')}
+</body></html>
+"""
+
+
+# Dataset e índice de filtros de cada proceso del pool
+_df = None
+_indice = None
+
+
+def _inicializar(df, indice):
+    import datos_aena
+    global _df, _indice
+    datos_aena.activar_copy_on_write()
+    _df, _indice = df, indice
+
+
+def generar_informe(cambios, salida, formatos):
+    """Escribir el informe de una combinación de filtros. Devuelve (nombre, filas, segundos)"""
+    import agregados_aena
+    import dashboard_aena
+
+    inicio = time.perf_counter()
+    filtros = {**filtros_base(_df), **cambios}
+    df_filtrado = dashboard_aena.aplicar_filtros(_df, filtros, _indice)
+    cubo = agregados_aena.construir_cubo(df_filtrado)
+    metricas = agregados_aena.calcular_metricas(cubo)
+    empresas = dashboard_aena.tabla_empresas_por_aeropuerto(cubo)
+
+    nombre = nombre_informe(cambios)
+    directorio = os.path.join(salida, nombre)
+    os.makedirs(directorio, exist_ok=True)
+
+    figuras = {}
+    for _, graficos in SECCIONES:
+        for grafico in graficos:
+            funcion, *argumentos = (grafico,) if isinstance(grafico, str) else grafico
+            figuras[clave_figura(grafico)] = getattr(dashboard_aena, funcion)(cubo, *argumentos)
+
+    if 'html' in formatos:
+        secciones = [
+            (seccion, [figuras[clave_figura(g)].to_html(full_html=False, include_plotlyjs=False) for g in graficos])
+            for seccion, graficos in SECCIONES
+        ]
+        titulo = "Licitaciones AENA · " + (", ".join(f"{k}: {v}" for k, v in sorted(cambios.items())) or "todas")
+        with open(os.path.join(directorio, 'index.html'), 'w', encoding='utf-8') as f:
+            f.write(_pagina_html(titulo, metricas, secciones, empresas))
+    if 'json' in formatos:
+        datos = {
+            'filtros': filtros,
+            'metricas': metricas,
+            'empresas_por_aeropuerto': json.loads(empresas.to_json(orient='records', force_ascii=False)),
+            'figuras': {g: json.loads(figura.to_json()) for g, figura in figuras.items()},
+        }
+        with open(os.path.join(directorio, 'informe.json'), 'w', encoding='utf-8') as f:
+            json.dump(datos, f, ensure_ascii=False)
+    for formato in FORMATOS_IMAGEN:
+        if formato in formatos:
+            for grafico, figura in figuras.items():
+                figura.write_image(os.path.join(directorio, f'{grafico}.{formato}'))
+    return nombre, len(df_filtrado), time.perf_counter() - inicio
+
+
+def combinaciones_por_aeropuerto(df, aeropuertos=None):
+    """El total y una combinación por aeropuerto (todos, o los indicados)"""
+    if aeropuertos is None:
+        aeropuertos = df['Aeropuerto'].value_counts().index.tolist()
+    return [{}] + [{'aeropuerto': aeropuerto} for aeropuerto in aeropuertos]
+
+
+def _escribir_indice(salida, resultados):
+    enlaces = ''.join(
+        f'<li><a href="{html.escape(nombre)}/index.html">{html.escape(nombre)}</a> ({filas} licitaciones)</li>'
+        for nombre, filas, _ in sorted(resultados)
+    )
+    with open(os.path.join(salida, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write(f'<!DOCTYPE html><html lang="es"><head><meta charset="utf-8"><title>Informes AENA</title></head>'
+                f'<body><h1>✈️ Informes de licitaciones AENA</h1><ul>{enlaces}</ul></body></html>\n')
+
+
+def generar_informes(df, combinaciones, salida, formatos=('html', 'json'), procesos=None):
+    """Generar todos los informes en un pool de procesos. Devuelve [(nombre, filas, segundos)]"""
+    import datos_aena
+    import indices_aena
+    from plotly.offline import get_plotlyjs
+
+    no_disponibles = set(formatos) - set(formatos_disponibles())
+    if no_disponibles:
+        raise ValueError(f"Formatos no disponibles: {', '.join(sorted(no_disponibles))} (las imágenes requieren kaleido)")
+    os.makedirs(salida, exist_ok=True)
+    if 'html' in formatos:
+        with open(os.path.join(salida, 'plotly.min.js'), 'w', encoding='utf-8') as f:
+            f.write(get_plotlyjs())
+
+    indice = indices_aena.IndiceFiltros(df)
+    procesos = min(len(combinaciones), procesos or os.cpu_count() or 1)
+    if procesos <= 1:
+        _inicializar(df, indice)
+        resultados = [generar_informe(cambios, salida, formatos) for cambios in combinaciones]
+    else:
+        with ProcessPoolExecutor(max_workers=procesos, mp_context=datos_aena._contexto_pool(),
+                                 initializer=_inicializar, initargs=(df, indice)) as pool:
+            futuros = [pool.submit(generar_informe, cambios, salida, formatos) for cambios in combinaciones]
+            resultados = [futuro.result() for futuro in as_completed(futuros)]
+    if 'html' in formatos:
+        _escribir_indice(salida, resultados)
+    return resultados
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--salida', default='informes', help="directorio de salida")
+    parser.add_argument('--aeropuertos', nargs='+', help="aeropuertos (por defecto, todos)")
+    parser.add_argument('--combinaciones', metavar='JSON', help="lista de combinaciones de filtros")
+    parser.add_argument('--formatos', nargs='+', default=['html', 'json'], choices=['html', 'json'] + FORMATOS_IMAGEN)
+    parser.add_argument('--procesos', type=int, help="procesos del pool (por defecto, uno por CPU)")
+    opciones = parser.parse_args(argumentos)
+    no_disponibles = set(opciones.formatos) - set(formatos_disponibles())
+    if no_disponibles:
+        parser.error(f"formatos no disponibles: {', '.join(sorted(no_disponibles))} (las imágenes requieren kaleido)")
+
+    import datos_aena
+    from dashboard_aena import cargar_datos
+
+    datos_aena.activar_copy_on_write()
+    inicio = time.perf_counter()
+    df = cargar_datos()
+    if df is None:
+        print("No se pudieron cargar los datos", file=sys.stderr)
+        return 1
+    if opciones.combinaciones:
+        with open(opciones.combinaciones, encoding='utf-8') as f:
+            combinaciones = json.load(f)
+    else:
+        combinaciones = combinaciones_por_aeropuerto(df, opciones.aeropuertos)
+    print(f"Datos cargados: {len(df)} licitaciones en {time.perf_counter() - inicio:.1f} s")
+
+    resultados = generar_informes(df, combinaciones, opciones.salida, opciones.formatos, opciones.procesos)
+    for nombre, filas, segundos in sorted(resultados):
+        print(f"{nombre:<30} {filas:>8} licitaciones {segundos:>7.2f} s")
+    print(f"{len(resultados)} informes en {opciones.salida} ({time.perf_counter() - inicio:.1f} s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""Instrumentación de los caminos calientes del dashboard (opcional)
+
+Con ``AENA_DEBUG=1`` cada rerun se mide por tramos anidados (carga, procesado,
+filtros, agregado, construcción, serialización y render de cada figura...):
+tiempo de reloj y pico de memoria reservada (tracemalloc). Al terminar el
+rerun los tramos se muestran en un panel plegable del sidebar y se emiten como
+logs estructurados (una línea JSON por tramo) en el logger ``aena.perfil``, con
+el identificador de la sesión y del rerun.
+
+El pico de tracemalloc es del proceso entero, así que los reruns medidos se
+ejecutan de uno en uno; aun así incluye lo que reserven a la vez otros hilos
+(vigilante, API).
+
+Sin la variable de entorno, ``tramo`` no mide nada y el coste es despreciable.
+Medir la memoria ralentiza el proceso entero mientras está activo (y serializa
+los reruns), así que solo debe activarse para depurar.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+
+ACTIVO = os.environ.get('AENA_DEBUG', '').lower() in ('1', 'true', 'si', 'sí')
+
+LOGGER = logging.getLogger('aena.perfil')
+
+# Perfil del rerun en curso (Streamlit ejecuta cada rerun en su propio hilo)
+_local = threading.local()
+
+# Un solo rerun medido a la vez: tracemalloc tiene un único pico por proceso
+_medicion = threading.Lock()
+
+
+class Tramo:
+    """Un tramo medido: nombre, profundidad, tiempo y memoria"""
+
+    def __init__(self, nombre, nivel):
+        self.nombre = nombre
+        self.nivel = nivel
+        self.segundos = 0.0
+        self.memoria_inicio = 0
+        self.pico = 0  # Bytes reservados en el pico, sobre el inicio del tramo
+
+    def como_dict(self):
+        return {'tramo': self.nombre, 'nivel': self.nivel, 'ms': round(self.segundos * 1000, 3), 'pico_mb': round(self.pico / 1024 ** 2, 3)}
+
+
+class Perfil:
+    """Tramos de un rerun, en orden de inicio"""
+
+    def __init__(self, id_sesion, id_rerun):
+        self.id_sesion = id_sesion
+        self.id_rerun = id_rerun
+        self.tramos = []
+        self.abiertos = []
+        self.segundos = 0.0
+
+
+def _memoria():
+    return tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+
+
+@contextmanager
+def tramo(nombre):
+    """Medir el bloque como un tramo del rerun en curso (también como decorador)"""
+    perfil = getattr(_local, 'perfil', None) if ACTIVO else None
+    if perfil is None:
+        yield
+        return
+    padre = perfil.abiertos[-1] if perfil.abiertos else None
+    actual, pico = _memoria()
+    if padre is not None:
+        # El pico se reinicia para el tramo hijo: antes se acumula en el padre
+        padre.pico = max(padre.pico, pico - padre.memoria_inicio)
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+    registro = Tramo(nombre, len(perfil.abiertos))
+    registro.memoria_inicio = actual
+    perfil.tramos.append(registro)
+    perfil.abiertos.append(registro)
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registro.segundos = time.perf_counter() - inicio
+        _, pico = _memoria()
+        registro.pico = max(registro.pico, pico - registro.memoria_inicio)
+        perfil.abiertos.pop()
+        if padre is not None:
+            padre.pico = max(padre.pico, registro.pico + registro.memoria_inicio - padre.memoria_inicio)
+
+
+def _identificadores():
+    """(sesión, rerun): la sesión se guarda en session_state y el rerun es un contador"""
+    import streamlit as st
+
+    try:
+        estado = st.session_state
+        id_sesion = estado.setdefault('id_sesion', uuid.uuid4().hex[:8])
+        estado['num_rerun'] = estado.get('num_rerun', 0) + 1
+        return id_sesion, f"{id_sesion}-{estado['num_rerun']}"
+    except Exception:
+        # Fuera de una sesión de Streamlit (scripts, pruebas)
+        return '-', uuid.uuid4().hex[:8]
+
+
+def _configurar_log():
+    if not LOGGER.handlers:
+        manejador = logging.StreamHandler()
+        manejador.setFormatter(logging.Formatter('%(message)s'))
+        LOGGER.addHandler(manejador)
+        LOGGER.setLevel(logging.INFO)
+        LOGGER.propagate = False
+
+
+def emitir(perfil):
+    """Una línea JSON por tramo y otra con el total del rerun"""
+    base = {'sesion': perfil.id_sesion, 'rerun': perfil.id_rerun}
+    for registro in perfil.tramos:
+        LOGGER.info(json.dumps({**base, **registro.como_dict()}, ensure_ascii=False))
+    LOGGER.info(json.dumps({**base, 'tramo': 'total', 'ms': round(perfil.segundos * 1000, 3), 'tramos': len(perfil.tramos)}))
+
+
+def mostrar_panel(perfil):
+    """Panel plegable del sidebar con los tramos del rerun"""
+    import pandas as pd
+    import streamlit as st
+
+    with st.sidebar.expander("🛠️ Rendimiento del rerun", expanded=False):
+        st.caption(f"Sesión {perfil.id_sesion} · rerun {perfil.id_rerun} · {perfil.segundos * 1000:.0f} ms. "
+                   "El pico de memoria es el de todo el proceso durante el tramo (incluye otros hilos).")
+        if not perfil.tramos:
+            return
+        tabla = pd.DataFrame([registro.como_dict() for registro in perfil.tramos])
+        tabla['tramo'] = ['· ' * nivel + nombre for nivel, nombre in zip(tabla['nivel'], tabla['tramo'])]
+        tabla['% rerun'] = tabla['ms'] / max(perfil.segundos * 1000, 1e-9) * 100
+        st.dataframe(
+            tabla.drop(columns='nivel'),
+            hide_index=True,
+            column_config={
+                'ms': st.column_config.NumberColumn('ms', format='%.1f'),
+                'pico_mb': st.column_config.NumberColumn('Pico MB', format='%.2f'),
+                '% rerun': st.column_config.ProgressColumn('% rerun', format='%.0f%%', min_value=0, max_value=100),
+            },
+        )
+
+
+@contextmanager
+def rerun():
+    """Perfilar un rerun completo: emitir los logs y mostrar el panel al terminar"""
+    if not ACTIVO:
+        yield None
+        return
+    _configurar_log()
+    with _medicion:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        perfil = _local.perfil = Perfil(*_identificadores())
+        inicio = time.perf_counter()
+        try:
+            yield perfil
+        finally:
+            perfil.segundos = time.perf_counter() - inicio
+            _local.perfil = None
+            emitir(perfil)
+    # Solo si el rerun termina con normalidad (no con st.stop o st.rerun)
+    mostrar_panel(perfil)
@@ -0,0 +1,316 @@
+"""Backend SQL embebido (SQLite) como alternativa al DataFrame en memoria
+
+Con ``AENA_BACKEND=sqlite`` el dashboard vuelca las licitaciones procesadas a
+un archivo SQLite (tabla ``licitaciones`` con índices por dimensión y rango, y
+una tabla FTS5 para el buscador) y resuelve en la base de datos los filtros
+del sidebar, el cubo de agregados de los gráficos (con los bocetos de la
+baja), la búsqueda, la ordenación y la paginación de la tabla de datos y la
+exportación por bloques. A Python
+solo vuelven los resultados pequeños: las celdas del cubo, las opciones de los
+filtros y la página visible.
+
+El archivo se reconstruye (en un temporal que se renombra al terminar) cuando
+cambia la versión de los datos; mientras no cambie, el dataset no se carga en
+memoria. El backend por defecto sigue siendo pandas.
+"""
+import os
+import sqlite3
+import threading
+from contextlib import closing
+
+import pandas as pd
+
+import agregados_aena
+import bocetos_aena
+import exportar_aena
+import indices_aena
+from datos_aena import DIRECTORIO_CACHE, _escribir_atomico
+
+# Backend de consultas: 'pandas' (por defecto) o 'sqlite'
+BACKEND = os.environ.get('AENA_BACKEND', 'pandas').lower()
+ACTIVO = BACKEND == 'sqlite'
+
+# Archivo de la base de datos
+RUTA_BD = os.environ.get('AENA_SQL_PATH', os.path.join(DIRECTORIO_CACHE, 'licitaciones.sqlite'))
+
+TABLA = 'licitaciones'
+TABLA_BUSQUEDA = 'busqueda'
+
+# Columnas con índice (filtros de igualdad y de rango del sidebar)
+COLUMNAS_INDICE = [col for col, _ in indices_aena.FILTROS_IGUALDAD.values()] + list(indices_aena.FILTROS_RANGO.values())
+
+# Columnas internas que no se vuelcan
+COLUMNAS_EXCLUIDAS = ['_clave']
+
+# Tipos del año y el mes en el cubo, como en agregados_aena.construir_cubo
+# (float64 si hay vacíos)
+TIPOS_FECHA_CUBO = {'Año': 'int32', 'Mes': 'int8'}
+
+_lock = threading.Lock()
+_almacen = None  # Último almacén abierto, compartido por las sesiones
+
+
+def _q(nombre):
+    """Identificador SQL entre comillas (hay columnas con espacios y símbolos)"""
+    return '"' + nombre.replace('"', '""') + '"'
+
+
+def _fts5_disponible():
+    try:
+        sqlite3.connect(':memory:').execute("CREATE VIRTUAL TABLE t USING fts5(a)")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def ingerir(df, ruta, version):
+    """Volcar df a un archivo SQLite nuevo y sustituir el anterior de forma atómica"""
+    columnas = [col for col in df.columns if col not in COLUMNAS_EXCLUIDAS]
+    tabla = df[columnas].assign(**{
+        'Año': df['Fecha_Publicacion'].dt.year.astype('Int64'),
+        'Rango_Importe': agregados_aena.rango_importe(df['Importe_Adjudicado']).astype(object),
+    })
+    tabla = tabla.astype({col: object for col in tabla.columns if isinstance(tabla[col].dtype, pd.CategoricalDtype)})
+    tabla.index = tabla.index.rename('fila')
+
+    def escribir(temporal):
+        with closing(sqlite3.connect(temporal)) as con:
+            tabla.to_sql(TABLA, con, index=True, chunksize=10000)
+            con.execute(f"CREATE UNIQUE INDEX ix_fila ON {TABLA}(fila)")
+            for col in COLUMNAS_INDICE:
+                con.execute(f"CREATE INDEX {_q('ix_' + col)} ON {TABLA}({_q(col)})")
+            columnas_busqueda = [col for col in indices_aena.COLUMNAS_BUSQUEDA if col in tabla.columns]
+            if columnas_busqueda and _fts5_disponible():
+                con.execute(
+                    f"CREATE VIRTUAL TABLE {TABLA_BUSQUEDA} USING fts5("
+                    f"{', '.join(_q(c) for c in columnas_busqueda)}, tokenize='unicode61 remove_diacritics 2')"
+                )
+                con.execute(
+                    f"INSERT INTO {TABLA_BUSQUEDA}(rowid, {', '.join(_q(c) for c in columnas_busqueda)}) "
+                    f"SELECT fila, {', '.join(_q(c) for c in columnas_busqueda)} FROM {TABLA}"
+                )
+            con.execute("CREATE TABLE meta (clave TEXT PRIMARY KEY, valor TEXT)")
+            con.execute("INSERT INTO meta VALUES ('version', ?)", (version,))
+            con.commit()
+
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    _escribir_atomico(ruta, escribir)
+
+
+def version_bd(ruta):
+    """Versión de datos guardada en el archivo, o None si no existe o no es válido"""
+    if not os.path.exists(ruta):
+        return None
+    try:
+        with closing(sqlite3.connect(f"file:{ruta}?mode=ro", uri=True)) as con:
+            fila = con.execute("SELECT valor FROM meta WHERE clave = 'version'").fetchone()
+        return fila[0] if fila else None
+    except sqlite3.Error:
+        return None
+
+
+def obtener_almacen(version, cargar, ruta=RUTA_BD):
+    """Almacén SQL de la versión indicada; si el archivo es de otra, se recarga
+
+    cargar() devuelve el DataFrame procesado; solo se llama si hay que volcarlo.
+    """
+    global _almacen
+    with _lock:
+        if version_bd(ruta) != version:
+            ingerir(cargar(), ruta, version)
+        if _almacen is None or _almacen.ruta != ruta or _almacen.version != version:
+            _almacen = AlmacenSQL(ruta, version)
+        return _almacen
+
+
+def almacen_actual():
+    """Último almacén abierto (o None), sin comprobar su versión"""
+    return _almacen
+
+
+def invalidar(ruta=RUTA_BD):
+    """Borrar el archivo: la siguiente petición vuelve a volcar los datos"""
+    global _almacen
+    with _lock:
+        _almacen = None
+        if os.path.exists(ruta):
+            os.remove(ruta)
+
+
+class AlmacenSQL:
+    """Consultas sobre el archivo SQLite de una versión de datos"""
+
+    def __init__(self, ruta, version):
+        self.ruta = ruta
+        self.version = version
+        with self._conectar() as con:
+            # Tipo declarado de cada columna, para restaurar los tipos de pandas
+            self.tipos = {fila[1]: fila[2] for fila in con.execute(f"PRAGMA table_info({TABLA})") if fila[1] != 'fila'}
+            self.columnas = list(self.tipos)
+            self.busqueda_fts = con.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = ?", (TABLA_BUSQUEDA,)
+            ).fetchone() is not None
+            self.total = con.execute(f"SELECT COUNT(*) FROM {TABLA}").fetchone()[0]
+        self._dimensiones = None
+
+    def _conectar(self):
+        # Una conexión de solo lectura por consulta: las sesiones usan hilos distintos
+        return closing(sqlite3.connect(f"file:{self.ruta}?mode=ro", uri=True))
+
+    def _leer(self, sql, parametros=()):
+        with self._conectar() as con:
+            return pd.read_sql_query(sql, con, params=parametros)
+
+    def _donde(self, filtros, busqueda=None):
+        """Cláusula WHERE y parámetros de los filtros del sidebar y la búsqueda"""
+        condiciones, parametros = [], []
+        for clave, (columna, todos) in indices_aena.FILTROS_IGUALDAD.items():
+            if filtros[clave] != todos:
+                condiciones.append(f"{_q(columna)} = ?")
+                parametros.append(filtros[clave])
+        for clave, columna in indices_aena.FILTROS_RANGO.items():
+            condiciones.append(f"{_q(columna)} BETWEEN ? AND ?")
+            parametros += [float(filtros[f'{clave}_min']), float(filtros[f'{clave}_max'])]
+        terminos = indices_aena.tokenizar(busqueda) if busqueda else []
+        if terminos and self.busqueda_fts:
+            # Mismo criterio que indices_aena.IndiceTexto: todas las palabras, como prefijos
+            condiciones.append(f"fila IN (SELECT rowid FROM {TABLA_BUSQUEDA} WHERE {TABLA_BUSQUEDA} MATCH ?)")
+            parametros.append(' '.join(f'"{t}"*' for t in terminos))
+        elif busqueda:
+            columnas = [c for c in indices_aena.COLUMNAS_BUSQUEDA if c in self.columnas]
+            condiciones.append('(' + ' OR '.join(f"{_q(c)} LIKE ?" for c in columnas) + ')')
+            parametros += [f'%{busqueda}%'] * len(columnas)
+        return (' WHERE ' + ' AND '.join(condiciones)) if condiciones else '', parametros
+
+    def _tipar(self, df):
+        """Restaurar los tipos de pandas a partir del tipo declarado de cada columna
+
+        Así todos los bloques de un resultado tienen los mismos tipos, aunque en
+        alguno una columna solo tenga vacíos.
+        """
+        for col in df.columns:
+            tipo = self.tipos.get(col, '')
+            if tipo == 'TIMESTAMP':
+                df[col] = pd.to_datetime(df[col])
+            elif tipo == 'REAL':
+                df[col] = df[col].astype('float64')
+            elif tipo == 'INTEGER':
+                df[col] = df[col].astype('Int64')
+        return df
+
+    def dimensiones(self):
+        """Diccionario de dimensiones de los filtros (indices_aena.DiccionarioDimensiones)"""
+        if self._dimensiones is None:
+            columnas = ', '.join(_q(col) for col, _ in indices_aena.FILTROS_IGUALDAD.values())
+            combinaciones = self._leer(f"SELECT {columnas}, COUNT(*) AS n FROM {TABLA} GROUP BY {columnas}")
+            maximos = {col: self.maximo(col) for col in indices_aena.FILTROS_RANGO.values()}
+            self._dimensiones = indices_aena.DiccionarioDimensiones(combinaciones, maximos)
+        return self._dimensiones
+
+    def maximo(self, columna):
+        with self._conectar() as con:
+            valor = con.execute(f"SELECT MAX({_q(columna)}) FROM {TABLA}").fetchone()[0]
+        return float(valor) if valor is not None else 0.0
+
+    def ejercicios(self):
+        if 'Ejercicio' not in self.columnas:
+            return []
+        tabla = self._leer(f"SELECT DISTINCT Ejercicio FROM {TABLA} WHERE Ejercicio IS NOT NULL")
+        return tabla['Ejercicio'].tolist()
+
+    def contar(self, filtros, busqueda=None):
+        donde, parametros = self._donde(filtros, busqueda)
+        with self._conectar() as con:
+            return con.execute(f"SELECT COUNT(*) FROM {TABLA}{donde}", parametros).fetchone()[0]
+
+    def cubo(self, filtros):
+        """Cubo de agregados de la selección, agregado en la base de datos"""
+        donde, parametros = self._donde(filtros)
+        dimensiones = ', '.join(_q(col) for col in agregados_aena.GRANO)
+        celdas = self._leer(
+            f"SELECT {dimensiones}, COUNT(*) AS n, "
+            f"TOTAL(Presupuesto_Base) AS presupuesto, TOTAL(Importe_Adjudicado) AS importe, "
+            f"TOTAL(Porcentaje_Baja) AS suma_baja, COUNT(Porcentaje_Baja) AS n_baja, "
+            f"TOTAL(Porcentaje_Baja * Presupuesto_Base) AS suma_baja_presupuesto "
+            f"FROM {TABLA}{donde} GROUP BY {dimensiones}",
+            parametros,
+        )
+        # Bocetos de la baja: la cubeta se calcula como bocetos_aena.cubetas
+        # (CAST trunca, pero las posiciones negativas acaban en la cubeta 0)
+        cubeta = (
+            f"MIN(MAX(CAST((Porcentaje_Baja - {bocetos_aena.MINIMO!r}) / {bocetos_aena.ANCHO!r} AS INTEGER), 0), "
+            f"{bocetos_aena.NUM_CUBETAS - 1})"
+        )
+        con_baja = f"{donde} AND Porcentaje_Baja IS NOT NULL" if donde else " WHERE Porcentaje_Baja IS NOT NULL"
+        dimensiones = ', '.join(_q(col) for col in agregados_aena.GRANO_BOCETOS)
+        bocetos = self._leer(
+            f"SELECT {dimensiones}, {cubeta} AS cubeta, COUNT(*) AS n "
+            f"FROM {TABLA}{con_baja} GROUP BY {dimensiones}, cubeta",
+            parametros,
+        )
+        # Tipos fijos: sin filas, read_sql_query devuelve columnas object y las
+        # sumas serían enteros de Python (0 / 0 en vez de NaN)
+        celdas = celdas.astype({'n': 'int64', 'n_baja': 'int64'} | {
+            col: 'float64' for col in agregados_aena.MEDIDAS if col not in ('n', 'n_baja')
+        })
+        for col, tipo in TIPOS_FECHA_CUBO.items():
+            celdas[col] = celdas[col].astype(tipo if celdas[col].notna().all() else 'float64')
+        bocetos = bocetos.astype({'cubeta': 'int64', 'n': 'int64'})
+        for tabla in (celdas, bocetos):
+            for col in ['Aeropuerto', 'Tipo_Obra', 'Empresa_Adjudicataria']:
+                tabla[col] = tabla[col].astype('category')
+            tabla['Rango_Importe'] = pd.Categorical(tabla['Rango_Importe'], categories=agregados_aena.ETIQUETAS_IMPORTE)
+        return agregados_aena.CuboAgregados(celdas, bocetos)
+
+    def _orden(self, orden, descendente):
+        if orden is None:
+            return " ORDER BY fila"
+        sentido = 'DESC' if descendente else 'ASC'
+        # Vacíos al final, como en pandas; desempate por el orden original
+        return f" ORDER BY ({_q(orden)} IS NULL), {_q(orden)} {sentido}, fila"
+
+    def pagina(self, columnas, filtros, busqueda=None, orden=None, descendente=False, inicio=0, tamano=50):
+        """Filas [inicio, inicio + tamano) del resultado, con la etiqueta de fila como índice"""
+        donde, parametros = self._donde(filtros, busqueda)
+        seleccion = ', '.join(['fila'] + [_q(c) for c in columnas])
+        tabla = self._leer(
+            f"SELECT {seleccion} FROM {TABLA}{donde}{self._orden(orden, descendente)} LIMIT ? OFFSET ?",
+            parametros + [int(tamano), int(inicio)],
+        )
+        return self._tipar(tabla.set_index('fila'))
+
+    def bloques(self, columnas, filtros, busqueda=None, orden=None, descendente=False, tamano=10000):
+        """Todas las filas del resultado en bloques de tamano filas (para exportar)"""
+        donde, parametros = self._donde(filtros, busqueda)
+        seleccion = ', '.join(_q(c) for c in columnas)
+        with self._conectar() as con:
+            for bloque in pd.read_sql_query(
+                f"SELECT {seleccion} FROM {TABLA}{donde}{self._orden(orden, descendente)}",
+                con, params=parametros, chunksize=tamano,
+            ):
+                yield self._tipar(bloque)
+
+
+class TablaSQL:
+    """Resultado de la tabla detallada (filtros + búsqueda) resuelto en la base de datos
+
+    Misma interfaz que la tabla en memoria del dashboard: len(), pagina() y
+    exportar(); solo se leen las filas de la página pedida.
+    """
+
+    def __init__(self, almacen, filtros, busqueda, columnas):
+        self.almacen = almacen
+        self.filtros = filtros
+        self.busqueda = busqueda
+        self.columnas = columnas
+        self._filas = almacen.contar(filtros, busqueda)
+
+    def __len__(self):
+        return self._filas
+
+    def pagina(self, orden, descendente, inicio, tamano):
+        return self.almacen.pagina(self.columnas, self.filtros, self.busqueda, orden, descendente, inicio, tamano)
+
+    def exportar(self, formato, orden, descendente):
+        partes = self.almacen.bloques(self.columnas, self.filtros, self.busqueda, orden, descendente)
+        return exportar_aena.exportar_bloques(partes, formato, self.pagina(None, False, 0, 0))
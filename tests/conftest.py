@@ -0,0 +1,70 @@
+"""Configuración común de las pruebas: ruta del repositorio y datos sintéticos"""
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Libros y cachés de las pruebas en un temporal, nunca en el repositorio; los
+# módulos leen estas variables al importarse
+_TEMPORAL = tempfile.mkdtemp(prefix='pruebas_aena_')
+os.environ['AENA_DATA_DIR'] = os.path.join(_TEMPORAL, 'datos')
+os.environ['AENA_CACHE_DIR'] = os.path.join(_TEMPORAL, 'cache')
+for variable in ['AENA_BACKEND', 'AENA_COMPARTIDO', 'AENA_DEBUG', 'AENA_VIGILAR', 'AENA_API_PUERTO']:
+    os.environ.pop(variable, None)
+
+
+def crudo_sintetico(filas=1500, semilla=0):
+    """Libro sintético (columnas del Excel) con vacíos en la baja, el importe y el adjudicatario"""
+    import benchmark_aena
+
+    crudo = benchmark_aena.generar_licitaciones(filas, semilla=semilla)
+    azar = np.random.default_rng(semilla)
+    for columna in ['%baja', 'Importe adjudicación sin impuestos licitación/lote', 'Adjudicatario licitación/lote']:
+        crudo.loc[azar.random(filas) < 0.03, columna] = None
+    return crudo
+
+
+def escribir_libro(ruta, filas=1500, semilla=0):
+    """Guardar un libro sintético como <año>_AENA.xlsx"""
+    crudo_sintetico(filas, semilla).to_excel(ruta, index=False)
+
+
+@pytest.fixture(scope='session')
+def libro():
+    """escribir_libro, para las pruebas que crean libros"""
+    return escribir_libro
+
+
+@pytest.fixture
+def directorio_libros(tmp_path, monkeypatch):
+    """Directorio de datos vacío para la prueba, con el registro de datos vacío"""
+    import datos_aena
+
+    directorio = tmp_path / 'datos'
+    directorio.mkdir()
+    monkeypatch.setattr(datos_aena, 'DIRECTORIO_DATOS', str(directorio))
+    datos_aena.REGISTRO.invalidar()
+    yield directorio
+    datos_aena.REGISTRO.invalidar()
+
+
+@pytest.fixture(scope='session')
+def licitaciones():
+    """DataFrame procesado de licitaciones sintéticas, como el del dashboard"""
+    import dashboard_aena
+    import datos_aena
+
+    canonico = datos_aena.canonicalizar_columnas(crudo_sintetico().assign(Ejercicio=2024))
+    return dashboard_aena.procesar_datos(canonico)
+
+
+@pytest.fixture
+def filtros_base(licitaciones):
+    """Filtros del sidebar sin filtrar nada"""
+    import informes_aena
+
+    return informes_aena.filtros_base(licitaciones)
@@ -0,0 +1,107 @@
+"""Cubo de agregados frente a groupby directos sobre las filas"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import agregados_aena
+import datos_aena
+
+VISTAS = [('Aeropuerto',), ('Tipo_Obra',), ('Empresa_Adjudicataria',), ('Año', 'Mes'), ('Aeropuerto', 'Rango_Importe')]
+COLUMNAS = ['n', 'presupuesto', 'importe', 'baja_media', 'baja_ponderada']
+
+
+@pytest.fixture(scope='module')
+def filas(licitaciones):
+    """Frame pequeño (con bajas, importes y adjudicatarios vacíos)"""
+    return licitaciones.iloc[:400]
+
+
+def _plana(vista):
+    vista = vista.reset_index()
+    return vista.astype({col: object for col in vista.columns if isinstance(vista[col].dtype, pd.CategoricalDtype)})
+
+
+def _groupby(df, dimensiones):
+    """Las medidas de la vista calculadas con un groupby sobre las filas"""
+    df = df.assign(**{
+        'Año': df['Fecha_Publicacion'].dt.year,
+        'Rango_Importe': agregados_aena.rango_importe(df['Importe_Adjudicado']),
+        'ponderada': df['Porcentaje_Baja'] * df['Presupuesto_Base'],
+    })
+    grupos = df.groupby(list(dimensiones), observed=True)
+    presupuesto = grupos['Presupuesto_Base'].sum()
+    return pd.DataFrame({
+        'n': grupos.size(),
+        'presupuesto': presupuesto,
+        'importe': grupos['Importe_Adjudicado'].sum(),
+        'baja_media': grupos['Porcentaje_Baja'].mean(),
+        'baja_ponderada': grupos['ponderada'].sum() / presupuesto,
+    })
+
+
+def _comprobar_cubo(cubo, df):
+    for dimensiones in VISTAS:
+        pd.testing.assert_frame_equal(
+            _plana(cubo.vista(*dimensiones)[COLUMNAS]), _plana(_groupby(df, dimensiones)),
+            check_dtype=False, obj=f"vista{dimensiones}",
+        )
+    metricas = agregados_aena.calcular_metricas(cubo)
+    presupuesto = df['Presupuesto_Base'].sum()
+    esperadas = {
+        'total_licitaciones': len(df),
+        'presupuesto_total': presupuesto,
+        'importe_total': df['Importe_Adjudicado'].sum(),
+        'ahorro_total': presupuesto - df['Importe_Adjudicado'].sum(),
+        'baja_media': df['Porcentaje_Baja'].mean(),
+        'baja_ponderada': (df['Porcentaje_Baja'] * df['Presupuesto_Base']).sum() / presupuesto if presupuesto else np.nan,
+    }
+    assert metricas == pytest.approx(esperadas, nan_ok=True)
+
+
+def test_vistas_y_metricas_como_groupby(filas):
+    _comprobar_cubo(agregados_aena.construir_cubo(filas), filas)
+
+
+def test_cubo_vacio(filas):
+    cubo = agregados_aena.construir_cubo(filas.iloc[:0])
+    _comprobar_cubo(cubo, filas.iloc[:0])
+    metricas = agregados_aena.calcular_metricas(cubo)
+    assert metricas['total_licitaciones'] == 0 and np.isnan(metricas['baja_media'])
+    assert len(cubo.vista('Aeropuerto')) == 0
+    assert len(agregados_aena.top_k_por_grupo(cubo, 'Aeropuerto', 'Empresa_Adjudicataria')) == 0
+
+
+def test_top_k_por_grupo_como_groupby(filas):
+    top = agregados_aena.top_k_por_grupo(agregados_aena.construir_cubo(filas), 'Aeropuerto', 'Empresa_Adjudicataria', k=3)
+
+    conteo = filas.groupby(['Aeropuerto', 'Empresa_Adjudicataria'], observed=True).agg(
+        n=('Presupuesto_Base', 'size'), importe=('Importe_Adjudicado', 'sum'),
+    ).reset_index()
+    conteo['Cuota'] = conteo['importe'] / conteo.groupby('Aeropuerto', observed=True)['importe'].transform('sum')
+    conteo = conteo.sort_values(['Aeropuerto', 'n', 'Empresa_Adjudicataria'], ascending=[True, False, True])
+    conteo['Puesto'] = conteo.groupby('Aeropuerto', observed=True).cumcount() + 1
+    esperado = conteo[conteo['Puesto'] <= 3][['Aeropuerto', 'Puesto', 'Empresa_Adjudicataria', 'n', 'Cuota']]
+    pd.testing.assert_frame_equal(_plana(top).drop(columns='index'), _plana(esperado.reset_index(drop=True)).drop(columns='index'), check_dtype=False)
+
+
+def test_aplicar_delta_como_reconstruir(licitaciones):
+    base = licitaciones.iloc[:600]
+    # Eliminadas, nuevas y modificadas (se quita la versión anterior y se añade la nueva)
+    eliminados = pd.concat([base.iloc[:50], base.iloc[100:120]])
+    modificados = base.iloc[100:120].assign(Porcentaje_Baja=lambda d: d['Porcentaje_Baja'] + 1, Aeropuerto='MAD')
+    insertados = pd.concat([licitaciones.iloc[600:700], modificados])
+    resultado = pd.concat([base.drop(eliminados.index), insertados])
+
+    delta = datos_aena.Delta(None, insertados, eliminados, {})
+    cubo = agregados_aena.construir_cubo(base).aplicar_delta(delta)
+    esperado = agregados_aena.construir_cubo(resultado)
+
+    _comprobar_cubo(cubo, resultado)
+    pd.testing.assert_frame_equal(_plana(cubo.percentiles('Aeropuerto')), _plana(esperado.percentiles('Aeropuerto')))
+    pd.testing.assert_frame_equal(cubo.distribucion('Tipo_Obra').histograma(5), esperado.distribucion('Tipo_Obra').histograma(5))
+
+
+def test_aplicar_delta_hasta_vaciar(licitaciones):
+    base = licitaciones.iloc[:100]
+    cubo = agregados_aena.construir_cubo(base).aplicar_delta(datos_aena.Delta(None, base.iloc[:0], base, {}))
+    assert len(cubo) == 0 and len(cubo.celdas) == 0 and len(cubo.bocetos) == 0
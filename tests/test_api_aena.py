@@ -0,0 +1,124 @@
+"""API HTTP local: rutas, errores y revalidación con ETag"""
+import json
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from types import SimpleNamespace
+
+import pytest
+
+import agregados_aena
+import api_aena
+import dashboard_aena
+import datos_aena
+
+
+@pytest.fixture(scope='module')
+def api(tmp_path_factory, libro):
+    """URL base de un servidor de la API en un puerto libre, sobre un libro sintético"""
+    directorio = tmp_path_factory.mktemp('datos_api')
+    libro(str(directorio / '2024_AENA.xlsx'), filas=800, semilla=1)
+    with pytest.MonkeyPatch.context() as parche:
+        parche.setattr(datos_aena, 'DIRECTORIO_DATOS', str(directorio))
+        datos_aena.REGISTRO.invalidar()
+        servidor = api_aena.crear_servidor('127.0.0.1', 0)
+        hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+        hilo.start()
+        try:
+            yield f"http://127.0.0.1:{servidor.server_address[1]}"
+        finally:
+            servidor.shutdown()
+            servidor.server_close()
+            datos_aena.REGISTRO.invalidar()
+
+
+def pedir(url, cabeceras=None):
+    """(estado, cabeceras, cuerpo JSON o None) de un GET"""
+    peticion = urllib.request.Request(url, headers=cabeceras or {})
+    try:
+        with urllib.request.urlopen(peticion, timeout=60) as respuesta:
+            cuerpo = respuesta.read()
+            return respuesta.status, respuesta.headers, json.loads(cuerpo) if cuerpo else None
+    except urllib.error.HTTPError as e:
+        cuerpo = e.read()
+        return e.code, e.headers, json.loads(cuerpo) if cuerpo else None
+
+
+def _cubo(**cambios):
+    """Cubo calculado directamente sobre el dataset en uso con los filtros de la petición"""
+    import informes_aena
+
+    df = datos_aena.REGISTRO.instantanea().df
+    filtros = {**informes_aena.filtros_base(df), **cambios}
+    return agregados_aena.construir_cubo(dashboard_aena.aplicar_filtros(df, filtros))
+
+
+def test_metricas(api):
+    estado, _, cuerpo = pedir(f"{api}/metricas")
+    assert estado == 200
+    assert cuerpo['datos'] == pytest.approx(agregados_aena.calcular_metricas(_cubo()))
+
+    estado, _, cuerpo = pedir(f"{api}/metricas?aeropuerto=MAD&baja_min=5")
+    assert estado == 200
+    assert cuerpo['filtros']['aeropuerto'] == 'MAD' and cuerpo['filtros']['baja_min'] == 5.0
+    assert cuerpo['datos'] == pytest.approx(agregados_aena.calcular_metricas(_cubo(aeropuerto='MAD', baja_min=5.0)))
+
+
+def test_top(api):
+    estado, _, cuerpo = pedir(f"{api}/top?dimension=empresa&medida=importe&k=5")
+    assert estado == 200
+    esperado = agregados_aena.top_k(_cubo(), 'Empresa_Adjudicataria', 'importe', 5)
+    assert [fila['valor'] for fila in cuerpo['datos']] == [str(valor) for valor in esperado.index]
+    assert [fila['importe'] for fila in cuerpo['datos']] == pytest.approx(esperado.tolist())
+
+
+def test_vista(api):
+    tipo = urllib.parse.quote('Obra Civil')
+    estado, _, cuerpo = pedir(f"{api}/vista?dimensiones=Aeropuerto&tipo_obra={tipo}")
+    assert estado == 200
+    vista = _cubo(tipo_obra='Obra Civil').vista('Aeropuerto')
+    assert {fila['Aeropuerto']: fila['n'] for fila in cuerpo['datos']} == vista['n'].to_dict()
+
+    estado, _, cuerpo = pedir(f"{api}/vista")
+    assert estado == 200 and cuerpo['datos'][0]['n'] == len(_cubo())
+
+
+@pytest.mark.parametrize('ruta, estado', [
+    ('/metricas?aeropuerto=MAD&nada=1', 400),
+    ('/top?k=1&dimensiones=Aeropuerto', 400),
+    ('/metricas?baja_min=mucha', 400),
+    ('/top?k=0', 400),
+    ('/top?medida=otra', 400),
+    ('/vista?dimensiones=Planeta', 400),
+    ('/distribucion?ancho=0.3', 400),
+    ('/no-existe', 404),
+])
+def test_errores(api, ruta, estado):
+    respuesta, _, cuerpo = pedir(f"{api}{ruta}")
+    assert respuesta == estado
+    assert cuerpo['error']
+
+
+def test_error_conserva_la_causa():
+    with pytest.raises(api_aena.ErrorAPI) as error:
+        api_aena.leer_filtros({'baja_min': 'mucha'}, SimpleNamespace(maximos={'Presupuesto_Base': 1.0}))
+    assert isinstance(error.value.__cause__, ValueError)
+
+
+def test_etag_304(api):
+    url = f"{api}/top?dimension=aeropuerto&k=3"
+    estado, cabeceras, cuerpo = pedir(url)
+    etiqueta = cabeceras['ETag']
+    assert estado == 200 and etiqueta and cuerpo
+
+    estado, cabeceras, cuerpo = pedir(url, {'If-None-Match': etiqueta})
+    assert estado == 304 and cuerpo is None and cabeceras['ETag'] == etiqueta
+    estado, _, _ = pedir(url, {'If-None-Match': f'"otra", W/{etiqueta}'})
+    assert estado == 304
+
+    # Otros filtros u otros parámetros: otra respuesta
+    estado, cabeceras, _ = pedir(f"{url}&aeropuerto=MAD", {'If-None-Match': etiqueta})
+    assert estado == 200 and cabeceras['ETag'] != etiqueta
+    estado, cabeceras, _ = pedir(f"{api}/top?dimension=aeropuerto&k=4", {'If-None-Match': etiqueta})
+    assert estado == 200 and cabeceras['ETag'] != etiqueta
@@ -0,0 +1,44 @@
+"""Percentiles de los bocetos frente a ``Series.quantile``"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import bocetos_aena
+
+
+def bocetos_de(df):
+    """Bocetos por grupo de un DataFrame con columnas grupo y baja"""
+    grupos = pd.Index(sorted(df['grupo'].unique()))
+    filas = df.dropna(subset=['baja'])
+    return bocetos_aena.Bocetos.sumar(grupos.get_indexer(filas['grupo']), grupos, bocetos_aena.cubetas(filas['baja']), np.ones(len(filas)))
+
+
+@pytest.mark.parametrize('semilla', range(5))
+def test_cuantiles_como_series_quantile(semilla):
+    azar = np.random.default_rng(semilla)
+    # Grupos de 1 a 400 filas, con bajas muy separadas en los pequeños
+    tamanos = azar.integers(1, 400, size=40)
+    tamanos[:10] = np.arange(1, 11)
+    df = pd.DataFrame({
+        'grupo': np.repeat(np.arange(len(tamanos)), tamanos),
+        'baja': np.round(azar.uniform(-20, 60, size=tamanos.sum()), 3),
+    })
+    estimados = bocetos_de(df).cuantiles()
+    exactos = df.groupby('grupo')['baja'].quantile(bocetos_aena.PERCENTILES).unstack()
+    exactos.columns = estimados.columns
+    assert (estimados - exactos).abs().max().max() < bocetos_aena.ANCHO
+
+
+def test_cuantiles_entre_dos_filas_lejanas():
+    # Con dos filas el p10 está al 10% del camino entre ambas, no en una de ellas
+    df = pd.DataFrame({'grupo': ['AEI', 'AEI'], 'baja': [0.175, 34.6]})
+    estimado = bocetos_de(df).cuantiles().loc['AEI']
+    exacto = df['baja'].quantile(bocetos_aena.PERCENTILES)
+    assert np.abs(estimado.to_numpy() - exacto.to_numpy()).max() < bocetos_aena.ANCHO
+
+
+def test_cuantiles_grupo_sin_filas():
+    df = pd.DataFrame({'grupo': ['A', 'A', 'B'], 'baja': [5.0, 10.0, np.nan]})
+    cuantiles = bocetos_de(df).cuantiles()
+    assert cuantiles.loc['B'].isna().all()
+    assert abs(cuantiles.loc['A', 'p50'] - 7.5) < bocetos_aena.ANCHO
@@ -0,0 +1,63 @@
+"""Normalización de nombres de empresa, UTE y resolución de entidades"""
+import pytest
+
+import empresas_aena
+from empresas_aena import limpiar_nombre, separar_ute
+
+
+@pytest.mark.parametrize('nombre, limpio', [
+    ('Ferrovial Construcción, S.A.', 'FERROVIAL CONSTRUCCIÓN SA'),
+    ('ACME INSTALACIONES S.L.U.', 'ACME INSTALACIONES SL'),
+    ('Talleres García, S. L.', 'TALLERES GARCÍA SL'),
+    ('EMPRESA (SUCURSAL EN ESPAÑA) S.A.', 'EMPRESA SA'),
+    ('COOPERATIVA DEL VALLE S. COOP.', 'COOPERATIVA DEL VALLE S COOP'),
+    ('  obras   del norte sau ', 'OBRAS DEL NORTE SA'),
+])
+def test_limpiar_nombre(nombre, limpio):
+    assert limpiar_nombre(nombre) == limpio
+
+
+@pytest.mark.parametrize('nombre, miembros', [
+    ('UTE FERROVIAL SA - ACCIONA CONSTRUCCION SL', ['FERROVIAL SA', 'ACCIONA CONSTRUCCION SL']),
+    ('FERROVIAL S.A. / ACCIONA S.L.', ['FERROVIAL SA', 'ACCIONA SL']),
+    ('UTE FERROVIAL SA-ACCIONA SL UTE BARAJAS', ['FERROVIAL SA', 'ACCIONA SL']),
+    ('EMPRESA SL - SIGLAS', []),
+    ('CONSTRUCCIONES GARCIA-LOPEZ SL', []),
+    ('UTE AEROPUERTO MADRID', []),
+])
+def test_separar_ute(nombre, miembros):
+    assert separar_ute(nombre) == miembros
+
+
+@pytest.fixture
+def resolutor(tmp_path):
+    return empresas_aena.ResolutorEmpresas(ruta=str(tmp_path / 'empresas.json'))
+
+
+def test_variantes_de_escritura_se_agrupan(resolutor):
+    resolutor.resolver({'CONSTRUCCIONES LOPEZ SL': 5, 'Construcciones López, S.L.': 2, 'CONSTRUCCIONES LOPES SL': 1})
+    assert {resolutor.nombre(n) for n in ['CONSTRUCCIONES LOPEZ SL', 'Construcciones López, S.L.', 'CONSTRUCCIONES LOPES SL']} == {'CONSTRUCCIONES LOPEZ SL'}
+
+
+@pytest.mark.parametrize('orden', [1, -1])
+def test_sufijos_distintos_son_entidades_distintas(resolutor, orden):
+    nombres = ['TALLERES GARCIA SA', 'TALLERES GARCIA SL', 'CONSTRUCCIONES LOPEZ SL', 'CONSTRUCCIONES LOPEZ, S.A.'][::orden]
+    resolutor.resolver(nombres)
+    assert resolutor.nombre('TALLERES GARCIA SA') == 'TALLERES GARCIA SA'
+    assert resolutor.nombre('TALLERES GARCIA SL') == 'TALLERES GARCIA SL'
+    assert resolutor.nombre('CONSTRUCCIONES LOPEZ SL') == 'CONSTRUCCIONES LOPEZ SL'
+    assert resolutor.nombre('CONSTRUCCIONES LOPEZ, S.A.') == 'CONSTRUCCIONES LOPEZ SA'
+
+
+def test_miembros_de_ute_resueltos_como_empresas(resolutor):
+    resolutor.resolver(['FERROVIAL CONSTRUCCION SA', 'UTE Ferrovial Construcción, S.A. - ACCIONA SL'])
+    assert resolutor.nombre('UTE Ferrovial Construcción, S.A. - ACCIONA SL') == 'UTE ACCIONA SL - FERROVIAL CONSTRUCCION SA'
+
+
+def test_resolucion_persistente(tmp_path):
+    ruta = str(tmp_path / 'empresas.json')
+    empresas_aena.ResolutorEmpresas(ruta).resolver(['TALLERES GARCIA SA', 'Talleres García, S.L.'])
+    nuevo = empresas_aena.ResolutorEmpresas(ruta)
+    nuevo.resolver(['TALLERES GARCIA SL'])
+    assert nuevo.nombre('TALLERES GARCIA SL') == 'TALLERES GARCÍA SL'
+    assert nuevo.nombre('TALLERES GARCIA SA') == 'TALLERES GARCIA SA'
@@ -0,0 +1,135 @@
+"""Índices del dashboard frente a los caminos sin índice (máscaras y str.contains)"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import dashboard_aena
+import indices_aena
+
+
+def _empresa_frecuente(df):
+    return df['Empresa_Adjudicataria'].value_counts().index[0]
+
+
+def _presupuesto_central(df):
+    return float(df['Presupuesto_Base'].sort_values().iloc[len(df) // 2])
+
+
+def _baja_central(df):
+    return float(df['Porcentaje_Baja'].dropna().sort_values().iloc[len(df) // 2])
+
+
+# Cambios respecto a los filtros base: función df -> diccionario
+FILTROS = {
+    'sin_filtro': lambda df: {},
+    'aeropuerto': lambda df: {'aeropuerto': 'MAD'},
+    'tipo_obra': lambda df: {'tipo_obra': 'Obra Civil'},
+    'empresa': lambda df: {'empresa': _empresa_frecuente(df)},
+    'empresa_sin_especificar': lambda df: {'empresa': 'No especificado'},
+    'combinados': lambda df: {'aeropuerto': 'MAD', 'tipo_obra': 'Edificación', 'baja_min': 5.0, 'baja_max': 30.0},
+    'baja_cero': lambda df: {'baja_min': 0.0, 'baja_max': 0.0},
+    'baja_limite_exacto': lambda df: {'baja_min': _baja_central(df), 'baja_max': _baja_central(df)},
+    'baja_completa': lambda df: {'baja_min': float(df['Porcentaje_Baja'].min()), 'baja_max': float(df['Porcentaje_Baja'].max())},
+    'presupuesto_limite_exacto': lambda df: {'presupuesto_min': _presupuesto_central(df), 'presupuesto_max': _presupuesto_central(df)},
+    'presupuesto_maximo': lambda df: {'presupuesto_min': float(df['Presupuesto_Base'].max())},
+    'valor_inexistente': lambda df: {'aeropuerto': 'XXX'},
+    'sin_filas': lambda df: {'baja_min': 99.0},
+    'rango_invertido': lambda df: {'presupuesto_min': 2e6, 'presupuesto_max': 1e6},
+}
+
+
+@pytest.fixture(scope='module')
+def indice(licitaciones):
+    return indices_aena.IndiceFiltros(licitaciones)
+
+
+@pytest.mark.parametrize('nombre', FILTROS)
+def test_indice_filtros_como_mascara(licitaciones, filtros_base, indice, nombre):
+    filtros = {**filtros_base, **FILTROS[nombre](licitaciones)}
+    esperado = dashboard_aena.aplicar_filtros(licitaciones, filtros)
+    pd.testing.assert_frame_equal(dashboard_aena.aplicar_filtros(licitaciones, filtros, indice), esperado)
+    if nombre in ('valor_inexistente', 'sin_filas', 'rango_invertido'):
+        assert len(esperado) == 0
+    elif nombre != 'sin_filtro':
+        assert 0 < len(esperado) < len(licitaciones)
+
+
+def test_indice_filtros_excluye_bajas_vacias(licitaciones, filtros_base, indice):
+    filtrado = dashboard_aena.aplicar_filtros(licitaciones, filtros_base, indice)
+    assert licitaciones['Porcentaje_Baja'].isna().any()
+    assert filtrado['Porcentaje_Baja'].notna().all()
+
+
+@pytest.fixture(scope='module')
+def indice_texto(licitaciones):
+    return indices_aena.IndiceTexto(licitaciones)
+
+
+def _contiene(df, *palabras):
+    """Filas con cada palabra en alguna columna de búsqueda (str.contains, como el dashboard)"""
+    columnas = df[indices_aena.COLUMNAS_BUSQUEDA].astype(str)
+    mascara = np.ones(len(df), dtype=bool)
+    for palabra in palabras:
+        mascara &= columnas.apply(lambda x: x.str.contains(palabra, case=False, na=False, regex=False)).any(axis=1).to_numpy()
+    return df.index.to_numpy()[mascara]
+
+
+@pytest.mark.parametrize('consulta, palabras', [
+    ('Málaga', ['Málaga']),
+    ('MÁLAGA', ['Málaga']),
+    ('malaga', ['Málaga']),
+    ('Climatización', ['Climatización']),
+    ('CLIMATIZACION', ['Climatización']),
+    ('cubiertas', ['Cubiertas']),
+    ('Renovación cubiertas', ['Renovación', 'Cubiertas']),
+    ('palma  BALIZAMIENTO', ['Palma', 'Balizamiento']),
+])
+def test_indice_texto_como_contains(licitaciones, indice_texto, consulta, palabras):
+    """Palabras completas: el índice da las mismas filas que str.contains con la grafía de los datos"""
+    esperado = _contiene(licitaciones, *palabras)
+    assert len(esperado) > 0
+    np.testing.assert_array_equal(indice_texto.buscar(consulta), esperado)
+
+
+@pytest.mark.parametrize('consulta', ['zzzz', 'Málaga Ibiza', 'cubiertas zzzz'])
+def test_indice_texto_sin_resultados(licitaciones, indice_texto, consulta):
+    assert len(indice_texto.buscar(consulta)) == 0
+    assert len(_contiene(licitaciones, *consulta.split())) == 0
+
+
+def test_indice_texto_sin_tildes(licitaciones, indice_texto):
+    """Sin distinguir tildes: 'señalizacion' encuentra 'Señalización' y 'SEÑALIZACIONES'"""
+    filas = set(indice_texto.buscar('señalizacion'))
+    con_tildes, sin_tilde = set(_contiene(licitaciones, 'Señalización')), set(_contiene(licitaciones, 'SEÑALIZACION'))
+    assert con_tildes and sin_tilde - con_tildes
+    assert filas == con_tildes | sin_tilde
+
+
+def test_indice_texto_por_prefijo(licitaciones, indice_texto):
+    np.testing.assert_array_equal(indice_texto.buscar('Balizam'), _contiene(licitaciones, 'Balizamiento'))
+    np.testing.assert_array_equal(indice_texto.buscar('MÁLAG cubierta'), _contiene(licitaciones, 'Málaga', 'Cubiertas'))
+
+
+@pytest.mark.parametrize('consulta', ['', '   ', '¿?', '- / -'])
+def test_indice_texto_sin_palabras(indice_texto, consulta):
+    assert indice_texto.buscar(consulta) is None
+
+
+def _tabla(df, indice):
+    import dashboard_aena
+
+    dashboard_aena.mostrar_tabla_detallada(df, indice)
+
+
+@pytest.mark.parametrize('consulta', ['¿?', '-'])
+def test_tabla_detallada_sin_palabras_usa_contains(licitaciones, indice_texto, consulta):
+    """Una consulta sin palabras (buscar devuelve None) se resuelve con str.contains"""
+    from streamlit.testing.v1 import AppTest
+
+    df = licitaciones.iloc[:300]
+    app = AppTest.from_function(_tabla, args=(df, indice_texto), default_timeout=60).run()
+    app.text_input[0].set_value(consulta).run()
+    assert not app.exception
+    columnas = df[[col for col in dashboard_aena.COLUMNAS_TABLA if col in df.columns]].astype(str)
+    esperado = columnas.apply(lambda x: x.str.contains(consulta, case=False, na=False)).any(axis=1).sum()
+    assert any(f"Mostrando {esperado} resultados de {len(df)}" in info.value for info in app.info)
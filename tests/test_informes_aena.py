@@ -0,0 +1,30 @@
+"""Nombres de los directorios de los informes"""
+import informes_aena
+from informes_aena import nombre_informe
+
+
+def test_nombre_sin_filtros():
+    assert nombre_informe({}) == 'todos'
+
+
+def test_nombres_distintos_para_filtros_distintos():
+    combinaciones = [
+        {'aeropuerto': 'AGP'}, {'empresa': 'AGP'},
+        {'presupuesto_min': 1e6}, {'presupuesto_max': 1e6},
+        {'aeropuerto': 'MAD', 'tipo_obra': 'Obra Civil'}, {'aeropuerto': 'MAD Obra', 'tipo_obra': 'Civil'},
+        {'aeropuerto': 'Málaga'}, {'aeropuerto': 'Malaga'},
+    ]
+    nombres = [nombre_informe(cambios) for cambios in combinaciones]
+    assert len(set(nombres)) == len(nombres)
+
+
+def test_nombre_legible_y_estable():
+    nombre = nombre_informe({'tipo_obra': 'Señalización', 'aeropuerto': 'Málaga'})
+    assert nombre.startswith('aeropuerto-Malaga_tipo-obra-Senalizacion_')
+    assert nombre == nombre_informe({'aeropuerto': 'Málaga', 'tipo_obra': 'Señalización'})
+    assert all(c.isascii() and (c.isalnum() or c in '-_') for c in nombre)
+
+
+def test_combinaciones_por_aeropuerto_sin_colisiones(licitaciones):
+    combinaciones = informes_aena.combinaciones_por_aeropuerto(licitaciones)
+    assert len({nombre_informe(cambios) for cambios in combinaciones}) == len(combinaciones)
@@ -0,0 +1,57 @@
+"""El cubo agregado en SQLite frente a construir_cubo sobre las filas filtradas"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import agregados_aena
+import dashboard_aena
+import sql_aena
+
+VISTAS = [(), ('Aeropuerto',), ('Año', 'Mes'), ('Tipo_Obra', 'Rango_Importe'), ('Empresa_Adjudicataria',)]
+
+
+@pytest.fixture(scope='module')
+def almacen(licitaciones, tmp_path_factory):
+    ruta = str(tmp_path_factory.mktemp('sql') / 'licitaciones.sqlite')
+    sql_aena.ingerir(licitaciones, ruta, 'prueba')
+    return sql_aena.AlmacenSQL(ruta, 'prueba')
+
+
+@pytest.fixture(params=['sin_filtro', 'aeropuerto', 'sin_filas'])
+def filtros(request, filtros_base):
+    return {
+        'sin_filtro': filtros_base,
+        'aeropuerto': {**filtros_base, 'aeropuerto': 'MAD'},
+        'sin_filas': {**filtros_base, 'baja_min': 99.0},
+    }[request.param]
+
+
+def _plana(vista):
+    """Vista con el índice como columnas de valores (sin tipos categóricos)"""
+    vista = vista.reset_index(drop=vista.index.name is None and vista.index.nlevels == 1)
+    return vista.astype({col: object for col in vista.columns if isinstance(vista[col].dtype, pd.CategoricalDtype)})
+
+
+def test_cubo_sql_como_pandas(almacen, licitaciones, filtros):
+    esperado = agregados_aena.construir_cubo(dashboard_aena.aplicar_filtros(licitaciones, filtros))
+    cubo = almacen.cubo(filtros)
+
+    metricas, metricas_esperadas = agregados_aena.calcular_metricas(cubo), agregados_aena.calcular_metricas(esperado)
+    assert metricas.keys() == metricas_esperadas.keys()
+    for clave, valor in metricas_esperadas.items():
+        assert valor == pytest.approx(metricas[clave], nan_ok=True), clave
+    for dimensiones in VISTAS:
+        pd.testing.assert_frame_equal(
+            _plana(cubo.vista(*dimensiones)), _plana(esperado.vista(*dimensiones)),
+            check_dtype=False, check_index_type=False, obj=f"vista{dimensiones}",
+        )
+    pd.testing.assert_frame_equal(
+        _plana(cubo.percentiles('Aeropuerto')), _plana(esperado.percentiles('Aeropuerto')), check_dtype=False, obj="percentiles",
+    )
+
+
+def test_cubo_sql_sin_filas_tiene_tipos_fijos(almacen, filtros_base):
+    cubo = almacen.cubo({**filtros_base, 'baja_min': 99.0})
+    assert len(cubo.celdas) == 0
+    assert cubo.celdas['n'].dtype == np.int64 and cubo.celdas['presupuesto'].dtype == np.float64
+    assert np.isnan(cubo.totales()['baja_ponderada'])
@@ -0,0 +1,93 @@
+"""Vigilancia de los libros y cambio del dataset en segundo plano"""
+import time
+
+import pandas as pd
+import pytest
+
+import agregados_aena
+import dashboard_aena
+import datos_aena
+import vigilante_aena
+
+# Segundos entre comprobaciones del vigilante en las pruebas
+INTERVALO = 0.05
+
+
+def esperar(condicion, segundos=60):
+    limite = time.monotonic() + segundos
+    while not condicion():
+        if time.monotonic() > limite:
+            raise AssertionError("tiempo de espera agotado")
+        time.sleep(INTERVALO)
+
+
+@pytest.fixture
+def en_uso(directorio_libros, libro):
+    """Instantánea del registro con un libro de 300 filas cargado"""
+    libro(str(directorio_libros / '2024_AENA.xlsx'), filas=300)
+    assert dashboard_aena.cargar_datos() is not None
+    return datos_aena.REGISTRO.instantanea()
+
+
+@pytest.fixture
+def vigilante(en_uso):
+    vigilante = vigilante_aena.Vigilante(dashboard_aena.firma_datos, dashboard_aena.recargar_datos, intervalo=INTERVALO)
+    yield vigilante
+    vigilante.parar()
+
+
+def test_libro_a_medias_no_se_carga(directorio_libros, libro, en_uso, vigilante, tmp_path):
+    vigilante.vigente = en_uso.version
+    nuevo = tmp_path / 'nuevo.xlsx'
+    libro(str(nuevo), filas=500, semilla=2)
+    contenido = nuevo.read_bytes()
+
+    # Mientras se copia el libro la firma cambia en cada comprobación: no se carga
+    with open(directorio_libros / '2024_AENA.xlsx', 'wb') as f:
+        for trozo in range(4):
+            f.write(contenido[trozo * len(contenido) // 4:(trozo + 1) * len(contenido) // 4])
+            f.flush()
+            assert not vigilante.comprobar()
+            assert datos_aena.REGISTRO.version == en_uso.version and vigilante.fallida is None
+    # Copia terminada: se carga en la siguiente comprobación con la misma firma
+    assert vigilante.comprobar()
+    assert datos_aena.REGISTRO.version != en_uso.version
+    assert len(datos_aena.REGISTRO.df) > len(en_uso.df)
+
+
+@pytest.mark.parametrize('contenido', ['truncado', 'sin_columnas'])
+def test_libro_no_valido_no_se_pone_en_uso(directorio_libros, en_uso, vigilante, contenido):
+    ruta = directorio_libros / '2024_AENA.xlsx'
+    if contenido == 'truncado':
+        ruta.write_bytes(ruta.read_bytes()[:ruta.stat().st_size // 2])
+    else:
+        pd.DataFrame({'Columna': [1, 2, 3]}).to_excel(ruta, index=False)
+    vigilante.iniciar(en_uso.version)
+
+    esperar(lambda: vigilante.fallida is not None)
+    assert vigilante.error
+    assert datos_aena.REGISTRO.version == en_uso.version
+    assert datos_aena.REGISTRO.instantanea().df is en_uso.df
+    # No se reintenta mientras los libros no cambien
+    time.sleep(5 * INTERVALO)
+    assert vigilante.vigente == en_uso.version and datos_aena.REGISTRO.df is en_uso.df
+
+
+def test_cambio_estable_pone_en_uso_una_version_nueva(directorio_libros, libro, en_uso, vigilante):
+    filas_antes = len(en_uso.df)
+    cubo_antes = datos_aena.REGISTRO.derivado('cubo', agregados_aena.construir_cubo, instantanea=en_uso)
+    vigilante.iniciar(en_uso.version)
+    libro(str(directorio_libros / '2024_AENA.xlsx'), filas=500, semilla=2)
+
+    esperar(lambda: datos_aena.REGISTRO.version != en_uso.version)
+    assert vigilante.vigente == datos_aena.REGISTRO.version and vigilante.error is None
+    ahora = datos_aena.REGISTRO.instantanea()
+    assert len(ahora.df) > len(en_uso.df)
+    assert dashboard_aena.cargar_datos() is ahora.df
+
+    # La instantánea anterior sigue viendo el dataset y los derivados de su versión
+    assert len(en_uso.df) == filas_antes
+    assert datos_aena.REGISTRO.derivado('cubo', agregados_aena.construir_cubo, instantanea=en_uso) is cubo_antes
+    assert len(cubo_antes) == len(en_uso.df)
+    cubo_ahora = datos_aena.REGISTRO.derivado('cubo', agregados_aena.construir_cubo, instantanea=ahora)
+    assert len(cubo_ahora) == len(ahora.df)
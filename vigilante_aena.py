@@ -0,0 +1,99 @@
+"""Vigilancia de los libros Excel y cambio del dataset en segundo plano
+
+Un hilo por proceso comprueba cada ``INTERVALO`` segundos la firma de los
+libros del directorio de datos (ruta, fecha de modificación y tamaño de cada
+uno: no lee nada). Cuando cambia o aparece un libro, espera a que la firma se
+repita en la siguiente comprobación (el archivo ya no se está copiando) y
+entonces lo carga, procesa y valida en el propio hilo. Solo si todo va bien
+se pone en uso la nueva versión, de una vez. Si falla, se sigue con la anterior
+y no se reintenta hasta que los libros vuelvan a cambiar.
+
+Las sesiones no esperan nunca por la carga: siguen con la versión anterior y
+se les avisa de que hay datos nuevos. ``AENA_VIGILAR=0`` desactiva el hilo.
+"""
+import logging
+import os
+import threading
+import time
+
+# Segundos entre comprobaciones (0: sin vigilancia)
+INTERVALO = float(os.environ.get('AENA_VIGILAR', 30))
+ACTIVO = INTERVALO > 0
+
+LOGGER = logging.getLogger('aena.vigilante')
+
+_lock = threading.Lock()
+_vigilante = None
+
+
+class Vigilante:
+    """Hilo que llama a recargar() cuando firma() cambia y se mantiene estable
+
+    firma() debe ser barata (solo metadatos de los archivos); recargar(firma)
+    carga, valida y pone en uso la nueva versión, y lanza una excepción si no
+    se puede usar.
+    """
+
+    def __init__(self, firma, recargar, intervalo=INTERVALO):
+        self.firma = firma
+        self.recargar = recargar
+        self.intervalo = intervalo
+        self.vigente = None  # Firma de la versión en uso
+        self.fallida = None  # Última firma que no se pudo cargar
+        self.error = None
+        self.instante = None  # Momento del último cambio de versión
+        self._candidata = None
+        self._parar = threading.Event()
+        self._hilo = None
+
+    def iniciar(self, vigente=None):
+        self.vigente = vigente
+        self._hilo = threading.Thread(target=self._bucle, name='vigilante_aena', daemon=True)
+        self._hilo.start()
+
+    def parar(self):
+        self._parar.set()
+
+    def _bucle(self):
+        while not self._parar.wait(self.intervalo):
+            try:
+                self.comprobar()
+            except Exception:
+                LOGGER.exception("Error al comprobar los libros")
+
+    def comprobar(self):
+        """Una comprobación: True si se ha puesto en uso una versión nueva"""
+        firma = self.firma()
+        if firma is None or firma == self.vigente or firma == self.fallida:
+            self._candidata = None
+            return False
+        if firma != self._candidata:
+            # Cambio recién visto: se carga si sigue igual en la próxima comprobación
+            self._candidata = firma
+            return False
+        self._candidata = None
+        inicio = time.perf_counter()
+        try:
+            self.recargar(firma)
+        except Exception as e:
+            self.fallida, self.error = firma, str(e)
+            LOGGER.warning("No se pudo cargar la versión %s: %s", firma, e)
+            return False
+        self.vigente, self.error, self.instante = firma, None, time.time()
+        LOGGER.info("Versión %s en uso (%.1f s)", firma, time.perf_counter() - inicio)
+        return True
+
+
+def arrancar(firma, recargar, vigente=None, intervalo=INTERVALO):
+    """Vigilante del proceso, arrancado la primera vez que se llama"""
+    global _vigilante
+    with _lock:
+        if _vigilante is None:
+            _vigilante = Vigilante(firma, recargar, intervalo)
+            _vigilante.iniciar(vigente)
+        return _vigilante
+
+
+def en_marcha():
+    """True si este proceso tiene un vigilante: las sesiones no comprueban los libros"""
+    return _vigilante is not None